@@ -0,0 +1,234 @@
+import bisect
+import hashlib
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, or_
+
+import alerts
+import database
+import dependencies
+import maintenance
+import uptime
+from events import PROBE_RESULT, event_bus
+from models import BURST_FIELDS, HostDB, PingResultDB, ProbeAgentDB
+
+logger = logging.getLogger(__name__)
+
+# Shared secret agents send as X-Agent-Token; agent endpoints are off while it is unset
+AGENT_TOKEN = os.getenv("AGENT_TOKEN", "")
+# An agent that hasn't polled for this long is dropped and its hosts are reassigned
+AGENT_TIMEOUT = int(os.getenv("AGENT_TIMEOUT", "60"))
+AGENT_POLL_INTERVAL = int(os.getenv("AGENT_POLL_INTERVAL", "15"))
+# Whether the central scheduler keeps a share of the hosts while agents are live
+AGENT_CENTRAL_PROBES = os.getenv("AGENT_CENTRAL_PROBES", "false").lower() == "true"
+# Virtual nodes per member: more points on the ring give a more even split
+AGENT_VNODES = 64
+# Ring member standing for the central scheduler
+CENTRAL = "central"
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.sha1(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring over member names. Adding or removing a member only moves
+    the hosts that hash next to its points, so a join or leave reshuffles ~1/N of them.
+    """
+
+    def __init__(self, members, vnodes: int = AGENT_VNODES):
+        self.members = sorted(set(members))
+        points = sorted(
+            (_hash(f"{member}#{i}"), member) for member in self.members for i in range(vnodes)
+        )
+        self._keys = [p[0] for p in points]
+        self._owners = [p[1] for p in points]
+
+    def owner(self, host_id: int) -> str | None:
+        if not self._keys:
+            return None
+        i = bisect.bisect(self._keys, _hash(str(host_id))) % len(self._keys)
+        return self._owners[i]
+
+
+class AgentRegistry:
+    """
+    Tracks live probe agents (stored in probe_agents so every API process agrees) and
+    the ring that shards hosts between them. Batches pushed by agents are written here
+    the same way the scheduler records its own probes, tagged with the agent's vantage.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ring: HashRing | None = None
+
+    def live(self, db, now: datetime | None = None) -> list[ProbeAgentDB]:
+        cutoff = (now or datetime.utcnow()) - timedelta(seconds=AGENT_TIMEOUT)
+        return db.query(ProbeAgentDB).filter(ProbeAgentDB.last_seen >= cutoff).all()
+
+    def ring(self, db) -> HashRing:
+        members = [agent.name for agent in self.live(db)]
+        if AGENT_CENTRAL_PROBES or not members:
+            members.append(CENTRAL)
+        with self._lock:
+            if self._ring is None or self._ring.members != sorted(members):
+                if self._ring is not None:
+                    logger.info(f"Probe ring rebalanced: {sorted(members)}")
+                self._ring = HashRing(members)
+            return self._ring
+
+    def changed(self, db) -> bool:
+        """True if agents joined or timed out since the ring was last built."""
+        with self._lock:
+            previous = self._ring.members if self._ring is not None else None
+        return self.ring(db).members != previous
+
+    def register(self, db, name: str, vantage: str | None) -> ProbeAgentDB:
+        agent = db.query(ProbeAgentDB).filter(ProbeAgentDB.name == name).first()
+        if agent is None:
+            agent = ProbeAgentDB(name=name)
+            db.add(agent)
+        agent.vantage = vantage or name
+        agent.last_seen = datetime.utcnow()
+        db.commit()
+        db.refresh(agent)
+        return agent
+
+    def touch(self, db, name: str) -> ProbeAgentDB | None:
+        """Records a poll. None if the agent is unknown or already timed out (it must re-register)."""
+        agent = db.query(ProbeAgentDB).filter(ProbeAgentDB.name == name).first()
+        now = datetime.utcnow()
+        if agent is None or agent.last_seen < now - timedelta(seconds=AGENT_TIMEOUT):
+            return None
+        agent.last_seen = now
+        db.commit()
+        return agent
+
+    def deregister(self, db, name: str) -> bool:
+        deleted = db.query(ProbeAgentDB).filter(ProbeAgentDB.name == name).delete()
+        db.commit()
+        return bool(deleted)
+
+    def shard(self, db) -> dict[str, list[HostDB]]:
+        """Probed hosts grouped by the ring member that owns them."""
+        ring = self.ring(db)
+        hosts = (
+            db.query(HostDB)
+            .filter(
+                HostDB.enabled == True,
+                or_(HostDB.monitor_type.is_(None), HostDB.monitor_type != "heartbeat"),
+            )
+            .all()
+        )
+        shards = defaultdict(list)
+        for host in hosts:
+            shards[ring.owner(host.id)].append(host)
+        return shards
+
+    def ingest(self, vantage: str, results: list[dict]) -> int:
+        """
+        Writes one agent batch in a single transaction: raw results tagged with `vantage`,
+        uptime samples in time order, and the status each host ends the batch in.
+        Returns the number of results accepted (unknown or disabled hosts are dropped).
+        """
+        by_host = defaultdict(list)
+        for result in results:
+            by_host[result["host_id"]].append(result)
+
+        transitions = []
+        accepted = []
+        db = database.SessionLocal()
+        try:
+            hosts = (
+                db.query(HostDB)
+                .filter(HostDB.id.in_(list(by_host)), HostDB.enabled == True)
+                .all()
+            )
+            # Evaluated before any write: both may reload their caches in their own session
+            suppressed = {host.id: maintenance.in_maintenance(host) for host in hosts}
+            blocked = {host.id: dependencies.graph.is_blocked(host.id) for host in hosts}
+            # Read before this batch's samples are written
+            was_down = {
+                host.id: dependencies.was_down(db, host.id)
+                for host in hosts
+                if host.last_status == dependencies.UNREACHABLE
+            }
+            now = datetime.utcnow()
+            for host in hosts:
+                samples = sorted(by_host[host.id], key=lambda r: r["timestamp"] or now)
+                if blocked[host.id]:
+                    # Same as the scheduler: no samples while the parent is down
+                    status = dependencies.UNREACHABLE
+                else:
+                    for sample in samples:
+                        sample["timestamp"] = sample["timestamp"] or now
+                        sent = sample.get("sent")
+                        if sent is not None:
+                            sample["received"] = min(sample.get("received") or 0, sent)
+                        uptime.record_sample(
+                            db,
+                            host.id,
+                            sample["latency"] is not None,
+                            timestamp=sample["timestamp"],
+                            in_maintenance=suppressed[host.id],
+                            sent=sent or 1,
+                            received=sample["received"] if sent is not None else None,
+                        )
+                        accepted.append(sample)
+                    status = "UP" if samples[-1]["latency"] is not None else "DOWN"
+                if host.last_status != status:
+                    transitions.append((host, host.last_status, status))
+                    host.last_status = status
+            if accepted:
+                db.execute(
+                    insert(PingResultDB),
+                    [
+                        {
+                            "host_id": r["host_id"],
+                            "timestamp": r["timestamp"],
+                            "latency": r["latency"],
+                            "vantage": vantage,
+                            **{f: r.get(f) for f in BURST_FIELDS},
+                        }
+                        for r in accepted
+                    ],
+                )
+            db.commit()
+
+            for result in accepted:
+                event_bus.publish(
+                    PROBE_RESULT,
+                    host_id=result["host_id"],
+                    latency=result["latency"],
+                    status="UP" if result["latency"] is not None else "DOWN",
+                    suppressed=suppressed[result["host_id"]],
+                    vantage=vantage,
+                )
+            for host, previous, status in transitions:
+                logger.info(f"{host.name} status: {previous} → {status} (via {vantage})")
+                alerts.record_transition(
+                    host.id,
+                    host.name,
+                    host.group_name,
+                    previous,
+                    status,
+                    address=host.ip_address,
+                    detail=f"State: {status}\nVantage: {vantage}",
+                    suppressed=suppressed[host.id],
+                    alert_up=was_down.get(host.id),
+                )
+        except Exception as e:
+            logger.error(f"Error saving {len(results)} results from {vantage}: {e}")
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return len(accepted)
+
+
+registry = AgentRegistry()
@@ -0,0 +1,154 @@
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+from dependencies import UNREACHABLE
+from events import STATUS_CHANGE, event_bus
+from notifications import notification_manager
+
+logger = logging.getLogger(__name__)
+
+# Seconds to collect status transitions before notifying; 0 sends each one immediately
+ALERT_DIGEST_WINDOW = float(os.getenv("ALERT_DIGEST_WINDOW", "15"))
+# "group" sends one digest per group_name, "global" one digest per flush
+ALERT_DIGEST_SCOPE = os.getenv("ALERT_DIGEST_SCOPE", "group")
+# Host names listed in a digest body before it is truncated
+DIGEST_MAX_NAMES = 50
+
+_ICONS = {"DOWN": "🔴", "UP": "🟢"}
+
+
+class AlertAggregator:
+    """
+    Coalesces host status transitions over a short window, so a mass outage produces
+    one notification per group instead of one per host.
+    """
+
+    def __init__(
+        self, window: float = ALERT_DIGEST_WINDOW, scope: str = ALERT_DIGEST_SCOPE, send=None
+    ):
+        self.window = window
+        self.scope = scope
+        self._sender = send
+        self._lock = threading.Lock()
+        # host_id -> its pending transition, in arrival order
+        self._pending: dict[int, dict] = {}
+        self._timer = None
+        # Off outside the leader: alerts go straight to the outbox the leader delivers from
+        self.digesting = True
+
+    def _send(self, title: str, body: str):
+        (self._sender or notification_manager.send_notification)(title, body)
+
+    def add(self, host_id: int, name: str, group: str | None, status: str, title: str, body: str):
+        """
+        Queues a transition. `title`/`body` are used as-is when it ends up alone in its digest.
+        A transition that reverses one still pending for the host cancels both: a host that
+        went DOWN and came back UP within the window produces no alert. Hosts are matched by
+        id, since two hosts may share a name.
+        """
+        alert = {
+            "name": name,
+            "group": group or "General",
+            "status": status,
+            "title": title,
+            "body": body,
+        }
+        if self.window <= 0 or not self.digesting:
+            self._send(title, body)
+            return
+        with self._lock:
+            previous = self._pending.pop(host_id, None)
+            if previous is not None and previous["status"] != status:
+                return
+            self._pending[host_id] = alert
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = list(self._pending.values()), {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return
+
+        buckets = defaultdict(list)
+        for alert in pending:
+            buckets[alert["group"] if self.scope == "group" else None].append(alert)
+
+        for group, alerts in buckets.items():
+            try:
+                if len(alerts) == 1:
+                    self._send(alerts[0]["title"], alerts[0]["body"])
+                else:
+                    self._send(*self._digest(group, alerts))
+            except Exception as e:
+                logger.error(f"Error sending alert digest: {e}")
+
+    @staticmethod
+    def _digest(group: str | None, alerts: list[dict]) -> tuple[str, str]:
+        # add() keeps at most one pending transition per host
+        by_status = defaultdict(list)
+        for alert in alerts:
+            by_status[alert["status"]].append(alert["name"])
+
+        scope = f" in group {group}" if group else ""
+        counts = ", ".join(
+            f"{_ICONS.get(status, '')} {len(names)} host{'s' if len(names) != 1 else ''} {status}".strip()
+            for status, names in sorted(by_status.items())
+        )
+        title = f"{counts}{scope}"
+
+        lines = []
+        for status, names in sorted(by_status.items()):
+            shown = sorted(names)[:DIGEST_MAX_NAMES]
+            more = len(names) - len(shown)
+            lines.append(f"{status}: {', '.join(shown)}" + (f" (+{more} more)" if more else ""))
+        return title, "\n".join(lines)
+
+
+aggregator = AlertAggregator()
+
+
+def record_transition(
+    host_id: int,
+    name: str,
+    group: str | None,
+    previous: str | None,
+    status: str,
+    *,
+    address: str | None = None,
+    detail: str | None = None,
+    suppressed: bool = False,
+    alert_up: bool | None = None,
+):
+    """
+    Publishes a host's STATUS_CHANGE and queues its alert, for every path that decides
+    a host's status (scheduler, agents, heartbeats). Nothing is sent for UNREACHABLE or
+    during maintenance. `alert_up` decides whether an UP transition alerts; by default
+    it does, except coming back from UNREACHABLE, which the parent's recovery covers.
+    """
+    event_bus.publish(STATUS_CHANGE, host_id=host_id, name=name, previous=previous, status=status)
+    if suppressed or status == UNREACHABLE:
+        return
+    if alert_up is None:
+        alert_up = previous != UNREACHABLE
+    if status == "UP" and not alert_up:
+        return
+    icon = _ICONS.get(status, "")
+    target = f"{name} ({address})" if address else name
+    aggregator.add(
+        host_id,
+        name,
+        group,
+        status,
+        f"{icon} Host {name} is {status}",
+        f"Host: {target}\n{detail or f'State: {status}'}\n"
+        f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+    )
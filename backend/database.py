@@ -48,15 +48,56 @@ _MIGRATIONS = {
         ("heartbeat_interval", "INTEGER"),
         ("maintenance_start", "DATETIME"),
         ("maintenance_end", "DATETIME"),
+        ("parent_id", "INTEGER REFERENCES hosts(id)"),
+        ("dns_server", "VARCHAR"),
+        ("dns_record_type", "VARCHAR DEFAULT 'A'"),
+        ("dns_expected", "VARCHAR"),
+        ("probe_count", "INTEGER DEFAULT 1"),
+        ("http_match_type", "VARCHAR"),
+        ("http_match", "VARCHAR"),
+        ("http_json_path", "VARCHAR"),
+        ("http_max_bytes", "INTEGER"),
+    ],
+    "ping_results": [
+        ("vantage", "VARCHAR"),
+        ("sent", "INTEGER"),
+        ("received", "INTEGER"),
+        ("latency_min", "FLOAT"),
+        ("latency_max", "FLOAT"),
+        ("latency_stddev", "FLOAT"),
+        ("jitter", "FLOAT"),
+    ],
+    "daily_uptime": [
+        ("packets_sent", "INTEGER DEFAULT 0"),
+        ("packets_received", "INTEGER DEFAULT 0"),
+    ],
+    "public_ip_history": [
+        ("version", "INTEGER"),
     ],
     "speedtest_results": [
         ("server_id", "INTEGER"),
         ("server_name", "VARCHAR"),
         ("server_country", "VARCHAR"),
+        ("jitter", "FLOAT"),
+        ("download_latency", "FLOAT"),
+        ("upload_latency", "FLOAT"),
+        ("streams", "INTEGER"),
+        ("stream_mbps", "VARCHAR"),
     ],
 }
 
 
+# Secondary indexes added after the initial schema: (index_name, table, column).
+# Names match SQLAlchemy's `index=True` naming so create_all and migrate_db agree.
+_INDEX_MIGRATIONS = [
+    ("ix_hosts_last_status", "hosts", "last_status"),
+    ("ix_hosts_group_name", "hosts", "group_name"),
+    ("ix_hosts_monitor_type", "hosts", "monitor_type"),
+    ("ix_audit_log_action", "audit_log", "action"),
+    ("ix_hosts_parent_id", "hosts", "parent_id"),
+]
+
+
 def is_valid_identifier(name: str) -> bool:
     """Validates that a string is a valid SQL identifier (table or column name)."""
     return bool(re.match(r"^[a-zA-Z0-9_]+$", name))
@@ -91,6 +132,25 @@ def _add_column_if_missing(db, table: str, col: str, typedef: str):
             db.rollback()
 
 
+def _create_index_if_missing(db, name: str, table: str, col: str):
+    if not all(is_valid_identifier(x) for x in (name, table, col)):
+        logger.error(f"Invalid index definition: name='{name}', table='{table}', col='{col}'")
+        return
+
+    # Tables that don't exist yet get their indexes from create_all
+    try:
+        db.execute(text(f"SELECT 1 FROM {table} LIMIT 1"))
+    except OperationalError:
+        return
+
+    try:
+        db.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({col})"))
+        db.commit()
+    except OperationalError as e:
+        logger.error(f"Failed to create index '{name}' on '{table}': {e}")
+        db.rollback()
+
+
 def migrate_db():
     db = SessionLocal()
     try:
@@ -113,6 +173,9 @@ def migrate_db():
             for col, typedef in columns:
                 _add_column_if_missing(db, table, col, typedef)
 
+        for name, table, col in _INDEX_MIGRATIONS:
+            _create_index_if_missing(db, name, table, col)
+
     except Exception as e:
         logger.error(f"Migration failed: {e}")
     finally:
@@ -0,0 +1,110 @@
+import logging
+import threading
+
+import database
+from events import HOST_DELETED, HOST_UPDATED, STATUS_CHANGE, event_bus
+from models import HostDB, PingResultDB
+
+logger = logging.getLogger(__name__)
+
+UNREACHABLE = "UNREACHABLE"
+# A parent in one of these states makes its children unreachable
+_BLOCKING = {"DOWN", UNREACHABLE}
+
+
+class DependencyGraph:
+    """
+    In-memory parent/child map with each host's last status, kept current from bus events.
+    Lets the probe path decide in O(depth), without a query, whether a host is cut off
+    because an upstream host (e.g. its gateway) is down.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._parent: dict[int, int | None] = {}
+        self._status: dict[int, str] = {}
+        self._loaded = False
+        self._skipped_lock = threading.Lock()
+        self.skipped_probes = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    def load(self):
+        db = database.SessionLocal()
+        try:
+            rows = db.query(HostDB.id, HostDB.parent_id, HostDB.last_status).all()
+        finally:
+            db.close()
+        with self._lock:
+            self._parent = {r.id: r.parent_id for r in rows}
+            self._status = {r.id: r.last_status for r in rows}
+            self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def status(self, host_id: int) -> str | None:
+        self._ensure_loaded()
+        return self._status.get(host_id)
+
+    def blocking_ancestor(self, host_id: int) -> int | None:
+        """Nearest ancestor that is DOWN or UNREACHABLE, or None if the path is clear."""
+        self._ensure_loaded()
+        with self._lock:
+            seen = {host_id}
+            parent = self._parent.get(host_id)
+            while parent is not None and parent not in seen:
+                if self._status.get(parent) in _BLOCKING:
+                    return parent
+                seen.add(parent)
+                parent = self._parent.get(parent)
+        return None
+
+    def is_blocked(self, host_id: int) -> bool:
+        return self.blocking_ancestor(host_id) is not None
+
+    def count_skipped(self):
+        """Counts one probe skipped behind a failed parent (called from many job threads)."""
+        with self._skipped_lock:
+            self.skipped_probes += 1
+
+    def on_event(self, event: dict):
+        with self._lock:
+            if not self._loaded:
+                return
+            host_id = event["host_id"]
+            if event["type"] == STATUS_CHANGE:
+                self._status[host_id] = event["status"]
+            elif event["type"] == HOST_UPDATED:
+                if "parent_id" in event:
+                    self._parent[host_id] = event["parent_id"]
+                if "last_status" in event:
+                    self._status[host_id] = event["last_status"]
+            elif event["type"] == HOST_DELETED:
+                self._parent.pop(host_id, None)
+                self._status.pop(host_id, None)
+                for child, parent in self._parent.items():
+                    if parent == host_id:
+                        self._parent[child] = None
+
+
+def was_down(db, host_id: int) -> bool:
+    """
+    True if the host's latest recorded sample is a failure. UNREACHABLE hides whether a
+    host was DOWN before its parent failed; no samples are written while it is cut off,
+    so this is the state it was last seen in. Call it before writing the new sample.
+    """
+    row = (
+        db.query(PingResultDB.latency)
+        .filter(PingResultDB.host_id == host_id)
+        .order_by(PingResultDB.timestamp.desc(), PingResultDB.id.desc())
+        .first()
+    )
+    return row is not None and row.latency is None
+
+
+graph = DependencyGraph()
+event_bus.add_listener(graph.on_event, {STATUS_CHANGE, HOST_UPDATED, HOST_DELETED})
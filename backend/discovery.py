@@ -0,0 +1,271 @@
+import asyncio
+import ipaddress
+import logging
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import icmp
+
+logger = logging.getLogger(__name__)
+
+# Largest range one sweep may cover (a /20)
+DISCOVERY_MAX_HOSTS = int(os.getenv("DISCOVERY_MAX_HOSTS", "4096"))
+# Sweeps allowed to run at once across all clients of this process
+DISCOVERY_MAX_SWEEPS = int(os.getenv("DISCOVERY_MAX_SWEEPS", "2"))
+# TCP connects in flight per sweep
+DISCOVERY_CONCURRENCY = int(os.getenv("DISCOVERY_CONCURRENCY", "512"))
+# Echo requests per second, so a sweep can't flood the uplink or the neighbour table
+DISCOVERY_ICMP_RATE = int(os.getenv("DISCOVERY_ICMP_RATE", "2000"))
+DISCOVERY_TIMEOUT = float(os.getenv("DISCOVERY_TIMEOUT", "1.0"))
+DEFAULT_PORTS = [22, 53, 80, 443, 445, 3389, 8080]
+# Ports tried on addresses that don't answer pings; the full list only runs on live hosts
+LIVENESS_PORTS = (22, 80, 443)
+# Echo requests per silent address; the retry catches replies lost to ARP resolution
+ICMP_ATTEMPTS = 2
+# How often the stream reports progress while no hosts are being found
+PROGRESS_INTERVAL = 0.5
+
+_active = 0
+# Reverse lookups block; their own small pool keeps a slow resolver from tying up the shared one
+_name_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="discovery-ptr")
+
+
+def parse_network(cidr: str) -> ipaddress.IPv4Network:
+    """Raises ValueError for anything but an IPv4 range within DISCOVERY_MAX_HOSTS."""
+    network = ipaddress.ip_network(cidr.strip(), strict=False)
+    if network.version != 4:
+        raise ValueError("Only IPv4 ranges can be swept")
+    if network.num_addresses > DISCOVERY_MAX_HOSTS:
+        raise ValueError(f"Range is larger than {DISCOVERY_MAX_HOSTS} addresses")
+    return network
+
+
+class ICMPSweeper:
+    """
+    Pings many addresses through one non-blocking socket: requests go out at a paced
+    rate while a reader callback on the event loop matches replies by source address.
+    No thread per target, so a /22 costs one socket and a couple of seconds.
+    """
+
+    def __init__(self, addresses, timeout: float = DISCOVERY_TIMEOUT, rate: int = DISCOVERY_ICMP_RATE):
+        self.addresses = list(addresses)
+        self.timeout = timeout
+        self.rate = max(rate, 1)
+        self.ident = os.getpid() & 0xFFFF
+        self.sock, self.raw = icmp.open_socket()
+        if self.sock is not None:
+            try:
+                # Replies to a whole burst can arrive before the reader runs
+                self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+            except OSError:
+                pass
+        loop = asyncio.get_running_loop()
+        self.replies = {address: loop.create_future() for address in self.addresses}
+        self._sent_at: dict[str, float] = {}
+
+    @property
+    def available(self) -> bool:
+        return self.sock is not None
+
+    def _on_readable(self):
+        while True:
+            try:
+                data, (address, _) = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.debug(f"ICMP discovery receive error: {e}")
+                return
+            parsed = icmp.parse_echo_reply(data, self.raw)
+            # Ping sockets have the kernel pick and filter the identifier
+            if parsed is None or (self.raw and parsed[0] != self.ident):
+                continue
+            future = self.replies.get(address)
+            if future is not None and not future.done():
+                future.set_result((time.monotonic() - self._sent_at[address]) * 1000)
+
+    async def _send(self, address: str, seq: int):
+        packet = icmp.echo_request(self.ident, seq, b"netmon-discovery")
+        while True:
+            try:
+                self.sock.sendto(packet, (address, 0))
+                break
+            except BlockingIOError:
+                await asyncio.sleep(0.001)
+            except OSError as e:
+                # e.g. the broadcast address without SO_BROADCAST; counts as no reply
+                logger.debug(f"ICMP discovery send to {address} failed: {e}")
+                break
+        self._sent_at[address] = time.monotonic()
+
+    async def run(self):
+        """Resolves `replies[address]` with the RTT in ms, or None once it stays silent."""
+        loop = asyncio.get_running_loop()
+        if self.sock is None:
+            for future in self.replies.values():
+                future.set_result(None)
+            return
+        batch = max(self.rate // 100, 1)
+        loop.add_reader(self.sock.fileno(), self._on_readable)
+        try:
+            for attempt in range(ICMP_ATTEMPTS):
+                pending = [a for a in self.addresses if not self.replies[a].done()]
+                if not pending:
+                    break
+                for i, address in enumerate(pending):
+                    await self._send(address, (attempt << 12 | i) & 0xFFFF)
+                    if (i + 1) % batch == 0:
+                        await asyncio.sleep(0.01)
+                await asyncio.sleep(self.timeout)
+        finally:
+            loop.remove_reader(self.sock.fileno())
+            self.sock.close()
+            for future in self.replies.values():
+                if not future.done():
+                    future.set_result(None)
+
+
+async def check_port(address: str, port: int, timeout: float = DISCOVERY_TIMEOUT) -> bool | None:
+    """True if open, False if refused (the host is up), None on timeout or unreachable."""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(address, port), timeout)
+    except ConnectionRefusedError:
+        return False
+    except (asyncio.TimeoutError, OSError):
+        return None
+    writer.close()
+    return True
+
+
+async def _reverse_name(address: str, timeout: float) -> str | None:
+    loop = asyncio.get_running_loop()
+    try:
+        lookup = loop.run_in_executor(_name_executor, socket.gethostbyaddr, address)
+        return (await asyncio.wait_for(lookup, timeout))[0]
+    except (asyncio.TimeoutError, OSError):
+        return None
+
+
+def busy() -> bool:
+    return _active >= DISCOVERY_MAX_SWEEPS
+
+
+class Sweep:
+    """
+    Finds live hosts in a range with an ICMP sweep and TCP connects to `ports`, run
+    side by side. `events()` yields ("start" | "host" | "progress" | "done", payload)
+    as results come in. Everything runs on the event loop with bounded concurrency;
+    the scheduler's probe threads are never used. While ICMP works, addresses that
+    stay silent only get LIVENESS_PORTS, so dead space costs a few connects, not all.
+    """
+
+    def __init__(
+        self,
+        network: ipaddress.IPv4Network,
+        ports=DEFAULT_PORTS,
+        icmp: bool = True,
+        resolve_names: bool = True,
+        known: dict[str, int] | None = None,
+        timeout: float = DISCOVERY_TIMEOUT,
+        concurrency: int = DISCOVERY_CONCURRENCY,
+    ):
+        self.network = network
+        self.ports = sorted(set(ports))
+        self.icmp = icmp
+        self.resolve_names = resolve_names
+        self.known = known or {}
+        self.timeout = timeout
+        self.concurrency = concurrency
+
+    def addresses(self) -> list[str]:
+        return [str(a) for a in self.network.hosts()]
+
+    async def _scan(self, address: str, icmp: ICMPSweeper | None, connects: asyncio.Semaphore):
+        async def check(port):
+            async with connects:
+                return await check_port(address, port, self.timeout)
+
+        if icmp is not None and icmp.available:
+            first = [p for p in self.ports if p in LIVENESS_PORTS] or self.ports[:1]
+        else:
+            first = self.ports
+        rest = [p for p in self.ports if p not in first]
+        latency, *states = await asyncio.gather(
+            icmp.replies[address] if icmp is not None else asyncio.sleep(0),
+            *(check(port) for port in first),
+        )
+        # A refused connect (False) still proves the host is there
+        alive = latency is not None or any(state is not None for state in states)
+        if not alive:
+            return None
+        states += await asyncio.gather(*(check(port) for port in rest))
+        open_ports = sorted(port for port, state in zip(first + rest, states) if state)
+        hostname = await _reverse_name(address, self.timeout) if self.resolve_names else None
+        return {
+            "ip_address": address,
+            "hostname": hostname,
+            "latency": round(latency, 2) if latency is not None else None,
+            "open_ports": open_ports,
+            "monitored_id": self.known.get(address),
+        }
+
+    async def events(self):
+        global _active
+        if busy():
+            yield "error", {"detail": f"{DISCOVERY_MAX_SWEEPS} discovery sweeps are already running"}
+            return
+        _active += 1
+        started = time.monotonic()
+        addresses = self.addresses()
+        icmp = ICMPSweeper(addresses, self.timeout) if self.icmp else None
+        if icmp is not None and not icmp.available:
+            logger.warning("No ICMP socket available (needs CAP_NET_RAW or ping_group_range); TCP only")
+        connects = asyncio.Semaphore(self.concurrency)
+        tasks = []
+        try:
+            yield "start", {
+                "network": str(self.network),
+                "total": len(addresses),
+                "ports": self.ports,
+                "icmp": icmp is not None and icmp.available,
+            }
+            if icmp is not None:
+                tasks.append(asyncio.create_task(icmp.run()))
+            scans = [asyncio.create_task(self._scan(a, icmp, connects)) for a in addresses]
+            tasks.extend(scans)
+            done = found = 0
+            last_progress = time.monotonic()
+            for next_result in asyncio.as_completed(scans):
+                host = await next_result
+                done += 1
+                if host is not None:
+                    found += 1
+                    yield "host", host
+                if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = time.monotonic()
+                    yield "progress", {"done": done, "total": len(addresses), "found": found}
+            elapsed = round(time.monotonic() - started, 2)
+            logger.info(f"Discovery of {self.network}: {found}/{len(addresses)} hosts up in {elapsed}s")
+            yield "done", {"total": len(addresses), "found": found, "elapsed": elapsed}
+        finally:
+            # Client went away mid-sweep: stop probing and release the socket
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            _active -= 1
+
+
+def host_row(found: dict, group_name: str, interval: int) -> dict:
+    """Host fields for a discovered address: ICMP if it answered pings, else TCP on its first open port."""
+    row = {
+        "name": found.get("hostname") or found["ip_address"],
+        "ip_address": found["ip_address"],
+        "group_name": group_name,
+        "interval": interval,
+    }
+    if found.get("latency") is None and found.get("open_ports"):
+        row["monitor_type"] = "tcp"
+        row["port"] = found["open_ports"][0]
+    return row
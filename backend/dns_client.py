@@ -0,0 +1,144 @@
+import ipaddress
+import random
+import socket
+import struct
+
+# Record types this client can decode
+A = 1
+NS = 2
+CNAME = 5
+MX = 15
+TXT = 16
+AAAA = 28
+RECORD_TYPES = {"A": A, "NS": NS, "CNAME": CNAME, "MX": MX, "TXT": TXT, "AAAA": AAAA}
+
+RCODE_NAMES = {1: "FORMERR", 2: "SERVFAIL", 3: "NXDOMAIN", 4: "NOTIMP", 5: "REFUSED"}
+
+
+class DNSError(Exception):
+    """Raised for timeouts, malformed replies and non-zero response codes."""
+
+    def __init__(self, message: str, rcode: int | None = None):
+        super().__init__(message)
+        self.rcode = rcode
+
+
+def _encode_name(name: str) -> bytes:
+    out = b""
+    for label in name.rstrip(".").split("."):
+        if label:
+            out += bytes([len(label)]) + label.encode("idna")
+    return out + b"\0"
+
+
+def _read_name(packet: bytes, offset: int) -> tuple[str, int]:
+    """Decodes a (possibly compressed) name; returns it and the offset just past it."""
+    labels = []
+    end = None
+    for _ in range(128):  # bound on pointer chains
+        length = packet[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | packet[offset + 1]
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(packet[offset : offset + length].decode("ascii", "replace"))
+        offset += length
+    else:
+        raise DNSError("Name compression loop")
+    return ".".join(labels), end if end is not None else offset
+
+
+def _decode_rdata(packet: bytes, rtype: int, offset: int, length: int):
+    rdata = packet[offset : offset + length]
+    if rtype == A:
+        return str(ipaddress.IPv4Address(rdata))
+    if rtype == AAAA:
+        return str(ipaddress.IPv6Address(rdata))
+    if rtype in (NS, CNAME):
+        return _read_name(packet, offset)[0]
+    if rtype == MX:
+        return f"{struct.unpack('!H', rdata[:2])[0]} {_read_name(packet, offset + 2)[0]}"
+    if rtype == TXT:
+        parts, i = [], 0
+        while i < len(rdata):
+            size = rdata[i]
+            parts.append(rdata[i + 1 : i + 1 + size].decode("utf-8", "replace"))
+            i += 1 + size
+        return "".join(parts)
+    return rdata.hex()
+
+
+def build_query(name: str, rtype: int, query_id: int) -> bytes:
+    # Header: id, flags (recursion desired), 1 question, no answer/authority/additional
+    header = struct.pack("!HHHHHH", query_id, 0x0100, 1, 0, 0, 0)
+    return header + _encode_name(name) + struct.pack("!HH", rtype, 1)
+
+
+def parse_response(packet: bytes, query_id: int) -> list[dict]:
+    """
+    Returns answer records as {"name", "type", "ttl", "value"} dicts. Any reply that
+    can't be decoded raises DNSError, so callers can move on to the next server.
+    """
+    if len(packet) < 12:
+        raise DNSError("Short DNS reply")
+    rid, flags, qdcount, ancount, _, _ = struct.unpack("!HHHHHH", packet[:12])
+    if rid != query_id:
+        raise DNSError("Mismatched DNS reply id")
+    if flags & 0x0200:
+        raise DNSError("Truncated DNS reply")
+    rcode = flags & 0x000F
+    if rcode:
+        raise DNSError(RCODE_NAMES.get(rcode, f"rcode {rcode}"), rcode)
+    try:
+        return _read_answers(packet, qdcount, ancount)
+    except (struct.error, IndexError, ValueError) as e:
+        # Cut-off records and bad addresses (ipaddress raises ValueError subclasses)
+        raise DNSError(f"Malformed DNS reply: {e}") from e
+
+
+def _read_answers(packet: bytes, qdcount: int, ancount: int) -> list[dict]:
+    offset = 12
+    for _ in range(qdcount):
+        offset = _read_name(packet, offset)[1] + 4
+    answers = []
+    for _ in range(ancount):
+        name, offset = _read_name(packet, offset)
+        rtype, _, ttl, length = struct.unpack("!HHIH", packet[offset : offset + 10])
+        offset += 10
+        answers.append(
+            {
+                "name": name,
+                "type": rtype,
+                "ttl": ttl,
+                "value": _decode_rdata(packet, rtype, offset, length),
+            }
+        )
+        offset += length
+    return answers
+
+
+def query(name: str, rtype: int, server: str, timeout: float = 2.0, port: int = 53) -> list[dict]:
+    """
+    Sends one recursive query over UDP to `server` (an IPv4 or IPv6 address) and returns
+    its answers. The socket family follows the server address, which also decides which
+    source address "what is my IP" services see.
+    """
+    family = socket.AF_INET6 if ":" in server else socket.AF_INET
+    query_id = random.getrandbits(16)
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.sendto(build_query(name, rtype, query_id), (server, port))
+            while True:
+                packet, _ = sock.recvfrom(4096)
+                # Stray datagrams (e.g. a late reply to an earlier query) are skipped
+                if packet[:2] == struct.pack("!H", query_id):
+                    return parse_response(packet, query_id)
+        except TimeoutError as e:
+            raise DNSError(f"Timeout querying {server}") from e
+        except OSError as e:
+            raise DNSError(f"Cannot query {server}: {e}") from e
@@ -0,0 +1,176 @@
+import ipaddress
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from requests.adapters import HTTPAdapter
+
+import dns_client
+
+logger = logging.getLogger(__name__)
+
+# Resolvers queried directly so answers come with TTLs; defaults to /etc/resolv.conf
+DNS_CACHE_SERVERS = [s.strip() for s in os.getenv("DNS_CACHE_SERVERS", "").split(",") if s.strip()]
+DNS_CACHE_MIN_TTL = int(os.getenv("DNS_CACHE_MIN_TTL", "5"))
+DNS_CACHE_MAX_TTL = int(os.getenv("DNS_CACHE_MAX_TTL", "3600"))
+# TTL for answers from the system resolver (no TTL available) and for failed lookups
+FALLBACK_TTL = 60
+NEGATIVE_TTL = 30
+# Entries are refreshed in the background once this fraction of their TTL remains
+REFRESH_AHEAD = 0.1
+QUERY_TIMEOUT = 2.0
+
+
+def system_nameservers(path: str = "/etc/resolv.conf") -> list[str]:
+    servers = []
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == "nameserver":
+                    servers.append(parts[1].split("%")[0])
+    except OSError:
+        pass
+    return servers
+
+
+def is_ip(value: str) -> bool:
+    try:
+        ipaddress.ip_address(value)
+        return True
+    except ValueError:
+        return False
+
+
+class _Entry:
+    __slots__ = ("addresses", "error", "expires", "ttl", "refreshing")
+
+    def __init__(self, addresses, error, ttl):
+        self.addresses = addresses
+        self.error = error
+        self.ttl = ttl
+        self.expires = time.monotonic() + ttl
+        self.refreshing = False
+
+
+class DNSCache:
+    """
+    Process-wide hostname cache shared by all probes. Answers are kept for their record
+    TTL; entries close to expiry are served while a background thread refreshes them,
+    and concurrent misses for the same name share a single lookup.
+    """
+
+    def __init__(self, servers: list[str] | None = None):
+        self.servers = servers if servers is not None else (DNS_CACHE_SERVERS or system_nameservers())
+        self._lock = threading.Lock()
+        self._entries: dict[str, _Entry] = {}
+        self._inflight: dict[str, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dns-cache")
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def resolve(self, host: str) -> str:
+        """First address for `host` (IPv4 preferred). Raises socket.gaierror if it doesn't resolve."""
+        return self.resolve_all(host)[0]
+
+    def resolve_all(self, host: str) -> list[str]:
+        if is_ip(host):
+            return [host]
+        key = host.lower().rstrip(".")
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry.expires:
+                self.hits += 1
+                if not entry.refreshing and entry.expires - now < entry.ttl * REFRESH_AHEAD:
+                    entry.refreshing = True
+                    self.refreshes += 1
+                    self._executor.submit(self._fill, key)
+                if entry.error is not None:
+                    raise entry.error
+                return entry.addresses
+            self.misses += 1
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if owner:
+            try:
+                future.set_result(self._fill(key))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+        entry = future.result()
+        if entry.error is not None:
+            raise entry.error
+        return entry.addresses
+
+    def _fill(self, key: str) -> _Entry:
+        try:
+            addresses, ttl = self._lookup(key)
+            entry = _Entry(addresses, None, ttl)
+        except socket.gaierror as e:
+            entry = _Entry([], e, NEGATIVE_TTL)
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def _lookup(self, host: str) -> tuple[list[str], int]:
+        # Single-label and mDNS names only exist for the system resolver (hosts file, search domains)
+        if "." in host and not host.endswith(".local"):
+            for server in self.servers:
+                try:
+                    for rtype in (dns_client.A, dns_client.AAAA):
+                        answers = dns_client.query(host, rtype, server, timeout=QUERY_TIMEOUT)
+                        addresses = [a["value"] for a in answers if a["type"] == rtype]
+                        if addresses:
+                            # A CNAME chain is only valid as long as its shortest TTL
+                            ttl = min(a["ttl"] for a in answers)
+                            return addresses, max(DNS_CACHE_MIN_TTL, min(ttl, DNS_CACHE_MAX_TTL))
+                    break
+                except dns_client.DNSError as e:
+                    if e.rcode == 3:  # NXDOMAIN: may still be a hosts-file name
+                        break
+                    logger.debug(f"DNS query for {host} via {server} failed: {e}")
+        infos = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+        ordered = sorted(infos, key=lambda info: info[0] != socket.AF_INET)
+        addresses = list(dict.fromkeys(info[4][0] for info in ordered))
+        return addresses, FALLBACK_TTL
+
+
+class CachedDNSAdapter(HTTPAdapter):
+    """
+    requests adapter that connects to the cached address while keeping the hostname for
+    the Host header, TLS SNI and certificate checks.
+    """
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(
+            request, verify, cert
+        )
+        hostname = host_params["host"]
+        if not is_ip(hostname.strip("[]")):
+            host_params = dict(host_params, host=cache.resolve(hostname))
+            if host_params["scheme"] == "https":
+                pool_kwargs = dict(pool_kwargs, server_hostname=hostname, assert_hostname=hostname)
+        return host_params, pool_kwargs
+
+    def send(self, request, **kwargs):
+        parsed = urlparse(request.url)
+        if parsed.hostname and not is_ip(parsed.hostname) and "Host" not in request.headers:
+            request.headers["Host"] = parsed.netloc.rpartition("@")[2]
+        return super().send(request, **kwargs)
+
+
+cache = DNSCache()
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Event types published by the probe and heartbeat paths
+PROBE_RESULT = "probe_result"
+STATUS_CHANGE = "status_change"
+# Host configuration changes (API edits, recalculated averages)
+HOST_UPDATED = "host_updated"
+HOST_DELETED = "host_deleted"
+# Alert rule definitions were created, edited or removed
+RULES_CHANGED = "rules_changed"
+# Recurring maintenance schedules were created, edited or removed
+MAINTENANCE_CHANGED = "maintenance_changed"
+# A probe agent joined or left, so hosts were resharded
+AGENTS_CHANGED = "agents_changed"
+# Settings (e.g. the notification URL) were edited
+SETTINGS_CHANGED = "settings_changed"
+# An API process changed hosts or agents; whichever process runs the scheduler resyncs
+RESYNC_REQUESTED = "resync_requested"
+# A traceroute monitor's path differs from its previous trace
+ROUTE_CHANGED = "route_changed"
+
+
+class Subscription:
+    """Bounded, asyncio-readable view of the bus for a single consumer (e.g. one SSE client)."""
+
+    def __init__(self, bus, loop, event_types=None, maxsize: int = 1000):
+        self._bus = bus
+        self._loop = loop
+        self.event_types = set(event_types) if event_types else None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def wants(self, event: dict) -> bool:
+        return self.event_types is None or event["type"] in self.event_types
+
+    def _deliver(self, event: dict):
+        """Runs on the subscriber's event loop. Slow consumers lose events instead of blocking publishers."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def get(self, timeout: float | None = None):
+        """Next event, or None if nothing arrived within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self._bus.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Transport:
+    """
+    Cross-process fan-out for the event bus.
+    `send` ships a locally published event to peers; remote events are handed to the
+    callback given to `start`. The default transport is in-process only.
+    """
+
+    def start(self, on_event):
+        pass
+
+    def send(self, event: dict):
+        pass
+
+    def stop(self):
+        pass
+
+
+class UDPTransport(Transport):
+    """JSON datagrams to a fixed peer list — enough for a handful of local worker processes."""
+
+    def __init__(self, bind: tuple[str, int] | None, peers: list[tuple[str, int]]):
+        self.bind = bind
+        self.peers = peers
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._on_event = None
+        self._thread = None
+        self._running = False
+
+    def start(self, on_event):
+        self._on_event = on_event
+        if not self.bind:
+            return
+        self._sock.bind(self.bind)
+        self._sock.settimeout(0.5)
+        self._running = True
+        self._thread = threading.Thread(target=self._recv_loop, name="event-bus-udp", daemon=True)
+        self._thread.start()
+
+    @property
+    def address(self):
+        return self._sock.getsockname()
+
+    def _recv_loop(self):
+        while self._running:
+            try:
+                data, _ = self._sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                self._on_event(json.loads(data))
+            except Exception as e:
+                logger.warning(f"Dropping malformed event datagram: {e}")
+
+    def send(self, event: dict):
+        data = json.dumps(event, default=str).encode()
+        for peer in self.peers:
+            try:
+                self._sock.sendto(data, peer)
+            except OSError as e:
+                logger.warning(f"Failed to forward event to {peer}: {e}")
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2)
+        self._sock.close()
+
+
+class EventBus:
+    """
+    In-process publish/subscribe hub for probe results and status transitions.
+    Publishers may run on any thread (scheduler jobs, sync request handlers).
+    Sync listeners are called inline; async subscriptions are fed via their own loop.
+    """
+
+    def __init__(self, transport: Transport | None = None):
+        self.origin = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._subscriptions: set[Subscription] = set()
+        self._listeners: list[tuple[object, set | None]] = []
+        self.transport = transport or Transport()
+        self.transport.start(self._receive)
+
+    def set_transport(self, transport: Transport):
+        self.transport.stop()
+        self.transport = transport
+        self.transport.start(self._receive)
+
+    def publish(self, event_type: str, **payload) -> dict:
+        event = {"type": event_type, "ts": time.time(), "origin": self.origin, **payload}
+        self._dispatch(event)
+        try:
+            self.transport.send(event)
+        except Exception as e:
+            logger.error(f"Event transport error: {e}")
+        return event
+
+    def _receive(self, event: dict):
+        # Our own events come back when a peer list includes ourselves; they were already dispatched.
+        if event.get("origin") == self.origin:
+            return
+        self._dispatch(event)
+
+    def _dispatch(self, event: dict):
+        with self._lock:
+            listeners = list(self._listeners)
+            subscriptions = list(self._subscriptions)
+
+        for callback, event_types in listeners:
+            if event_types is not None and event["type"] not in event_types:
+                continue
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Event listener error: {e}")
+
+        for sub in subscriptions:
+            if not sub.wants(event):
+                continue
+            try:
+                sub._loop.call_soon_threadsafe(sub._deliver, event)
+            except RuntimeError:
+                # Subscriber's loop is closed — it will never read again.
+                self.unsubscribe(sub)
+
+    def subscribe(self, event_types=None, maxsize: int = 1000) -> Subscription:
+        """Must be called from a running event loop."""
+        sub = Subscription(self, asyncio.get_running_loop(), event_types, maxsize)
+        with self._lock:
+            self._subscriptions.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscriptions.discard(sub)
+
+    def add_listener(self, callback, event_types=None):
+        """Registers a synchronous callback, invoked on the publisher's thread."""
+        with self._lock:
+            self._listeners.append((callback, set(event_types) if event_types else None))
+
+    def remove_listener(self, callback):
+        with self._lock:
+            self._listeners = [(cb, t) for cb, t in self._listeners if cb != callback]
+
+
+def _parse_addr(value: str) -> tuple[str, int]:
+    host, _, port = value.strip().rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def configure_from_env(bus: "EventBus"):
+    """
+    Enables the UDP transport when EVENT_BUS_BIND and/or EVENT_BUS_PEERS are set,
+    e.g. EVENT_BUS_BIND=127.0.0.1:8765 EVENT_BUS_PEERS=127.0.0.1:8766,127.0.0.1:8767
+    """
+    bind = os.getenv("EVENT_BUS_BIND")
+    peers = os.getenv("EVENT_BUS_PEERS")
+    if not bind and not peers:
+        return
+    try:
+        transport = UDPTransport(
+            _parse_addr(bind) if bind else None,
+            [_parse_addr(p) for p in peers.split(",") if p.strip()] if peers else [],
+        )
+        bus.set_transport(transport)
+        logger.info(f"Event bus UDP transport enabled (bind={bind}, peers={peers})")
+    except Exception as e:
+        logger.error(f"Failed to configure event bus transport: {e}")
+
+
+event_bus = EventBus()
@@ -0,0 +1,223 @@
+import logging
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+import maintenance
+from events import HOST_DELETED, HOST_UPDATED, STATUS_CHANGE, event_bus
+from models import HostDB
+
+logger = logging.getLogger(__name__)
+
+# Host attributes the tracker needs, keyed by the names used in bus events
+_HOST_FIELDS = (
+    "group_name",
+    "enabled",
+    "maintenance",
+    "last_status",
+    "average_latency",
+    "maintenance_window",
+)
+_STATUS_BUCKETS = ("up", "down", "unreachable", "unknown")
+
+
+def _new_group(name: str) -> dict:
+    return {
+        "group": name,
+        "total": 0,
+        "up": 0,
+        "down": 0,
+        "maintenance": 0,
+        "unreachable": 0,
+        "unknown": 0,
+        "latency_sum": 0.0,
+        "latency_count": 0,
+    }
+
+
+def _bucket(host: dict) -> str:
+    if host["maintenance"]:
+        return "maintenance"
+    return {"UP": "up", "DOWN": "down", "UNREACHABLE": "unreachable"}.get(host["last_status"], "unknown")
+
+
+def _window_open(host: dict, now: float) -> bool:
+    start, end = host["maintenance_window"]
+    return start <= now <= end
+
+
+class GroupStatusTracker:
+    """
+    Per-group host counters kept current from bus events, so the overview is O(groups).
+    The first read (or a read after an event for an unknown host) rebuilds from HostDB.
+    Counters follow the manual maintenance flag; time-based windows (one-off and
+    recurring) open and close on their own, so they are applied when a snapshot is read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._hosts: dict[int, dict] = {}
+        self._groups: dict[str, dict] = {}
+        # Hosts with a one-off maintenance window, checked against the clock on read
+        self._windowed: set[int] = set()
+        # Events that arrive while a load is querying, replayed onto its result
+        self._backlog: list[tuple] | None = None
+        self._loaded = False
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    def load(self, db: Session):
+        with self._load_lock:
+            with self._lock:
+                self._backlog = []
+            try:
+                rows = db.query(
+                    HostDB.id,
+                    HostDB.group_name,
+                    HostDB.enabled,
+                    HostDB.maintenance,
+                    HostDB.last_status,
+                    HostDB.average_latency,
+                    HostDB.maintenance_start,
+                    HostDB.maintenance_end,
+                ).all()
+            except Exception:
+                with self._lock:
+                    self._backlog = None
+                raise
+            with self._lock:
+                self._hosts = {}
+                self._groups = {}
+                self._windowed = set()
+                for row in rows:
+                    host = {f: getattr(row, f) for f in _HOST_FIELDS if f != "maintenance_window"}
+                    host["maintenance_window"] = maintenance.one_off_window(row)
+                    self._add(row.id, host)
+                self._loaded = True
+                # Updates carry absolute values, so replaying one the query already saw is harmless
+                backlog, self._backlog = self._backlog, None
+                for op, host_id, fields in backlog:
+                    if op == "update":
+                        self._update(host_id, fields)
+                    else:
+                        self._remove(host_id)
+
+    def _apply(self, host: dict, sign: int):
+        if not host["enabled"]:
+            return
+        name = host["group_name"] or "General"
+        group = self._groups.setdefault(name, _new_group(name))
+        bucket = _bucket(host)
+        group["total"] += sign
+        group[bucket] += sign
+        if bucket == "up" and host["average_latency"] is not None:
+            group["latency_sum"] += sign * host["average_latency"]
+            group["latency_count"] += sign
+        if group["total"] == 0:
+            del self._groups[name]
+
+    def _add(self, host_id: int, host: dict):
+        self._hosts[host_id] = host
+        self._apply(host, 1)
+        if host.get("maintenance_window"):
+            self._windowed.add(host_id)
+        else:
+            self._windowed.discard(host_id)
+
+    def _update(self, host_id: int, fields: dict):
+        host = self._hosts.get(host_id)
+        if host is None:
+            if all(f in fields for f in _HOST_FIELDS if f != "maintenance_window"):
+                self._add(host_id, {f: fields.get(f) for f in _HOST_FIELDS})
+            else:
+                # Partial update for a host we've never seen — resync on next read
+                self._loaded = False
+            return
+        self._apply(host, -1)
+        host.update((k, v) for k, v in fields.items() if k in _HOST_FIELDS)
+        self._add(host_id, host)
+
+    def _remove(self, host_id: int):
+        host = self._hosts.pop(host_id, None)
+        self._windowed.discard(host_id)
+        if host is not None:
+            self._apply(host, -1)
+
+    def update_host(self, host_id: int, **fields):
+        with self._lock:
+            if self._backlog is not None:
+                self._backlog.append(("update", host_id, fields))
+            elif self._loaded:
+                self._update(host_id, fields)
+
+    def remove_host(self, host_id: int):
+        with self._lock:
+            if self._backlog is not None:
+                self._backlog.append(("remove", host_id, None))
+            else:
+                self._remove(host_id)
+
+    def on_event(self, event: dict):
+        if event["type"] == STATUS_CHANGE:
+            self.update_host(event["host_id"], last_status=event["status"])
+        elif event["type"] == HOST_UPDATED:
+            self.update_host(
+                event["host_id"], **{k: v for k, v in event.items() if k in _HOST_FIELDS}
+            )
+        elif event["type"] == HOST_DELETED:
+            self.remove_host(event["host_id"])
+
+    @staticmethod
+    def _count_as_maintenance(group: dict, host: dict):
+        """Moves a host counted under its status into maintenance, for one snapshot."""
+        bucket = _bucket(host)
+        group[bucket] -= 1
+        group["maintenance"] += 1
+        if bucket == "up" and host["average_latency"] is not None:
+            group["latency_sum"] -= host["average_latency"]
+            group["latency_count"] -= 1
+
+    def snapshot(self, db: Session, now: float | None = None) -> list[dict]:
+        now = time.time() if now is None else now
+        if not self._loaded:
+            self.load(db)
+        scopes = maintenance.index.active_scopes(now)
+        with self._lock:
+            groups = {name: dict(g) for name, g in self._groups.items()}
+            covered = {h for h in self._windowed if _window_open(self._hosts[h], now)}
+            covered |= {key[1] for key in scopes if key[0] == "host" and key[1] in self._hosts}
+            hosts = [dict(self._hosts[host_id]) for host_id in covered]
+
+        for name, g in groups.items():
+            if ("all",) in scopes or ("group", name) in scopes:
+                # A window over the whole group: everything enabled in it is in maintenance
+                for bucket in _STATUS_BUCKETS:
+                    g[bucket] = 0
+                g["maintenance"] = g["total"]
+                g["latency_sum"] = 0.0
+                g["latency_count"] = 0
+        for host in hosts:
+            name = host["group_name"] or "General"
+            if (
+                host["enabled"]
+                and not host["maintenance"]
+                and ("all",) not in scopes
+                and ("group", name) not in scopes
+            ):
+                self._count_as_maintenance(groups[name], host)
+
+        result = []
+        for g in sorted(groups.values(), key=lambda g: g["group"]):
+            latency_count = g.pop("latency_count")
+            latency_sum = g.pop("latency_sum")
+            g["avg_latency"] = latency_sum / latency_count if latency_count > 0 else 0
+            result.append(g)
+        return result
+
+
+tracker = GroupStatusTracker()
+event_bus.add_listener(tracker.on_event, {STATUS_CHANGE, HOST_UPDATED, HOST_DELETED})
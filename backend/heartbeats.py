@@ -0,0 +1,507 @@
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import func, insert
+
+import alerts
+import database
+import dependencies
+import maintenance
+import uptime
+from events import HOST_DELETED, HOST_UPDATED, PROBE_RESULT, event_bus
+from models import HostDB, PingResultDB
+
+logger = logging.getLogger(__name__)
+
+# Received heartbeats are written at most this often...
+HEARTBEAT_FLUSH_INTERVAL = float(os.getenv("HEARTBEAT_FLUSH_INTERVAL", "1"))
+# ...or as soon as this many are buffered
+HEARTBEAT_BATCH_SIZE = int(os.getenv("HEARTBEAT_BATCH_SIZE", "2000"))
+# Heartbeats kept for retry while the database is failing; the oldest are dropped beyond this
+HEARTBEAT_MAX_PENDING = int(os.getenv("HEARTBEAT_MAX_PENDING", "50000"))
+# Latency recorded for a push that doesn't report its own duration
+DEFAULT_LATENCY = 0.1
+# A heartbeat host goes DOWN once heartbeat_interval * (1 + ratio) passes without a push
+HEARTBEAT_GRACE_RATIO = float(os.getenv("HEARTBEAT_GRACE_RATIO", "1.0"))
+
+
+def timeout_window(monitor_type: str | None, interval: int | None) -> float | None:
+    """Seconds of silence before a heartbeat host is DOWN; None for hosts without a timeout."""
+    if monitor_type != "heartbeat" or not interval:
+        return None
+    return interval * (1 + HEARTBEAT_GRACE_RATIO)
+
+
+class HeartbeatIngest:
+    """
+    Heartbeat fast path: slugs resolve from an in-memory map (a miss checks the DB) and
+    pushes are buffered, then written by a flusher thread in one transaction per batch. Until `start()` is
+    called (scripts, tests) every push is written inline.
+
+    Timeouts use a min-heap of per-host deadlines that each push re-arms; the same
+    thread wakes at the earliest deadline, so no polling or DB scan is involved.
+    Every API process buffers its own pushes, but only the leader (`start_expiry()`)
+    marks hosts DOWN; pushes other processes received are seen in the DB at expiry.
+    A silent host keeps a deadline every heartbeat_interval, one failed sample per slot.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slugs: dict[str, dict] | None = None
+        self._pending: list[tuple] = []
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._flusher = None
+        self._flush_lock = threading.Lock()
+        # host_id -> current deadline; heap entries not matching it are stale and skipped
+        self._deadlines: dict[int, float] = {}
+        self._heap: list[tuple[float, int]] = []
+        # host_id -> deadline that just lapsed, checked against the DB before expiring
+        self._lapsed: dict[int, float] = {}
+        # host_id -> when its last deadline expired, for hosts re-armed to the next missed slot
+        self._missed: dict[int, datetime] = {}
+        self.expiring = False
+        self.received = 0
+        self.written = 0
+        self.flushes = 0
+        self.expired = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None and self._flusher.is_alive()
+
+    # --- slug map ------------------------------------------------------
+
+    def invalidate(self):
+        with self._lock:
+            self._slugs = None
+
+    @staticmethod
+    def _slug_query(db):
+        return db.query(
+            HostDB.id,
+            HostDB.name,
+            HostDB.heartbeat_slug,
+            HostDB.monitor_type,
+            HostDB.heartbeat_interval,
+        ).filter(HostDB.heartbeat_slug != None, HostDB.enabled == True)
+
+    @staticmethod
+    def _entry(row) -> dict:
+        return {
+            "id": row.id,
+            "name": row.name,
+            "window": timeout_window(row.monitor_type, row.heartbeat_interval),
+        }
+
+    def load(self):
+        db = database.SessionLocal()
+        try:
+            rows = self._slug_query(db).all()
+        finally:
+            db.close()
+        slugs = {r.heartbeat_slug: self._entry(r) for r in rows}
+        with self._lock:
+            self._slugs = slugs
+        return slugs
+
+    def resolve(self, slug: str) -> dict | None:
+        slugs = self._slugs
+        if slugs is None:
+            slugs = self.load()
+        entry = slugs.get(slug)
+        if entry is None:
+            # Possibly created through another process whose event never reached this one
+            entry = self._lookup(slug)
+        return entry
+
+    def _lookup(self, slug: str) -> dict | None:
+        db = database.SessionLocal()
+        try:
+            row = self._slug_query(db).filter(HostDB.heartbeat_slug == slug).first()
+        finally:
+            db.close()
+        if row is None:
+            return None
+        entry = self._entry(row)
+        with self._lock:
+            if self._slugs is not None:
+                self._slugs[slug] = entry
+        return entry
+
+    def on_event(self, event: dict):
+        host_id = event["host_id"]
+        if event["type"] == HOST_DELETED:
+            self._forget_slug(host_id)
+            self.disarm(host_id)
+        elif "monitor_type" in event:
+            # Full host edits (from the API); periodic partial updates don't touch slugs
+            window = timeout_window(event["monitor_type"], event.get("heartbeat_interval"))
+            self._forget_slug(host_id)
+            enabled = event.get("enabled", True)
+            with self._lock:
+                if self._slugs is not None and enabled and event.get("heartbeat_slug"):
+                    self._slugs[event["heartbeat_slug"]] = {
+                        "id": host_id,
+                        "name": event.get("name"),
+                        "window": window,
+                    }
+            if enabled and window:
+                self.arm(host_id, time.time() + window)
+            else:
+                self.disarm(host_id)
+
+    def _forget_slug(self, host_id: int):
+        with self._lock:
+            if self._slugs is not None:
+                self._slugs = {k: v for k, v in self._slugs.items() if v["id"] != host_id}
+
+    # --- deadlines -----------------------------------------------------
+
+    def arm(self, host_id: int, deadline: float, missed_at: datetime | None = None):
+        """
+        Sets the host's deadline. `missed_at` marks a re-arm after an expiry rather than
+        a push: only a ping newer than it shows the host came back.
+        """
+        with self._lock:
+            earliest = self._heap[0][0] if self._heap else None
+            self._deadlines[host_id] = deadline
+            if missed_at is None:
+                self._missed.pop(host_id, None)
+            else:
+                self._missed[host_id] = missed_at
+            heapq.heappush(self._heap, (deadline, host_id))
+            # Re-arming leaves stale entries behind; rebuild once they dominate the heap
+            if len(self._heap) > 2 * len(self._deadlines) + 1024:
+                self._heap = [(d, h) for h, d in self._deadlines.items()]
+                heapq.heapify(self._heap)
+        if earliest is not None and deadline < earliest:
+            self._wake.set()
+
+    def disarm(self, host_id: int):
+        with self._lock:
+            self._deadlines.pop(host_id, None)
+            self._missed.pop(host_id, None)
+
+    def next_deadline(self) -> float | None:
+        with self._lock:
+            while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def load_deadlines(self, now: float | None = None):
+        """Arms every enabled heartbeat host from its last recorded ping (one query, at start)."""
+        now = time.time() if now is None else now
+        db = database.SessionLocal()
+        try:
+            hosts = (
+                db.query(HostDB.id, HostDB.monitor_type, HostDB.heartbeat_interval)
+                .filter(HostDB.monitor_type == "heartbeat", HostDB.enabled == True)
+                .all()
+            )
+            last_seen = dict(
+                db.query(PingResultDB.host_id, func.max(PingResultDB.timestamp))
+                .filter(PingResultDB.host_id.in_([h.id for h in hosts]))
+                .group_by(PingResultDB.host_id)
+                .all()
+            )
+        finally:
+            db.close()
+        # Ping timestamps are naive UTC; shift them onto the epoch clock used for deadlines
+        offset = now - datetime.utcnow().timestamp()
+        for host in hosts:
+            window = timeout_window(host.monitor_type, host.heartbeat_interval)
+            if not window:
+                continue
+            last = last_seen.get(host.id)
+            # Hosts that never pushed get a full window from startup
+            start = last.timestamp() + offset if last is not None else now
+            self.arm(host.id, start + window)
+
+    def expire_due(self, now: float | None = None) -> list[int]:
+        """Marks hosts whose deadline has passed DOWN (or UNREACHABLE behind a failed parent)."""
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, host_id = heapq.heappop(self._heap)
+                if self._deadlines.get(host_id) == deadline:
+                    del self._deadlines[host_id]
+                    self._lapsed[host_id] = deadline
+                    due.append(host_id)
+        if due:
+            self.expired += len(due)
+            self._expire(due)
+        return due
+
+    def _expire(self, host_ids: list[int]):
+        """
+        Records a missed heartbeat for each silent host: a NULL-latency ping and a down
+        uptime sample (none behind a failed parent, as for probed hosts). The host is then
+        re-armed one heartbeat_interval later, so every further missed slot is recorded too.
+        """
+        transitions = []
+        db = database.SessionLocal()
+        try:
+            hosts = (
+                db.query(HostDB).filter(HostDB.id.in_(host_ids), HostDB.enabled == True).all()
+            )
+            lapsed = {host_id: self._lapsed.pop(host_id, None) for host_id in host_ids}
+            hosts = self._still_silent(db, hosts, lapsed)
+            # Evaluated before any write: both may reload their caches in their own session
+            suppressed = {host.id: maintenance.in_maintenance(host) for host in hosts}
+            blocked = {host.id: dependencies.graph.is_blocked(host.id) for host in hosts}
+            now = datetime.utcnow()
+            missed = []
+            for host in hosts:
+                status = dependencies.UNREACHABLE if blocked[host.id] else "DOWN"
+                if status == "DOWN":
+                    missed.append({"host_id": host.id, "timestamp": now, "latency": None})
+                    uptime.record_sample(
+                        db,
+                        host.id,
+                        False,
+                        timestamp=now,
+                        max_gap=uptime.max_gap_for(host.heartbeat_interval),
+                        in_maintenance=suppressed[host.id],
+                    )
+                if host.last_status != status:
+                    transitions.append((host, host.last_status, status, suppressed[host.id]))
+                    host.last_status = status
+            if missed:
+                db.execute(insert(PingResultDB), missed)
+            db.commit()
+
+            clock = time.time()
+            for host in hosts:
+                if host.heartbeat_interval:
+                    # At most one slot is caught up at once after a stall
+                    slot = max(lapsed.get(host.id) or clock, clock - host.heartbeat_interval)
+                    self.arm(host.id, slot + host.heartbeat_interval, missed_at=now)
+
+            for host, previous, status, in_maintenance in transitions:
+                alerts.record_transition(
+                    host.id,
+                    host.name,
+                    host.group_name,
+                    previous,
+                    status,
+                    detail=f"Heartbeat missed (expected every {host.heartbeat_interval}s).",
+                    suppressed=in_maintenance,
+                )
+        except Exception as e:
+            logger.error(f"Error expiring heartbeats: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def _still_silent(self, db, hosts: list[HostDB], lapsed: dict[int, float]) -> list[HostDB]:
+        """
+        Drops hosts with a ping newer than the push that armed their lapsed deadline
+        (received by another API process) and re-arms them from that ping instead.
+        For a missed-slot deadline the reference is the previous expiry, whose own
+        NULL ping must not count as a push.
+        """
+        last_seen = dict(
+            db.query(PingResultDB.host_id, func.max(PingResultDB.timestamp))
+            .filter(PingResultDB.host_id.in_(list(lapsed)))
+            .group_by(PingResultDB.host_id)
+            .all()
+        )
+        with self._lock:
+            missed = {host.id: self._missed.get(host.id) for host in hosts}
+        offset = time.time() - datetime.utcnow().timestamp()
+        silent = []
+        for host in hosts:
+            window = timeout_window(host.monitor_type, host.heartbeat_interval)
+            last = last_seen.get(host.id)
+            if window and lapsed.get(host.id) is not None and last is not None:
+                pushed = last.timestamp() + offset
+                if missed[host.id] is not None:
+                    newer = last > missed[host.id]
+                else:
+                    # 1s of slack: a local push is stamped just before its deadline is armed
+                    newer = pushed > lapsed[host.id] - window + 1
+                if newer:
+                    self.arm(host.id, pushed + window)
+                    continue
+            silent.append(host)
+        return silent
+
+    # --- ingestion -----------------------------------------------------
+
+    def push(self, slug: str, status: str = "up", duration_ms: float | None = None) -> dict | None:
+        """Buffers one heartbeat. Returns the host it belongs to, or None for an unknown slug."""
+        host = self.resolve(slug)
+        if host is None:
+            return None
+        is_up = status == "up"
+        latency = (duration_ms if duration_ms is not None else DEFAULT_LATENCY) if is_up else None
+        with self._lock:
+            self._pending.append((host["id"], datetime.utcnow(), latency, is_up))
+            self.received += 1
+            backlog = len(self._pending)
+        if host["window"]:
+            self.arm(host["id"], time.time() + host["window"])
+        if not self.running:
+            self.flush()
+        elif backlog >= HEARTBEAT_BATCH_SIZE:
+            self._wake.set()
+        return host
+
+    def start_expiry(self):
+        """Makes this process the one that turns missed deadlines into DOWN."""
+        self.load_deadlines()
+        self.expiring = True
+        self._wake.set()
+
+    def stop_expiry(self):
+        self.expiring = False
+
+    def start(self):
+        if self.running:
+            return
+        self._stopping.clear()
+        self._flusher = threading.Thread(
+            target=self._flush_loop, name="heartbeat-flusher", daemon=True
+        )
+        self._flusher.start()
+        logger.info("Heartbeat ingestion started.")
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stopping.set()
+        self._wake.set()
+        self._flusher.join(timeout=5)
+        self._flusher = None
+        # Anything pushed while the flusher was exiting
+        self.flush()
+
+    def _flush_loop(self):
+        while not self._stopping.is_set():
+            wait = HEARTBEAT_FLUSH_INTERVAL
+            deadline = self.next_deadline() if self.expiring else None
+            if deadline is not None:
+                wait = min(wait, max(deadline - time.time(), 0))
+            self._wake.wait(timeout=wait)
+            self._wake.clear()
+            try:
+                # Flush first so a push that just arrived is never expired
+                self.flush()
+                if self.expiring:
+                    self.expire_due()
+            except Exception as e:
+                logger.error(f"Heartbeat flush error: {e}")
+
+    def flush(self):
+        """
+        Writes buffered heartbeats in one transaction, then publishes their events.
+        A failed write puts the batch back in front of newer pushes for the next flush.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+
+            by_host = defaultdict(list)
+            for sample in batch:
+                by_host[sample[0]].append(sample)
+
+            transitions = []
+            db = database.SessionLocal()
+            try:
+                hosts = db.query(HostDB).filter(HostDB.id.in_(list(by_host))).all()
+                # Evaluated before any write: a stale maintenance index reloads in its own session
+                suppressed = {host.id: maintenance.in_maintenance(host) for host in hosts}
+                # A first push isn't a recovery; one after UNREACHABLE is if the host was DOWN
+                alert_up = {
+                    host.id: host.last_status == "DOWN"
+                    or (
+                        host.last_status == dependencies.UNREACHABLE
+                        and dependencies.was_down(db, host.id)
+                    )
+                    for host in hosts
+                }
+                db.execute(
+                    insert(PingResultDB),
+                    [{"host_id": h, "timestamp": ts, "latency": lat} for h, ts, lat, _ in batch],
+                )
+                for host in hosts:
+                    # Every sample in push order, so a DOWN and the UP after it both count
+                    for _, ts, _, is_up in by_host[host.id]:
+                        uptime.record_sample(
+                            db,
+                            host.id,
+                            is_up,
+                            timestamp=ts,
+                            max_gap=uptime.max_gap_for(host.heartbeat_interval),
+                            in_maintenance=suppressed[host.id],
+                        )
+                        status = "UP" if is_up else "DOWN"
+                        if host.last_status != status:
+                            transitions.append(
+                                (
+                                    host.id,
+                                    host.name,
+                                    host.group_name,
+                                    host.last_status,
+                                    status,
+                                    alert_up[host.id],
+                                )
+                            )
+                            host.last_status = status
+                            alert_up[host.id] = True
+                db.commit()
+            except Exception as e:
+                logger.error(f"Error saving {len(batch)} heartbeats, will retry: {e}")
+                db.rollback()
+                self._requeue(batch)
+                return
+            finally:
+                db.close()
+            self.written += len(batch)
+            self.flushes += 1
+
+        for host_id, ts, latency, is_up in batch:
+            event_bus.publish(
+                PROBE_RESULT,
+                host_id=host_id,
+                latency=latency,
+                status="UP" if is_up else "DOWN",
+                suppressed=suppressed.get(host_id, False),
+            )
+        for host_id, name, group_name, previous, status, recovery in transitions:
+            alerts.record_transition(
+                host_id,
+                name,
+                group_name,
+                previous,
+                status,
+                detail="Heartbeat reported failure." if status == "DOWN" else "Heartbeat received.",
+                suppressed=suppressed.get(host_id, False),
+                alert_up=recovery,
+            )
+
+    def _requeue(self, batch: list[tuple]):
+        """Puts a failed batch back ahead of newer pushes, dropping the oldest past the cap."""
+        with self._lock:
+            pending = batch + self._pending
+            overflow = len(pending) - HEARTBEAT_MAX_PENDING
+            if overflow > 0:
+                pending = pending[overflow:]
+                self.dropped += overflow
+            self._pending = pending
+        if overflow > 0:
+            logger.warning(f"Heartbeat backlog full; dropped {overflow} oldest heartbeats")
+
+
+ingest = HeartbeatIngest()
+event_bus.add_listener(ingest.on_event, {HOST_UPDATED, HOST_DELETED})
@@ -0,0 +1,134 @@
+import json
+import os
+import re
+from functools import lru_cache
+
+MATCH_TYPES = ("contains", "not_contains", "regex", "json")
+
+# Most of a response body an HTTP monitor reads by default; hosts can set their own cap
+HTTP_MAX_BODY_BYTES = int(os.getenv("HTTP_MAX_BODY_BYTES", str(1024 * 1024)))
+CHUNK_SIZE = 16 * 1024
+# Already-scanned bytes searched again with each new chunk, so a regex match straddling
+# a chunk boundary still ends the read early (longer matches are caught at the end)
+REGEX_OVERLAP = 4096
+
+
+def parse_json_path(path: str) -> list[str | int]:
+    """`$.checks[0].state` or `checks.0.state` -> ["checks", 0, "state"]."""
+    path = path.strip()
+    if path.startswith("$"):
+        path = path[1:]
+    parts = []
+    for part in path.replace("[", ".").replace("]", "").split("."):
+        if part:
+            parts.append(int(part) if part.isdigit() else part)
+    if not parts:
+        raise ValueError("JSON path is empty")
+    return parts
+
+
+def _lookup(document, path: list[str | int]):
+    """Value at `path`; raises LookupError when a step is missing."""
+    value = document
+    for step in path:
+        if isinstance(value, dict) and str(step) in value:
+            value = value[str(step)]
+        elif isinstance(value, list) and isinstance(step, int) and step < len(value):
+            value = value[step]
+        else:
+            raise LookupError(step)
+    return value
+
+
+class BodyAssertion:
+    """
+    A check on an HTTP response body, decided while the body streams in:
+    `contains` / `not_contains` a keyword, matches a `regex`, or has the `json` value
+    `match` at `json_path` (any value if `match` is empty). At most `max_bytes` are
+    read; keyword and regex checks stop at the first match. Raises ValueError for an
+    unusable configuration.
+    """
+
+    def __init__(
+        self,
+        match_type: str,
+        match: str | None = None,
+        json_path: str | None = None,
+        max_bytes: int | None = None,
+    ):
+        if match_type not in MATCH_TYPES:
+            raise ValueError(f"Unsupported match type: {match_type}")
+        self.match_type = match_type
+        self.max_bytes = max_bytes or HTTP_MAX_BODY_BYTES
+        if match_type == "json":
+            if not json_path:
+                raise ValueError("JSON assertions need a JSON path")
+            self.path = parse_json_path(json_path)
+            self.expected = match
+        elif not match:
+            raise ValueError(f"{match_type} assertions need a value to look for")
+        elif match_type == "regex":
+            try:
+                self.pattern = re.compile(match.encode())
+            except re.error as e:
+                raise ValueError(f"Invalid regex: {e}")
+        else:
+            self.needle = match.encode()
+
+    def _found(self, body: bytearray, scanned: int) -> bool:
+        if self.match_type == "regex":
+            return self.pattern.search(body, max(scanned - REGEX_OVERLAP, 0)) is not None
+        return body.find(self.needle, max(scanned - len(self.needle) + 1, 0)) != -1
+
+    def _json_matches(self, body: bytes) -> tuple[bool, str]:
+        try:
+            value = _lookup(json.loads(body), self.path)
+        except ValueError:
+            return False, f"body is not valid JSON within {len(body)} bytes"
+        except LookupError:
+            return False, "JSON path not found"
+        if self.expected is None or self.expected == "":
+            return True, "JSON path found"
+        try:
+            expected = json.loads(self.expected)
+        except ValueError:
+            expected = self.expected
+        if value == expected or (isinstance(value, str) and value == self.expected):
+            return True, "JSON value matched"
+        return False, f"JSON value was {value!r}"
+
+    def evaluate(self, chunks) -> tuple[bool, str]:
+        """Consumes body chunks until the assertion is decided; returns (passed, detail)."""
+        body = bytearray()
+        for chunk in chunks:
+            scanned = len(body)
+            body += chunk[: self.max_bytes - scanned]
+            if self.match_type != "json" and self._found(body, scanned):
+                return self.match_type != "not_contains", f"match after {len(body)} bytes"
+            if len(body) >= self.max_bytes:
+                break
+
+        if self.match_type == "json":
+            return self._json_matches(bytes(body))
+        if self.match_type == "regex" and self.pattern.search(body):
+            return True, f"match after {len(body)} bytes"
+        if self.match_type == "not_contains":
+            return True, f"not found in {len(body)} bytes"
+        return False, f"not found in {len(body)} bytes"
+
+
+@lru_cache(maxsize=1024)
+def _compiled(
+    match_type: str, match: str | None, json_path: str | None, max_bytes: int | None
+) -> BodyAssertion:
+    # Assertions hold no per-response state, so probe threads can share one per setting
+    return BodyAssertion(match_type, match, json_path, max_bytes)
+
+
+def from_config(config: dict | None) -> BodyAssertion | None:
+    """BodyAssertion for a host's http_* settings, or None when it has none."""
+    if not config or not config.get("match_type"):
+        return None
+    return _compiled(
+        config["match_type"], config.get("match"), config.get("json_path"), config.get("max_bytes")
+    )
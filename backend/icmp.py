@@ -0,0 +1,103 @@
+import logging
+import select
+import socket
+import struct
+import time
+
+logger = logging.getLogger(__name__)
+
+ECHO_REPLY = 0
+UNREACHABLE = 3
+ECHO_REQUEST = 8
+TIME_EXCEEDED = 11
+
+
+def checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def echo_request(ident: int, seq: int, payload: bytes = b"netmon") -> bytes:
+    header = struct.pack("!BBHHH", ECHO_REQUEST, 0, 0, ident, seq)
+    return struct.pack("!BBHHH", ECHO_REQUEST, 0, checksum(header + payload), ident, seq) + payload
+
+
+def parse_echo_reply(data: bytes, raw: bool) -> tuple[int, int] | None:
+    """(identifier, sequence) of an echo reply, or None for any other packet."""
+    if raw:
+        # Raw sockets deliver the IP header too
+        data = data[(data[0] & 0x0F) * 4 :]
+    if len(data) < 8 or data[0] != ECHO_REPLY:
+        return None
+    return struct.unpack("!HH", data[4:8])
+
+
+def open_socket() -> tuple[socket.socket | None, bool]:
+    """
+    Non-blocking IPv4 ICMP socket: raw when privileged, else an unprivileged ping socket
+    (Linux, within net.ipv4.ping_group_range). Returns (socket, is_raw), or (None, False).
+    """
+    for kind in (socket.SOCK_RAW, socket.SOCK_DGRAM):
+        try:
+            sock = socket.socket(socket.AF_INET, kind, socket.IPPROTO_ICMP)
+        except OSError:
+            continue
+        sock.setblocking(False)
+        return sock, kind == socket.SOCK_RAW
+    return None, False
+
+
+def burst(address: str, count: int, interval: float, timeout: float = 2.0) -> list[float | None]:
+    """
+    Sends `count` echo requests to an IPv4 address `interval` seconds apart and waits up
+    to `timeout` after the last one. Returns the RTT in ms per packet, None where lost.
+    Raises PermissionError if no ICMP socket can be opened.
+    """
+    sock, raw = open_socket()
+    if sock is None:
+        raise PermissionError("No ICMP socket available (needs CAP_NET_RAW or ping_group_range)")
+    ident = (id(sock) ^ int(time.monotonic() * 1000)) & 0xFFFF
+    sent_at: dict[int, float] = {}
+    rtts: list[float | None] = [None] * count
+    try:
+        next_send = time.monotonic()
+        deadline = None
+        while True:
+            now = time.monotonic()
+            if len(sent_at) < count and now >= next_send:
+                seq = len(sent_at)
+                try:
+                    sock.sendto(echo_request(ident, seq), (address, 0))
+                except OSError as e:
+                    logger.debug(f"Echo to {address} failed: {e}")
+                sent_at[seq] = now
+                next_send = now + interval
+                if len(sent_at) == count:
+                    deadline = now + timeout
+                continue
+            if deadline is not None and (now >= deadline or all(r is not None for r in rtts)):
+                break
+            wait = (deadline if deadline is not None else next_send) - now
+            readable, _, _ = select.select([sock], [], [], max(wait, 0))
+            if not readable:
+                continue
+            try:
+                data, (source, _) = sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                continue
+            received_at = time.monotonic()
+            parsed = parse_echo_reply(data, raw)
+            if parsed is None or source != address:
+                continue
+            # Ping sockets have the kernel pick and filter the identifier
+            reply_ident, seq = parsed
+            if (raw and reply_ident != ident) or seq not in sent_at or rtts[seq] is not None:
+                continue
+            rtts[seq] = (received_at - sent_at[seq]) * 1000
+    finally:
+        sock.close()
+    return rtts
@@ -0,0 +1,202 @@
+import concurrent.futures
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from apscheduler.executors.pool import BasePoolExecutor
+
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Threads running scheduled jobs (probes, rollups, SSL checks)
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "10"))
+# A job starting this late, or more jobs than workers waiting, is logged as a warning
+SCHEDULER_LAG_WARN_SECONDS = float(os.getenv("SCHEDULER_LAG_WARN_SECONDS", "5"))
+SCHEDULER_QUEUE_WARN = int(os.getenv("SCHEDULER_QUEUE_WARN", str(SCHEDULER_WORKERS)))
+# The same warning (per job kind and reason) is logged at most this often
+WARN_INTERVAL = 60
+
+_local = threading.local()
+
+
+def job_kind(job_id: str) -> str:
+    """`ping_42` -> `ping`: one bucket per kind of job, not per host."""
+    return re.sub(r"_\d+$", "", job_id)
+
+
+def current_lag() -> float | None:
+    """Start lag of the job running on this thread, or None outside scheduled jobs."""
+    return getattr(_local, "lag", None)
+
+
+class _KindStats:
+    def __init__(self):
+        self.runs = 0
+        self.errors = 0
+        self.missed = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self.runtime = Histogram()
+        self.lag = Histogram()
+
+    def snapshot(self) -> dict:
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "missed": self.missed,
+            "skipped": self.skipped,
+            "coalesced": self.coalesced,
+            "runtime": self.runtime.summary(),
+            "lag": self.lag.summary(),
+        }
+
+
+class SchedulerStats:
+    """
+    What the scheduler is doing to its jobs: runtime and start lag per job kind, runs
+    missed (started after their misfire grace time), skipped (previous run still going)
+    or coalesced (several due runs folded into one), and the executor's queue. Fed by
+    InstrumentedExecutor and scheduler job events; read by /internal/stats.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kinds: dict[str, _KindStats] = defaultdict(_KindStats)
+        self._last_due: dict[str, float] = {}
+        self._warned: dict[tuple[str, str], float] = {}
+        self.workers = SCHEDULER_WORKERS
+        self.queued = 0
+        self.running = 0
+        self.peak_queued = 0
+
+    def _warn(self, kind: str, reason: str, message: str):
+        now = time.monotonic()
+        if now - self._warned.get((kind, reason), -WARN_INTERVAL) >= WARN_INTERVAL:
+            self._warned[(kind, reason)] = now
+            logger.warning(message)
+
+    def _track_due(self, job_id: str, due: float, interval: float | None) -> int:
+        """Records a due time; returns how many runs since the previous one were folded away."""
+        previous = self._last_due.get(job_id)
+        self._last_due[job_id] = due
+        if previous is None or not interval:
+            return 0
+        return max(round((due - previous) / interval) - 1, 0)
+
+    def submitted(self, job, run_times):
+        kind = job_kind(job.id)
+        interval = getattr(job.trigger, "interval", None)
+        with self._lock:
+            coalesced = self._track_due(
+                job.id, run_times[-1].timestamp(), interval.total_seconds() if interval else None
+            )
+            self._kinds[kind].coalesced += coalesced
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+            queued = self.queued
+        if coalesced:
+            self._warn(kind, "coalesced", f"Scheduler folded {coalesced} overdue {kind} run(s) into one")
+        if queued > SCHEDULER_QUEUE_WARN:
+            self._warn(
+                "executor", "queue", f"{queued} scheduled jobs waiting for {self.workers} workers"
+            )
+
+    def withdrawn(self):
+        """Undoes submitted() for a job the pool refused (e.g. during shutdown)."""
+        with self._lock:
+            self.queued -= 1
+
+    def started(self, job, run_times) -> float:
+        lag = max(time.time() - run_times[0].timestamp(), 0.0)
+        kind = job_kind(job.id)
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self._kinds[kind].lag.observe(lag)
+        if lag > SCHEDULER_LAG_WARN_SECONDS:
+            self._warn(kind, "lag", f"{kind} job started {lag:.1f}s late; the scheduler pool may be saturated")
+        return lag
+
+    def finished(self, job, runtime: float):
+        with self._lock:
+            self.running -= 1
+            stats = self._kinds[job_kind(job.id)]
+            stats.runs += 1
+            stats.runtime.observe(runtime)
+
+    def on_event(self, event):
+        kind = job_kind(event.job_id)
+        with self._lock:
+            stats = self._kinds[kind]
+            if event.code == EVENT_JOB_ERROR:
+                stats.errors += 1
+                return
+            if event.code == EVENT_JOB_MISSED:
+                stats.missed += 1
+            elif event.code == EVENT_JOB_MAX_INSTANCES:
+                stats.skipped += 1
+                self._last_due[event.job_id] = event.scheduled_run_times[-1].timestamp()
+        reason = "missed" if event.code == EVENT_JOB_MISSED else "skipped"
+        self._warn(kind, reason, f"Scheduler {reason} a {kind} run ({event.job_id})")
+
+    def forget(self, job_id: str):
+        with self._lock:
+            self._last_due.pop(job_id, None)
+
+    def reset_due(self):
+        """Called when the scheduler stops, so a later start doesn't count the gap as coalesced."""
+        with self._lock:
+            self._last_due.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "executor": {
+                    "workers": self.workers,
+                    "queued": self.queued,
+                    "running": self.running,
+                    "peak_queued": self.peak_queued,
+                },
+                "jobs": {kind: stats.snapshot() for kind, stats in sorted(self._kinds.items())},
+            }
+
+
+stats = SchedulerStats()
+
+
+class _TimedPool(concurrent.futures.ThreadPoolExecutor):
+    """Thread pool that reports when each job leaves the queue and how long it ran."""
+
+    # BasePoolExecutor._do_submit_job calls submit(run_job, job, jobstore_alias, run_times,
+    # logger_name): APScheduler-internal, matching the 3.11.x pinned in requirements.txt.
+    # test_jobstats checks run_job's signature so an upgrade that changes it fails loudly.
+    def submit(self, fn, job, jobstore_alias, run_times, *args):
+        stats.submitted(job, run_times)
+
+        def timed():
+            _local.lag = stats.started(job, run_times)
+            started = time.perf_counter()
+            try:
+                return fn(job, jobstore_alias, run_times, *args)
+            finally:
+                stats.finished(job, time.perf_counter() - started)
+                _local.lag = None
+
+        try:
+            return super().submit(timed)
+        except BaseException:
+            stats.withdrawn()
+            raise
+
+
+class InstrumentedExecutor(BasePoolExecutor):
+    """APScheduler thread pool executor whose jobs are timed into `stats`."""
+
+    def __init__(self, max_workers: int = SCHEDULER_WORKERS):
+        stats.workers = max_workers
+        super().__init__(_TimedPool(max_workers, thread_name_prefix="scheduler"))
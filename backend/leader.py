@@ -0,0 +1,147 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+import database
+from models import LeaderLeaseDB
+
+logger = logging.getLogger(__name__)
+
+# A leader that stops renewing loses the lease this many seconds after its last renewal
+LEADER_LEASE_TTL = float(os.getenv("LEADER_LEASE_TTL", "30"))
+
+
+class LeaderLock:
+    """
+    Lease row in the database: the holder renews it well before `expires_at`; any other
+    process may take it over once it lapses. Renewal and takeover are one conditional
+    UPDATE and creation relies on the primary key, so two contenders never both win.
+    """
+
+    def __init__(self, name: str, ttl: float = LEADER_LEASE_TTL, holder: str | None = None):
+        self.name = name
+        self.ttl = ttl
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+    def try_acquire(self) -> bool:
+        """Takes or renews the lease. True if this process holds it afterwards."""
+        now = datetime.utcnow()
+        expires = now + timedelta(seconds=self.ttl)
+        db = database.SessionLocal()
+        try:
+            updated = (
+                db.query(LeaderLeaseDB)
+                .filter(
+                    LeaderLeaseDB.name == self.name,
+                    or_(LeaderLeaseDB.holder == self.holder, LeaderLeaseDB.expires_at < now),
+                )
+                .update({"holder": self.holder, "expires_at": expires}, synchronize_session=False)
+            )
+            if not updated:
+                # First contender ever for this name; losing the insert race means someone else holds it
+                db.add(LeaderLeaseDB(name=self.name, holder=self.holder, expires_at=expires))
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    def release(self):
+        db = database.SessionLocal()
+        try:
+            db.query(LeaderLeaseDB).filter(
+                LeaderLeaseDB.name == self.name, LeaderLeaseDB.holder == self.holder
+            ).update({"expires_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def current(self) -> str | None:
+        db = database.SessionLocal()
+        try:
+            lease = db.query(LeaderLeaseDB).filter(LeaderLeaseDB.name == self.name).first()
+        finally:
+            db.close()
+        if lease is None or lease.expires_at < datetime.utcnow():
+            return None
+        return lease.holder
+
+
+class LeaderElection:
+    """
+    Keeps trying for `lock` every ttl/3 seconds and runs `on_elected` / `on_demoted`
+    as leadership changes hands. The first attempt happens synchronously in `start()`.
+    """
+
+    def __init__(self, lock: LeaderLock, on_elected, on_demoted):
+        self.lock = lock
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.is_leader = False
+        # Monotonic time our lease is known to run until (set on each successful renewal)
+        self._expires_at = 0.0
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stopping.clear()
+        self._step()
+        self._thread = threading.Thread(target=self._loop, name="leader-election", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self.is_leader:
+            self._demote()
+            # Let a standby take over right away instead of waiting out the TTL
+            self.lock.release()
+
+    @property
+    def interval(self) -> float:
+        return self.lock.ttl / 3
+
+    def _loop(self):
+        while not self._stopping.wait(self.interval):
+            self._step()
+
+    def _step(self):
+        attempted = time.monotonic()
+        try:
+            acquired = self.lock.try_acquire()
+        except Exception as e:
+            logger.error(f"Leader lease '{self.lock.name}' check failed: {e}")
+            # No one else can take the lease before it expires, so a transient error only
+            # costs leadership if the lease could lapse before the next check
+            acquired = self.is_leader and time.monotonic() + self.interval < self._expires_at
+        else:
+            if acquired:
+                self._expires_at = attempted + self.lock.ttl
+        if acquired and not self.is_leader:
+            logger.info(f"Acquired leader lease '{self.lock.name}' as {self.lock.holder}")
+            self.is_leader = True
+            try:
+                self.on_elected()
+            except Exception as e:
+                logger.error(f"Error starting leader services: {e}")
+        elif not acquired and self.is_leader:
+            logger.warning(f"Lost leader lease '{self.lock.name}'")
+            self._demote()
+
+    def _demote(self):
+        self.is_leader = False
+        try:
+            self.on_demoted()
+        except Exception as e:
+            logger.error(f"Error stopping leader services: {e}")
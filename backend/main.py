@@ -9,11 +9,16 @@ from slowapi.errors import RateLimitExceeded
 from starlette.middleware.base import BaseHTTPMiddleware
 
 import database
-import models
-import scheduler
+import events
+import heartbeats
+import metrics
+import worker
 from notifications import notification_manager
+from routers import agents as agents_router
 from routers import auth as auth_router
 from routers import hosts as hosts_router
+from routers import maintenance as maintenance_router
+from routers import rules as rules_router
 from routers import status as status_router
 from routers import tools as tools_router
 
@@ -24,23 +29,32 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """Lifespan context manager replacing deprecated FastAPI on_event handlers."""
     logger.info("Initializing database migrations & models...")
-    database.migrate_db()
-    models.Base.metadata.create_all(bind=database.engine)
-
-    logger.info("Starting background scheduler...")
-    scheduler.start_scheduler()
+    worker.init_process()
 
     db = database.SessionLocal()
     try:
         notification_manager.load_config(db)
     finally:
         db.close()
+    # Every process buffers the heartbeats pushed to it; timeouts are the leader's job
+    heartbeats.ingest.start()
+    # Without it, edits made through another process only show here after that process's
+    # events arrive, which under `uvicorn --workers N` they never do
+    worker.start_cache_refresh()
+    # Seeded once so /prometheus scrapes never wait on the database
+    metrics.exporter.load()
+
+    worker.standby()
+    if worker.PROCESS_ROLE != "api":
+        worker.election.start()
 
     yield
 
-    logger.info("Shutting down background scheduler...")
-    if scheduler.scheduler.running:
-        scheduler.scheduler.shutdown(wait=False)
+    if worker.PROCESS_ROLE != "api":
+        worker.election.stop()
+    worker.stop_cache_refresh()
+    heartbeats.ingest.stop()
+    events.event_bus.set_transport(events.Transport())
 
 
 app = FastAPI(
@@ -63,6 +77,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -81,7 +96,10 @@ app.add_middleware(SecurityHeadersMiddleware)
 
 # Include Routers
 app.include_router(auth_router.router)
+app.include_router(agents_router.router)
 app.include_router(hosts_router.router)
+app.include_router(maintenance_router.router)
+app.include_router(rules_router.router)
 app.include_router(status_router.router)
 app.include_router(tools_router.router)
 
@@ -0,0 +1,182 @@
+import bisect
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from apscheduler.triggers.cron import CronTrigger
+
+import database
+from events import MAINTENANCE_CHANGED, event_bus
+from models import HostDB, MaintenanceScheduleDB
+
+logger = logging.getLogger(__name__)
+
+# How far ahead recurring schedules are expanded into concrete windows
+HORIZON = timedelta(days=7)
+# Guard against expressions like "* * * * *" expanding into an unbounded list
+MAX_WINDOWS_PER_SCHEDULE = 20_000
+
+
+def build_trigger(cron: str, tz: str = "UTC") -> CronTrigger:
+    """Parses a 5-field crontab expression. Raises ValueError for bad expressions or zones."""
+    try:
+        return CronTrigger.from_crontab(cron, timezone=tz)
+    except Exception as e:  # bad field values raise ValueError, unknown zones their own error
+        raise ValueError(str(e)) from e
+
+
+def _scope_key(host_id: int | None, group_name: str | None) -> tuple:
+    if host_id is not None:
+        return ("host", host_id)
+    if group_name is not None:
+        return ("group", group_name)
+    return ("all",)
+
+
+def _merge(windows: list[tuple[float, float]]) -> tuple[list[float], list[float]]:
+    """Sorts and coalesces overlapping windows into parallel start/end lists."""
+    starts, ends = [], []
+    for start, end in sorted(windows):
+        if ends and start <= ends[-1]:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+class MaintenanceIndex:
+    """
+    Recurring maintenance schedules expanded over a rolling horizon into sorted,
+    non-overlapping intervals per scope (host, group, everyone). A lookup is a bisect
+    per scope; the DB is only read when schedules change or the horizon runs out.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._windows: dict[tuple, tuple[list[float], list[float]]] = {}
+        self._valid_from = None
+        self._valid_until = None
+
+    def invalidate(self):
+        with self._lock:
+            self._valid_until = None
+
+    def load(self, now: float | None = None):
+        db = database.SessionLocal()
+        try:
+            rows = (
+                db.query(MaintenanceScheduleDB)
+                .filter(MaintenanceScheduleDB.enabled == True)
+                .all()
+            )
+        finally:
+            db.close()
+        self.compile(rows, now)
+
+    def compile(self, schedules, now: float | None = None):
+        now = time.time() if now is None else now
+        longest = max((s.duration_minutes * 60 for s in schedules), default=0)
+        # Start far enough back to catch windows that opened before `now` and are still open
+        start = datetime.fromtimestamp(now - longest, tz=timezone.utc)
+        until = now + HORIZON.total_seconds()
+
+        by_scope: dict[tuple, list] = {}
+        for s in schedules:
+            try:
+                trigger = build_trigger(s.cron, s.timezone or "UTC")
+            except ValueError as e:
+                logger.error(f"Skipping maintenance schedule '{s.name}': {e}")
+                continue
+            duration = s.duration_minutes * 60
+            windows = by_scope.setdefault(_scope_key(s.host_id, s.group_name), [])
+            fire = trigger.get_next_fire_time(None, start)
+            count = 0
+            while fire is not None and fire.timestamp() <= until:
+                windows.append((fire.timestamp(), fire.timestamp() + duration))
+                count += 1
+                if count >= MAX_WINDOWS_PER_SCHEDULE:
+                    logger.warning(f"Maintenance schedule '{s.name}' truncated at {count} windows")
+                    break
+                fire = trigger.get_next_fire_time(fire, fire + timedelta(seconds=1))
+
+        compiled = {key: _merge(windows) for key, windows in by_scope.items()}
+        with self._lock:
+            self._windows = compiled
+            self._valid_from = now
+            self._valid_until = until
+
+    def _ensure_current(self, now: float):
+        if self._valid_until is None or not (self._valid_from <= now <= self._valid_until):
+            self.load(now)
+
+    def _covers(self, key: tuple, now: float) -> float | None:
+        """End of the window covering `now` in this scope, or None."""
+        windows = self._windows.get(key)
+        if not windows:
+            return None
+        starts, ends = windows
+        i = bisect.bisect_right(starts, now) - 1
+        if i >= 0 and now < ends[i]:
+            return ends[i]
+        return None
+
+    def active_until(
+        self, host_id: int, group_name: str | None, now: float | None = None
+    ) -> float | None:
+        """End timestamp of the recurring window covering the host at `now`, or None."""
+        now = time.time() if now is None else now
+        self._ensure_current(now)
+        with self._lock:
+            ends = [
+                end
+                for key in (("host", host_id), ("group", group_name or "General"), ("all",))
+                if (end := self._covers(key, now)) is not None
+            ]
+        return max(ends) if ends else None
+
+    def is_active(self, host_id: int, group_name: str | None, now: float | None = None) -> bool:
+        return self.active_until(host_id, group_name, now) is not None
+
+    def active_scopes(self, now: float | None = None) -> set[tuple]:
+        """Scopes ("host", id), ("group", name) or ("all",) with a window open at `now`."""
+        now = time.time() if now is None else now
+        self._ensure_current(now)
+        with self._lock:
+            return {key for key in self._windows if self._covers(key, now) is not None}
+
+    def on_event(self, event: dict):
+        self.invalidate()
+
+
+def one_off_window(host) -> list[float] | None:
+    """A host's one-off maintenance window as [start, end] epoch seconds, or None."""
+    if not (host.maintenance_start and host.maintenance_end):
+        return None
+    return [
+        host.maintenance_start.replace(tzinfo=timezone.utc).timestamp(),
+        host.maintenance_end.replace(tzinfo=timezone.utc).timestamp(),
+    ]
+
+
+def in_maintenance(host: HostDB, now: float | None = None) -> bool:
+    """
+    True if the host is in maintenance: the manual flag, its one-off window, or a
+    recurring schedule for the host, its group or all hosts.
+    """
+    if host.maintenance:
+        return True
+    if host.maintenance_start and host.maintenance_end:
+        current = (
+            datetime.utcnow()
+            if now is None
+            else datetime.fromtimestamp(now, tz=timezone.utc).replace(tzinfo=None)
+        )
+        if host.maintenance_start <= current <= host.maintenance_end:
+            return True
+    return index.is_active(host.id, host.group_name, now)
+
+
+index = MaintenanceIndex()
+event_bus.add_listener(index.on_event, {MAINTENANCE_CHANGED})
@@ -1,6 +1,7 @@
 from datetime import datetime
+from typing import Annotated, Literal
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from sqlalchemy import (
     Boolean,
     Column,
@@ -25,12 +26,14 @@ class HostDB(Base):
     enabled = Column(Boolean, default=True)
     average_latency = Column(Float, nullable=True)
     port = Column(Integer, nullable=True)
-    monitor_type = Column(String, default="icmp")  # icmp, tcp, http, heartbeat
+    monitor_type = Column(
+        String, default="icmp", index=True
+    )  # icmp, tcp, http, heartbeat, dns
     ssl_monitor = Column(Boolean, default=False)
     expected_status_code = Column(Integer, default=200, nullable=True)
-    group_name = Column(String, nullable=True, default="General")
+    group_name = Column(String, nullable=True, default="General", index=True)
     maintenance = Column(Boolean, default=False)
-    last_status = Column(String, default="UNKNOWN")
+    last_status = Column(String, default="UNKNOWN", index=True)
     ssl_expiry_days = Column(Integer, nullable=True)
     ssl_error = Column(String, nullable=True)
     latency_threshold_ms = Column(
@@ -46,6 +49,21 @@ class HostDB(Base):
     maintenance_end = Column(
         DateTime, nullable=True
     )  # Scheduled maintenance window end
+    parent_id = Column(
+        Integer, ForeignKey("hosts.id"), nullable=True, index=True
+    )  # Upstream host (e.g. gateway) this host is reached through
+    dns_server = Column(String, nullable=True)  # Resolver queried by dns monitors
+    dns_record_type = Column(String, default="A", nullable=True)
+    dns_expected = Column(
+        String, nullable=True
+    )  # Comma-separated values the answer must contain
+    probe_count = Column(Integer, default=1)  # Packets per icmp/tcp probe
+    http_match_type = Column(
+        String, nullable=True
+    )  # Body assertion of http monitors: contains, not_contains, regex or json
+    http_match = Column(String, nullable=True)  # Keyword, pattern or expected JSON value
+    http_json_path = Column(String, nullable=True)
+    http_max_bytes = Column(Integer, nullable=True)  # Body read cap (default HTTP_MAX_BODY_BYTES)
 
 
 class SettingsDB(Base):
@@ -60,12 +78,63 @@ class AuditLogDB(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user = Column(String, default="admin")
-    action = Column(String)  # LOGIN, CREATE_HOST, DELETE_HOST, etc.
+    action = Column(String, index=True)  # LOGIN, CREATE_HOST, DELETE_HOST, etc.
     target = Column(String, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     details = Column(String, nullable=True)
 
 
+class NotificationOutboxDB(Base):
+    """Queued notifications; drained asynchronously by NotificationManager workers."""
+
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String)
+    body = Column(String)
+    status = Column(String, default="pending")  # pending, sending, sent, failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+    delivered = Column(String, nullable=True)  # comma-separated keys of channels already sent
+
+    __table_args__ = (
+        Index("ix_notification_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+
+class AlertRuleDB(Base):
+    """Streaming alert rule, scoped to one host, one group, or (neither set) every host."""
+
+    __tablename__ = "alert_rules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String)
+    rule_type = Column(String)  # consecutive_failures, loss, latency_p95, no_data
+    host_id = Column(Integer, ForeignKey("hosts.id"), nullable=True, index=True)
+    group_name = Column(String, nullable=True, index=True)
+    threshold = Column(Float, nullable=True)  # failures, loss %, or p95 ms
+    window_seconds = Column(Integer, nullable=True)
+    enabled = Column(Boolean, default=True)
+
+
+class MaintenanceScheduleDB(Base):
+    """Recurring maintenance window (crontab start + duration) for a host, a group, or all hosts."""
+
+    __tablename__ = "maintenance_schedules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String)
+    host_id = Column(Integer, ForeignKey("hosts.id"), nullable=True, index=True)
+    group_name = Column(String, nullable=True, index=True)
+    cron = Column(String)  # 5-field crontab expression for the window start
+    duration_minutes = Column(Integer, default=60)
+    timezone = Column(String, default="UTC")
+    enabled = Column(Boolean, default=True)
+
+
 # Pydantic Models
 class HostBase(BaseModel):
     name: str
@@ -87,6 +156,15 @@ class HostBase(BaseModel):
     heartbeat_interval: int | None = None
     maintenance_start: datetime | None = None
     maintenance_end: datetime | None = None
+    parent_id: int | None = None
+    dns_server: str | None = None
+    dns_record_type: str | None = "A"
+    dns_expected: str | None = None
+    probe_count: int = Field(1, ge=1, le=20)
+    http_match_type: Literal["contains", "not_contains", "regex", "json"] | None = None
+    http_match: str | None = None
+    http_json_path: str | None = None
+    http_max_bytes: int | None = Field(None, ge=1, le=64 * 1024 * 1024)
 
 
 class HostCreate(HostBase):
@@ -98,12 +176,120 @@ class Host(HostBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class AlertRuleBase(BaseModel):
+    name: str
+    rule_type: Literal["consecutive_failures", "loss", "latency_p95", "no_data"]
+    host_id: int | None = None
+    group_name: str | None = None
+    threshold: float | None = None
+    window_seconds: int | None = None
+    enabled: bool = True
+
+
+class AlertRule(AlertRuleBase):
+    id: int
+    model_config = ConfigDict(from_attributes=True)
+
+
+class MaintenanceScheduleBase(BaseModel):
+    name: str
+    host_id: int | None = None
+    group_name: str | None = None
+    cron: str
+    duration_minutes: int = Field(60, ge=1, le=7 * 24 * 60)
+    timezone: str = "UTC"
+    enabled: bool = True
+
+
+class MaintenanceSchedule(MaintenanceScheduleBase):
+    id: int
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ProbeAgentDB(Base):
+    """Remote probe agent; it is live while it keeps polling for assignments."""
+
+    __tablename__ = "probe_agents"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, index=True)
+    vantage = Column(String)
+    registered_at = Column(DateTime, default=datetime.utcnow)
+    last_seen = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class LeaderLeaseDB(Base):
+    """Time-limited lock naming the one process that runs a singleton service."""
+
+    __tablename__ = "leader_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String)
+    expires_at = Column(DateTime)
+
+
+class AgentRegister(BaseModel):
+    name: str = Field(pattern=r"^[A-Za-z0-9_.-]{1,64}$")
+    vantage: str | None = Field(None, max_length=64)
+
+
+class AgentResult(BaseModel):
+    host_id: int
+    latency: float | None = Field(None, ge=0)  # None = down
+    timestamp: datetime | None = None
+    # Multi-packet probes only
+    sent: int | None = Field(None, ge=1)
+    received: int | None = Field(None, ge=0)
+    latency_min: float | None = None
+    latency_max: float | None = None
+    latency_stddev: float | None = None
+    jitter: float | None = None
+
+
+class AgentResultBatch(BaseModel):
+    results: list[AgentResult] = Field(max_length=10_000)
+
+
+class HeartbeatPush(BaseModel):
+    slug: str
+    status: Literal["up", "down"] = "up"
+    duration_ms: float | None = Field(None, ge=0)
+
+
+class HeartbeatBulk(BaseModel):
+    heartbeats: list[HeartbeatPush] = Field(max_length=10_000)
+
+
+class DiscoveryRequest(BaseModel):
+    network: str  # CIDR, e.g. 192.168.0.0/22
+    ports: list[Annotated[int, Field(ge=1, le=65535)]] | None = Field(None, max_length=64)
+    icmp: bool = True
+    resolve_names: bool = True
+
+
+class DiscoveredHost(BaseModel):
+    ip_address: str
+    hostname: str | None = None
+    latency: float | None = None
+    open_ports: list[int] = []
+
+
+class DiscoveryPromote(BaseModel):
+    hosts: list[DiscoveredHost] = Field(max_length=4096)
+    group_name: str = "Discovered"
+    interval: int = Field(60, ge=1)
+
+
 class PingResult(BaseModel):
     host_id: int
     latency: float | None
     timestamp: str
 
 
+# ping_results columns filled by multi-packet probes, besides latency (their average)
+BURST_FIELDS = ("sent", "received", "latency_min", "latency_max", "latency_stddev", "jitter")
+
+
 class PingResultDB(Base):
     __tablename__ = "ping_results"
 
@@ -111,6 +297,15 @@ class PingResultDB(Base):
     host_id = Column(Integer, ForeignKey("hosts.id"), index=True)
     latency = Column(Float, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    vantage = Column(String, nullable=True)  # Probe agent's vantage point; NULL = central
+    # Multi-packet probes only; NULL on single-packet rows keeps them as small as before.
+    # latency is then the average of the replies.
+    sent = Column(Integer, nullable=True)
+    received = Column(Integer, nullable=True)
+    latency_min = Column(Float, nullable=True)
+    latency_max = Column(Float, nullable=True)
+    latency_stddev = Column(Float, nullable=True)
+    jitter = Column(Float, nullable=True)  # Mean difference between consecutive replies
 
     # ⚡ Bolt: Added composite index on (host_id, timestamp)
     # This prevents full table scans when filtering metrics by host and ordering by time.
@@ -120,11 +315,65 @@ class PingResultDB(Base):
     )
 
 
+class DailyUptimeDB(Base):
+    """Per-host, per-UTC-day uptime rollup maintained incrementally as samples arrive."""
+
+    __tablename__ = "daily_uptime"
+
+    id = Column(Integer, primary_key=True, index=True)
+    host_id = Column(Integer, ForeignKey("hosts.id"), nullable=False)
+    day = Column(String, nullable=False)  # YYYY-MM-DD (UTC)
+    total = Column(Integer, default=0)
+    up = Column(Integer, default=0)
+    up_seconds = Column(Float, default=0.0)
+    down_seconds = Column(Float, default=0.0)
+    last_sample_at = Column(DateTime, nullable=True)
+    last_up = Column(Boolean, nullable=True)
+    packets_sent = Column(Integer, default=0)
+    packets_received = Column(Integer, default=0)
+
+    __table_args__ = (
+        Index("ix_daily_uptime_host_id_day", "host_id", "day", unique=True),
+    )
+
+
+class TraceHopDB(Base):
+    """One hop of one traceroute-monitor run; a run's rows share its timestamp."""
+
+    __tablename__ = "trace_hops"
+
+    id = Column(Integer, primary_key=True, index=True)
+    host_id = Column(Integer, ForeignKey("hosts.id"), nullable=False)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    ttl = Column(Integer, nullable=False)
+    address = Column(String, nullable=True)  # NULL = no hop answered at this TTL
+    sent = Column(Integer, default=0)
+    received = Column(Integer, default=0)
+    latency = Column(Float, nullable=True)  # Average RTT of the replies
+    latency_min = Column(Float, nullable=True)
+    latency_max = Column(Float, nullable=True)
+
+    __table_args__ = (
+        Index("ix_trace_hops_host_id_timestamp", "host_id", "timestamp"),
+    )
+
+
+class RouteChangeDB(Base):
+    __tablename__ = "route_changes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    host_id = Column(Integer, ForeignKey("hosts.id"), nullable=False, index=True)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    previous = Column(String)  # JSON: hop addresses by TTL, null for silent hops
+    current = Column(String)
+
+
 class PublicIPHistoryDB(Base):
     __tablename__ = "public_ip_history"
 
     id = Column(Integer, primary_key=True, index=True)
     ip_address = Column(String, index=True)
+    version = Column(Integer, nullable=True)  # 4 or 6; NULL rows predate IPv6 support (IPv4)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
 
 
@@ -139,6 +388,11 @@ class SpeedTestResultDB(Base):
     server_id = Column(Integer, nullable=True)
     server_name = Column(String, nullable=True)
     server_country = Column(String, nullable=True)
+    jitter = Column(Float, nullable=True)
+    download_latency = Column(Float, nullable=True)  # Median latency while downloading
+    upload_latency = Column(Float, nullable=True)  # Median latency while uploading
+    streams = Column(Integer, nullable=True)
+    stream_mbps = Column(String, nullable=True)  # JSON: {"download": [...], "upload": [...]}
 
 
 class SpeedTestResultBase(BaseModel):
@@ -146,6 +400,11 @@ class SpeedTestResultBase(BaseModel):
     upload: float
     ping: float
     timestamp: str
+    jitter: float | None = None
+    download_latency: float | None = None
+    upload_latency: float | None = None
+    streams: int | None = None
+    server_name: str | None = None
 
 
 class SpeedTestResult(SpeedTestResultBase):
@@ -1,17 +1,65 @@
+import hashlib
 import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
 from apprise import Apprise
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from models import SettingsDB
+import database
+from events import SETTINGS_CHANGED, event_bus
+from models import NotificationOutboxDB, SettingsDB
 
 logger = logging.getLogger(__name__)
 
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "4"))
+NOTIFY_TIMEOUT = float(os.getenv("NOTIFY_TIMEOUT", "10"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "6"))
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 900
+# Upper bound on how long the dispatcher sleeps when nothing is due
+DISPATCH_IDLE_SECONDS = 30
+
+
+def _channel_key(server) -> str:
+    return hashlib.sha1(server.url().encode()).hexdigest()[:12]
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
 
 class NotificationManager:
     def __init__(self):
         self.apobj = Apprise()
         self.config_id = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._dispatcher = None
+        self._executor = None
+        self._slots = None
+        # Set in API-only processes: everything goes to the outbox for the worker to deliver
+        self.queue_only = False
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "sent": 0,
+            "failed": 0,
+            "retried": 0,
+            "in_flight": 0,
+            "delivery_seconds_total": 0.0,
+            "last_error": None,
+        }
+        # Outbox rows waiting for delivery as of the dispatcher's last pass
+        self._pending = 0
+
+    @property
+    def running(self) -> bool:
+        return self._dispatcher is not None and self._dispatcher.is_alive()
 
     def load_config(self, db: Session):
         """
@@ -35,14 +83,27 @@ class NotificationManager:
         except Exception as e:
             logger.error(f"Failed to load notification config: {e}")
 
+    def on_event(self, event: dict):
+        # Settings may have been edited by another process; the dispatcher runs here
+        db = database.SessionLocal()
+        try:
+            self.load_config(db)
+        finally:
+            db.close()
+
     def send_notification(self, title: str, body: str):
         """
-        Sends a notification.
+        Sends a notification. Once the outbox workers are started (or in `queue_only`
+        processes) this only enqueues; otherwise (scripts, tests) it delivers inline.
         """
         if not self.apobj:
             logger.warning("Notification Manager not configured. Skipping.")
             return
 
+        if self.running or self.queue_only:
+            self.enqueue(title, body)
+            return
+
         try:
             status = self.apobj.notify(
                 body=body,
@@ -55,5 +116,243 @@ class NotificationManager:
         except Exception as e:
             logger.error(f"Error sending notification: {e}")
 
+    def enqueue(self, title: str, body: str):
+        """
+        Persists the notification to the outbox and wakes the dispatcher.
+        """
+        db = database.SessionLocal()
+        try:
+            db.add(NotificationOutboxDB(title=title, body=body, status="pending"))
+            db.commit()
+            self._bump("enqueued")
+        except Exception as e:
+            logger.error(f"Failed to enqueue notification '{title}': {e}")
+            db.rollback()
+        finally:
+            db.close()
+        self._wake.set()
+
+    def start(self, workers: int = NOTIFY_WORKERS):
+        """
+        Starts the dispatcher thread and a bounded delivery pool.
+        """
+        if self.running:
+            return
+        self._recover_in_flight()
+        self._stopping.clear()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="notify")
+        self._slots = threading.BoundedSemaphore(workers)
+        # Leftovers from a previous run are claimed here, before the loop thread exists
+        wait = self._dispatch_due()
+        self._dispatcher = threading.Thread(
+            target=self._dispatch_loop, args=(wait,), name="notify-dispatcher", daemon=True
+        )
+        self._dispatcher.start()
+        logger.info(f"Notification outbox started with {workers} workers.")
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stopping.set()
+        self._wake.set()
+        self._dispatcher.join(timeout=5)
+        self._executor.shutdown(wait=False)
+        self._dispatcher = None
+
+    def stats(self) -> dict:
+        """
+        Delivery counters plus the current outbox depth.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        db = database.SessionLocal()
+        try:
+            stats["pending"] = (
+                db.query(func.count(NotificationOutboxDB.id))
+                .filter(NotificationOutboxDB.status.in_(("pending", "sending")))
+                .scalar()
+            )
+        finally:
+            db.close()
+        delivered = stats["sent"]
+        stats["avg_delivery_seconds"] = (
+            stats.pop("delivery_seconds_total") / delivered if delivered else 0
+        )
+        return stats
+
+    def counters(self) -> dict:
+        """In-memory delivery counters and queue depth; unlike stats() it never queries."""
+        with self._stats_lock:
+            return {**self._stats, "pending": self._pending}
+
+    def _bump(self, key: str, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _recover_in_flight(self):
+        """Rows left in 'sending' by a crash are retried."""
+        db = database.SessionLocal()
+        try:
+            db.query(NotificationOutboxDB).filter(
+                NotificationOutboxDB.status == "sending"
+            ).update({"status": "pending"})
+            db.commit()
+        except Exception as e:
+            logger.error(f"Failed to recover in-flight notifications: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def _dispatch_loop(self, wait: float):
+        while not self._stopping.is_set():
+            self._wake.wait(timeout=wait)
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+            try:
+                wait = self._dispatch_due()
+            except Exception as e:
+                logger.error(f"Notification dispatcher error: {e}")
+                wait = RETRY_BASE_SECONDS
+
+    def _dispatch_due(self) -> float:
+        """
+        Claims due rows while delivery slots are free. Returns seconds until the next due row.
+        """
+        db = database.SessionLocal()
+        try:
+            while not self._stopping.is_set():
+                now = datetime.utcnow()
+                row = (
+                    db.query(NotificationOutboxDB.id)
+                    .filter(
+                        NotificationOutboxDB.status == "pending",
+                        NotificationOutboxDB.next_attempt_at <= now,
+                    )
+                    .order_by(NotificationOutboxDB.next_attempt_at)
+                    .first()
+                )
+                if row is None:
+                    break
+                if not self._slots.acquire(timeout=1):
+                    return 0.1
+                # Conditional update so concurrent dispatchers never claim the same row
+                claimed = (
+                    db.query(NotificationOutboxDB)
+                    .filter(
+                        NotificationOutboxDB.id == row.id,
+                        NotificationOutboxDB.status == "pending",
+                    )
+                    .update({"status": "sending"})
+                )
+                db.commit()
+                if not claimed:
+                    self._slots.release()
+                    continue
+                self._bump("in_flight")
+                self._executor.submit(self._deliver_row, row.id)
+
+            next_due, self._pending = (
+                db.query(
+                    func.min(NotificationOutboxDB.next_attempt_at),
+                    func.count(NotificationOutboxDB.id),
+                )
+                .filter(NotificationOutboxDB.status == "pending")
+                .one()
+            )
+        finally:
+            db.close()
+        if next_due is None:
+            return DISPATCH_IDLE_SECONDS
+        return min(max((next_due - datetime.utcnow()).total_seconds(), 0.05), DISPATCH_IDLE_SECONDS)
+
+    def _deliver_row(self, outbox_id: int):
+        db = database.SessionLocal()
+        delivered = None
+        try:
+            row = db.get(NotificationOutboxDB, outbox_id)
+            delivered = set(row.delivered.split(",")) if row.delivered else set()
+            started = time.perf_counter()
+            errors = self._deliver(row.title, row.body, delivered)
+            elapsed = time.perf_counter() - started
+
+            row.attempts = (row.attempts or 0) + 1
+            row.delivered = ",".join(sorted(delivered)) or None
+            if not errors:
+                row.status = "sent"
+                row.sent_at = datetime.utcnow()
+                row.last_error = None
+                self._bump("sent")
+                self._bump("delivery_seconds_total", elapsed)
+                logger.info(f"Notification sent: {row.title}")
+            else:
+                self._retry_or_fail(row, errors)
+            db.commit()
+        except Exception as e:
+            logger.error(f"Error delivering notification {outbox_id}: {e}")
+            db.rollback()
+            self._release(db, outbox_id, delivered, str(e))
+        finally:
+            db.close()
+            self._bump("in_flight", -1)
+            self._slots.release()
+            self._wake.set()
+
+    def _retry_or_fail(self, row: NotificationOutboxDB, errors: str):
+        """Schedules the next attempt with backoff, or gives up after NOTIFY_MAX_ATTEMPTS."""
+        row.last_error = errors
+        if row.attempts >= NOTIFY_MAX_ATTEMPTS:
+            row.status = "failed"
+            self._bump("failed")
+            logger.error(f"Giving up on notification '{row.title}': {errors}")
+        else:
+            row.status = "pending"
+            row.next_attempt_at = datetime.utcnow() + retry_delay(row.attempts)
+            self._bump("retried")
+            logger.warning(f"Notification '{row.title}' failed, retrying: {errors}")
+        with self._stats_lock:
+            self._stats["last_error"] = errors
+
+    def _release(self, db: Session, outbox_id: int, delivered: set | None, error: str):
+        """Counts a crashed delivery as a failed attempt, so the row doesn't stay in 'sending'."""
+        try:
+            row = db.get(NotificationOutboxDB, outbox_id)
+            if row is None:
+                return
+            row.attempts = (row.attempts or 0) + 1
+            if delivered:
+                # Channels that got it before the crash aren't sent it again
+                row.delivered = ",".join(sorted(delivered))
+            self._retry_or_fail(row, error)
+            db.commit()
+        except Exception as e:
+            logger.error(f"Failed to requeue notification {outbox_id}: {e}")
+            db.rollback()
+
+    def _deliver(self, title: str, body: str, delivered: set) -> str | None:
+        """
+        Sends to each configured channel not yet in `delivered` (updated in place),
+        with a per-channel socket timeout. Returns an error summary, or None on success.
+        """
+        errors = []
+        for server in list(self.apobj):
+            key = _channel_key(server)
+            if key in delivered:
+                continue
+            server.socket_connect_timeout = NOTIFY_TIMEOUT
+            server.socket_read_timeout = NOTIFY_TIMEOUT
+            try:
+                ok = server.notify(body=body, title=title)
+            except Exception as e:
+                ok = False
+                errors.append(f"{server.service_name}: {e}")
+            else:
+                if not ok:
+                    errors.append(f"{server.service_name}: delivery failed")
+            if ok:
+                delivered.add(key)
+        return "; ".join(errors) or None
+
 
 notification_manager = NotificationManager()
+event_bus.add_listener(notification_manager.on_event, {SETTINGS_CHANGED})
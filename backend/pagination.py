@@ -0,0 +1,31 @@
+import base64
+
+import orjson
+
+
+def encode_cursor(*values) -> str:
+    """Opaque keyset cursor: the sort key of the last row on the page."""
+    return base64.urlsafe_b64encode(orjson.dumps(values)).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """Raises ValueError for anything that isn't a cursor we issued."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = orjson.loads(base64.urlsafe_b64decode(padded))
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def parse_fields(fields: str | None, allowed) -> list[str] | None:
+    """Splits a `fields=a,b,c` projection, rejecting names outside `allowed`."""
+    if not fields:
+        return None
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return names
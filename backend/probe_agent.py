@@ -0,0 +1,228 @@
+"""
+Probe agent: runs this codebase's probes from another machine (or process) and reports
+to a central backend, which shards hosts between live agents by consistent hashing.
+
+    AGENT_SERVER=http://monitor:8000 AGENT_TOKEN=secret python probe_agent.py --name lab-1 --vantage lab
+
+Several agents can run side by side on one machine; give each its own --name.
+"""
+
+import argparse
+import gzip
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from datetime import datetime
+
+import orjson
+import requests
+from apscheduler.schedulers.background import BackgroundScheduler
+
+import scheduler as probes
+from models import BURST_FIELDS
+
+logger = logging.getLogger("probe_agent")
+
+AGENT_SERVER = os.getenv("AGENT_SERVER", "http://localhost:8000")
+AGENT_TOKEN = os.getenv("AGENT_TOKEN", "")
+AGENT_NAME = os.getenv("AGENT_NAME", socket.gethostname())
+AGENT_VANTAGE = os.getenv("AGENT_VANTAGE")
+# Results are pushed at most this often, or once this many are buffered
+AGENT_PUSH_INTERVAL = float(os.getenv("AGENT_PUSH_INTERVAL", "5"))
+AGENT_BATCH_SIZE = int(os.getenv("AGENT_BATCH_SIZE", "500"))
+# Results kept for retry while the central backend is unreachable; oldest dropped first
+AGENT_BUFFER_LIMIT = int(os.getenv("AGENT_BUFFER_LIMIT", "50000"))
+
+
+class ProbeAgent:
+    def __init__(
+        self,
+        server: str = AGENT_SERVER,
+        token: str = AGENT_TOKEN,
+        name: str = AGENT_NAME,
+        vantage: str | None = AGENT_VANTAGE,
+        session: requests.Session | None = None,
+    ):
+        self.server = server.rstrip("/")
+        self.name = name
+        self.vantage = vantage
+        self.poll_interval = 15
+        self._session = session or requests.Session()
+        self._session.headers["X-Agent-Token"] = token
+        self._lock = threading.Lock()
+        self._buffer: list[dict] = []
+        self._hosts: dict[int, dict] = {}
+        self._stopping = threading.Event()
+        self.scheduler = BackgroundScheduler()
+        self.pushed = 0
+        self.dropped = 0
+
+    def _url(self, path: str) -> str:
+        return f"{self.server}{path}"
+
+    def register(self):
+        response = self._session.post(
+            self._url("/agents/register"),
+            json={"name": self.name, "vantage": self.vantage},
+            timeout=10,
+        )
+        response.raise_for_status()
+        info = response.json()
+        self.vantage = info["vantage"]
+        self.poll_interval = info["poll_interval"]
+        logger.info(f"Registered as {self.name} (vantage {self.vantage})")
+
+    def sync(self):
+        """Fetches this agent's share of the hosts and (re)schedules their probes."""
+        response = self._session.get(self._url(f"/agents/{self.name}/assignments"), timeout=10)
+        if response.status_code == 404:
+            # Timed out on the server (e.g. after a network partition): join again
+            self.register()
+            response = self._session.get(
+                self._url(f"/agents/{self.name}/assignments"), timeout=10
+            )
+        response.raise_for_status()
+        hosts = {h["id"]: h for h in response.json()["hosts"]}
+
+        for host_id in set(self._hosts) - set(hosts):
+            self.scheduler.remove_job(f"probe_{host_id}")
+        for host_id, host in hosts.items():
+            if self._hosts.get(host_id) != host:
+                self.scheduler.add_job(
+                    self.probe,
+                    "interval",
+                    seconds=host["interval"] or 60,
+                    args=[host],
+                    id=f"probe_{host_id}",
+                    replace_existing=True,
+                    next_run_time=datetime.now(),
+                )
+        if set(hosts) != set(self._hosts):
+            logger.info(f"Assigned {len(hosts)} hosts")
+        self._hosts = hosts
+
+    def probe(self, host: dict):
+        count = host.get("probe_count") or 1
+        if probes.is_burst(host["monitor_type"], host["port"], count):
+            stats = probes.probe_burst(
+                host["name"], host["ip_address"], host["port"], host["monitor_type"] or "icmp", count
+            )
+            result = {
+                "host_id": host["id"],
+                "latency": stats["latency"] if stats["received"] else None,
+                "timestamp": datetime.utcnow().isoformat(),
+                **{f: stats[f] for f in BURST_FIELDS},
+            }
+            self._buffer_result(result)
+            return
+        latency = probes.probe(
+            host["name"],
+            host["ip_address"],
+            host["port"],
+            host["monitor_type"],
+            host["expected_status_code"],
+            dns={
+                "server": host["dns_server"],
+                "record_type": host["dns_record_type"],
+                "expected": host["dns_expected"],
+            },
+            http={
+                "match_type": host.get("http_match_type"),
+                "match": host.get("http_match"),
+                "json_path": host.get("http_json_path"),
+                "max_bytes": host.get("http_max_bytes"),
+            },
+        )
+        self._buffer_result(
+            {
+                "host_id": host["id"],
+                "latency": latency if latency >= 0 else None,
+                "timestamp": datetime.utcnow().isoformat(),
+            }
+        )
+
+    def _buffer_result(self, result: dict):
+        with self._lock:
+            self._buffer.append(result)
+            full = len(self._buffer) >= AGENT_BATCH_SIZE
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Pushes buffered results as one gzip-compressed batch; keeps them for retry on failure."""
+        with self._lock:
+            batch, self._buffer = self._buffer[:AGENT_BATCH_SIZE], self._buffer[AGENT_BATCH_SIZE:]
+        if not batch:
+            return
+        body = gzip.compress(orjson.dumps({"results": batch}), compresslevel=6)
+        try:
+            response = self._session.post(
+                self._url(f"/agents/{self.name}/results"),
+                data=body,
+                headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+                timeout=10,
+            )
+            response.raise_for_status()
+            self.pushed += len(batch)
+        except requests.RequestException as e:
+            logger.warning(f"Failed to push {len(batch)} results: {e}")
+            with self._lock:
+                self._buffer[:0] = batch
+                overflow = len(self._buffer) - AGENT_BUFFER_LIMIT
+                if overflow > 0:
+                    del self._buffer[:overflow]
+                    self.dropped += overflow
+
+    def run(self):
+        self.register()
+        self.scheduler.start()
+        last_sync = 0.0
+        while not self._stopping.is_set():
+            if time.monotonic() - last_sync >= self.poll_interval:
+                try:
+                    self.sync()
+                    last_sync = time.monotonic()
+                except requests.RequestException as e:
+                    logger.warning(f"Assignment sync failed: {e}")
+            self.flush()
+            self._stopping.wait(AGENT_PUSH_INTERVAL)
+        self._shutdown()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _shutdown(self):
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=True)
+        # Final push; anything that still can't be sent is lost
+        while self._buffer:
+            pushed = self.pushed
+            self.flush()
+            if self.pushed == pushed:
+                break
+        try:
+            # Hand the hosts back now rather than after the server-side timeout
+            self._session.delete(self._url(f"/agents/{self.name}"), timeout=5)
+        except requests.RequestException:
+            pass
+        logger.info(f"Agent {self.name} stopped ({self.pushed} results pushed)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Network Monitor probe agent")
+    parser.add_argument("--server", default=AGENT_SERVER)
+    parser.add_argument("--name", default=AGENT_NAME)
+    parser.add_argument("--vantage", default=AGENT_VANTAGE)
+    args = parser.parse_args()
+
+    agent = ProbeAgent(args.server, AGENT_TOKEN, args.name, args.vantage)
+    signal.signal(signal.SIGTERM, lambda *_: agent.stop())
+    signal.signal(signal.SIGINT, lambda *_: agent.stop())
+    agent.run()
+
+
+if __name__ == "__main__":
+    main()
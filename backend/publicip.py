@@ -0,0 +1,124 @@
+import ipaddress
+import logging
+import os
+import threading
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+import dns_client
+
+logger = logging.getLogger(__name__)
+
+# Providers are "https://..." (body is the address), "dns:<name>@<server>" (A/AAAA answer)
+# or "dns-txt:<name>@<server>" (TXT answer). Each list must only reach the provider over
+# its own address family, so the answer is the address of that family.
+_DEFAULT_PROVIDERS = {
+    4: [
+        "https://api.ipify.org",
+        "https://ipv4.icanhazip.com",
+        "https://v4.ident.me",
+        "dns:myip.opendns.com@208.67.222.222",
+        "dns-txt:o-o.myaddr.l.google.com@216.239.32.10",
+    ],
+    6: [
+        "https://api6.ipify.org",
+        "https://ipv6.icanhazip.com",
+        "https://v6.ident.me",
+        "dns:myip.opendns.com@2620:119:35::35",
+        "dns-txt:o-o.myaddr.l.google.com@2001:4860:4802:32::a",
+    ],
+}
+PUBLIC_IP_VERSIONS = [
+    int(v) for v in os.getenv("PUBLIC_IP_VERSIONS", "4,6").split(",") if v.strip()
+]
+PUBLIC_IP_QUORUM = int(os.getenv("PUBLIC_IP_QUORUM", "2"))
+PUBLIC_IP_TIMEOUT = float(os.getenv("PUBLIC_IP_TIMEOUT", "3"))
+PUBLIC_IP_INTERVAL = int(os.getenv("PUBLIC_IP_INTERVAL", "300"))
+
+
+def providers_for(version: int) -> list[str]:
+    configured = os.getenv(f"PUBLIC_IP_PROVIDERS_V{version}")
+    if configured:
+        return [p.strip() for p in configured.split(",") if p.strip()]
+    return list(_DEFAULT_PROVIDERS[version])
+
+
+class PublicIPResolver:
+    """
+    Asks every provider at once and returns the first address that `quorum` providers
+    agree on. Stragglers are abandoned: queued lookups are cancelled and in-flight ones
+    finish on their own timeout without being waited for.
+    """
+
+    def __init__(self, quorum: int = PUBLIC_IP_QUORUM, timeout: float = PUBLIC_IP_TIMEOUT):
+        self.quorum = quorum
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="public-ip")
+        # Per-thread HTTP sessions keep connections warm between runs
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def lookup(self, provider: str, version: int) -> str:
+        """One provider's answer, validated to be a public address of `version`."""
+        if provider.startswith(("dns:", "dns-txt:")):
+            kind, _, target = provider.partition(":")
+            name, _, server = target.rpartition("@")
+            if kind == "dns-txt":
+                rtype = dns_client.TXT
+            else:
+                rtype = dns_client.A if version == 4 else dns_client.AAAA
+            answers = dns_client.query(name, rtype, server, timeout=self.timeout)
+            if not answers:
+                raise ValueError(f"{provider}: empty answer")
+            raw = answers[0]["value"]
+        else:
+            response = self._session().get(provider, timeout=self.timeout)
+            response.raise_for_status()
+            raw = response.text
+        address = ipaddress.ip_address(raw.strip())
+        if address.version != version:
+            raise ValueError(f"{provider}: expected IPv{version}, got {address}")
+        return str(address)
+
+    def resolve(self, version: int = 4, providers: list[str] | None = None) -> str | None:
+        providers = providers if providers is not None else providers_for(version)
+        if not providers:
+            return None
+        quorum = min(self.quorum, len(providers))
+        pending = {self._executor.submit(self.lookup, p, version): p for p in providers}
+        votes = Counter()
+        errors = []
+        try:
+            while pending:
+                done, _ = wait(pending, timeout=self.timeout * 2, return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    provider = pending.pop(future)
+                    try:
+                        address = future.result()
+                    except Exception as e:
+                        errors.append(f"{provider}: {e}")
+                        continue
+                    votes[address] += 1
+                    if votes[address] >= quorum:
+                        return address
+        finally:
+            for future in pending:
+                future.cancel()
+
+        if votes:
+            logger.warning(f"No IPv{version} quorum ({quorum}) among answers {dict(votes)}")
+        else:
+            logger.debug(f"No IPv{version} provider answered: {'; '.join(errors)}")
+        return None
+
+
+resolver = PublicIPResolver()
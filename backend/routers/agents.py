@@ -0,0 +1,156 @@
+import hmac
+import logging
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+import agents
+import auth
+import models
+import scheduler
+from auth import get_current_user
+from database import get_db
+from events import AGENTS_CHANGED, event_bus
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["Probe Agents"])
+
+# Upper bound on a decompressed result batch, so a small gzip body can't balloon in memory
+MAX_BATCH_BYTES = 8 * 1024 * 1024
+
+
+def _require_agent_token(x_agent_token: str | None = Header(None)):
+    if not agents.AGENT_TOKEN:
+        raise HTTPException(status_code=404, detail="Probe agents are disabled")
+    if not x_agent_token or not hmac.compare_digest(x_agent_token, agents.AGENT_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid agent token")
+
+
+def _membership_changed(name: str, change: str):
+    # Hosts move between the central scheduler and agents on every join/leave
+    scheduler.request_resync()
+    event_bus.publish(AGENTS_CHANGED, agent=name, change=change)
+
+
+def _decode_batch(body: bytes, encoding: str | None) -> models.AgentResultBatch:
+    if encoding == "gzip":
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, MAX_BATCH_BYTES + 1)
+        except zlib.error:
+            raise HTTPException(status_code=400, detail="Invalid gzip body")
+        if len(body) > MAX_BATCH_BYTES or decompressor.unconsumed_tail:
+            raise HTTPException(status_code=413, detail="Result batch too large")
+    elif encoding not in (None, "identity"):
+        raise HTTPException(status_code=415, detail=f"Unsupported encoding: {encoding}")
+    try:
+        return models.AgentResultBatch.model_validate(orjson.loads(body))
+    except (orjson.JSONDecodeError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.post("/agents/register", dependencies=[Depends(_require_agent_token)])
+def register_agent(payload: models.AgentRegister, db: Session = Depends(get_db)):
+    joined = payload.name not in {a.name for a in agents.registry.live(db)}
+    agent = agents.registry.register(db, payload.name, payload.vantage)
+    if joined:
+        logger.info(f"Probe agent {agent.name} joined (vantage {agent.vantage})")
+        _membership_changed(agent.name, "joined")
+    return {
+        "name": agent.name,
+        "vantage": agent.vantage,
+        "poll_interval": agents.AGENT_POLL_INTERVAL,
+        "timeout": agents.AGENT_TIMEOUT,
+    }
+
+
+@router.get("/agents/{name}/assignments", dependencies=[Depends(_require_agent_token)])
+def get_agent_assignments(name: str, db: Session = Depends(get_db)):
+    """Hosts this agent owns on the ring. Polling it is also the agent's keep-alive."""
+    if agents.registry.touch(db, name) is None:
+        raise HTTPException(status_code=404, detail="Agent not registered")
+    ring = agents.registry.ring(db)
+    hosts = agents.registry.shard(db).get(name, [])
+    return {
+        "members": ring.members,
+        "hosts": [
+            {
+                "id": h.id,
+                "name": h.name,
+                "ip_address": h.ip_address,
+                "port": h.port,
+                "monitor_type": h.monitor_type,
+                "expected_status_code": h.expected_status_code,
+                "interval": h.interval,
+                "dns_server": h.dns_server,
+                "dns_record_type": h.dns_record_type,
+                "dns_expected": h.dns_expected,
+                "probe_count": h.probe_count or 1,
+                "http_match_type": h.http_match_type,
+                "http_match": h.http_match,
+                "http_json_path": h.http_json_path,
+                "http_max_bytes": h.http_max_bytes,
+            }
+            for h in hosts
+        ],
+    }
+
+
+@router.post("/agents/{name}/results", dependencies=[Depends(_require_agent_token)])
+async def receive_agent_results(
+    name: str,
+    request: Request,
+    content_encoding: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    """Accepts a (usually gzip-compressed) JSON batch: {"results": [{host_id, latency, timestamp}]}."""
+    batch = _decode_batch(await request.body(), content_encoding)
+    agent = await run_in_threadpool(agents.registry.touch, db, name)
+    if agent is None:
+        raise HTTPException(status_code=404, detail="Agent not registered")
+    results = []
+    for result in batch.results:
+        ts = result.timestamp
+        if ts is not None and ts.tzinfo is not None:
+            ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+        # Clock skew shouldn't let an agent write into the future
+        if ts is not None and ts > datetime.utcnow() + timedelta(minutes=1):
+            ts = None
+        results.append({**result.model_dump(exclude={"timestamp"}), "timestamp": ts})
+    accepted = await run_in_threadpool(agents.registry.ingest, agent.vantage, results)
+    return {"ok": True, "accepted": accepted}
+
+
+@router.delete("/agents/{name}", dependencies=[Depends(_require_agent_token)])
+def deregister_agent(name: str, db: Session = Depends(get_db)):
+    """Called by an agent on clean shutdown so its hosts move immediately, not after the timeout."""
+    if not agents.registry.deregister(db, name):
+        raise HTTPException(status_code=404, detail="Agent not registered")
+    logger.info(f"Probe agent {name} left")
+    _membership_changed(name, "left")
+    return {"ok": True}
+
+
+@router.get("/agents")
+def list_agents(
+    db: Session = Depends(get_db), current_user: auth.User = Depends(get_current_user)
+):
+    shards = agents.registry.shard(db)
+    live = {a.name for a in agents.registry.live(db)}
+    return [
+        {
+            "name": a.name,
+            "vantage": a.vantage,
+            "registered_at": a.registered_at,
+            "last_seen": a.last_seen,
+            "online": a.name in live,
+            "hosts": len(shards.get(a.name, [])),
+        }
+        for a in db.query(models.ProbeAgentDB).order_by(models.ProbeAgentDB.name).all()
+    ]
@@ -13,6 +13,7 @@ import auth
 import models
 from auth import get_current_user
 from database import get_db
+from events import SETTINGS_CHANGED, event_bus
 from notifications import notification_manager
 
 logger = logging.getLogger(__name__)
@@ -79,6 +80,11 @@ def update_notification_settings(
         db_setting = models.SettingsDB(key=setting.key, value=setting.value)
         db.add(db_setting)
     db.commit()
-    notification_manager.load_config(db)
+    event_bus.publish(SETTINGS_CHANGED, key=setting.key)
     notification_manager.send_notification("Test Notification", "Configuration updated successfully!")
     return {"ok": True}
+
+
+@router.get("/notifications/stats")
+def get_notification_stats(current_user: auth.User = Depends(get_current_user)):
+    return notification_manager.stats()
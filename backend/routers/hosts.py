@@ -1,18 +1,30 @@
 import csv
 import io
+import ipaddress
 import logging
 from datetime import datetime, timedelta
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
-from sqlalchemy import case, func
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import Integer, cast, func, select
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+import agents
 import auth
+import dns_client
+import dnscache
+import http_assert
+import maintenance
 import models
+import pagination
 import scheduler
+import uptime
 from auth import get_current_user
 from database import get_db
+from events import HOST_DELETED, HOST_UPDATED, event_bus
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +39,74 @@ _RANGE_LIMITS = {
     "-1y": 8760,
     "-2y": 8760,
 }
+_RANGE_DELTAS = {
+    "-1h": timedelta(hours=1),
+    "-6h": timedelta(hours=6),
+    "-24h": timedelta(hours=24),
+    "-7d": timedelta(days=7),
+    "-30d": timedelta(days=30),
+    "-1y": timedelta(days=365),
+    "-2y": timedelta(days=730),
+}
+
+
+def _host_event(db_host: models.HostDB) -> dict:
+    return dict(
+        host_id=db_host.id,
+        name=db_host.name,
+        group_name=db_host.group_name,
+        enabled=db_host.enabled,
+        maintenance=db_host.maintenance,
+        maintenance_window=maintenance.one_off_window(db_host),
+        last_status=db_host.last_status,
+        average_latency=db_host.average_latency,
+        parent_id=db_host.parent_id,
+        monitor_type=db_host.monitor_type,
+        heartbeat_slug=db_host.heartbeat_slug,
+        heartbeat_interval=db_host.heartbeat_interval,
+    )
+
+
+def _publish_host(db_host: models.HostDB):
+    event_bus.publish(HOST_UPDATED, **_host_event(db_host))
+
+
+def _validate_parent(db: Session, host_id: int | None, parent_id: int | None):
+    """Rejects unknown parents and dependency loops (walks the parent chain upwards)."""
+    seen = set()
+    node = parent_id
+    while node is not None:
+        if node == host_id:
+            raise HTTPException(status_code=400, detail="Host dependency would create a cycle")
+        if node in seen:
+            break
+        seen.add(node)
+        row = db.query(models.HostDB.parent_id).filter(models.HostDB.id == node).first()
+        if row is None:
+            raise HTTPException(status_code=400, detail=f"Parent host {node} not found")
+        node = row.parent_id
+
+
+def _validate_dns(host: models.HostCreate):
+    if host.monitor_type != "dns":
+        return
+    record_type = (host.dns_record_type or "A").upper()
+    if record_type not in dns_client.RECORD_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported DNS record type: {record_type}")
+    if host.dns_server and not dnscache.is_ip(host.dns_server):
+        raise HTTPException(status_code=400, detail="DNS server must be an IP address")
+    host.dns_record_type = record_type
+
+
+def _validate_http(host: models.HostCreate):
+    if host.monitor_type != "http" or not host.http_match_type:
+        return
+    try:
+        http_assert.BodyAssertion(
+            host.http_match_type, host.http_match, host.http_json_path, host.http_max_bytes
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/hosts/", response_model=models.Host)
@@ -35,22 +115,286 @@ def create_host(
     db: Session = Depends(get_db),
     current_user: auth.User = Depends(get_current_user),
 ):
+    _validate_parent(db, None, host.parent_id)
+    _validate_dns(host)
+    _validate_http(host)
     db_host = models.HostDB(**host.model_dump())
     db.add(db_host)
     db.commit()
     db.refresh(db_host)
-    scheduler.update_jobs()
+    scheduler.request_resync()
+    _publish_host(db_host)
     return db_host
 
 
+# Rows per bulk import once CIDR ranges are expanded (a /20)
+BULK_MAX_HOSTS = 4096
+# Bound on IN (...) lists, below SQLite's host parameter limit
+_IN_CHUNK = 500
+
+
+def _parse_bulk(body: bytes, content_type: str) -> list[dict]:
+    """Rows from a CSV body (header row of host fields) or JSON: a list or {"hosts": [...]}."""
+    if "csv" in content_type:
+        try:
+            reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+            unknown = [f for f in reader.fieldnames or [] if f.strip() not in _CREATE_FIELDS]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+            # Empty cells fall back to the field defaults
+            return [
+                {k.strip(): v.strip() for k, v in row.items() if k and v and v.strip()}
+                for row in reader
+            ]
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid CSV: {e}")
+    try:
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+    if isinstance(payload, dict):
+        payload = payload.get("hosts")
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail='Expected a list of hosts or {"hosts": [...]}')
+    return payload
+
+
+def _expand_rows(rows: list) -> list[tuple[int, dict, str | None]]:
+    """
+    (source row, host fields, error) per host. An `ip_address` in CIDR form becomes one
+    host per usable address, named "<name> <ip>" or by substituting `{ip}` in the name.
+    Rows without a name keep none here; bulk_upsert names new hosts after their address.
+    """
+    expanded = []
+    for row_no, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            expanded.append((row_no, {}, "Row must be an object"))
+            continue
+        ip = str(row.get("ip_address") or "")
+        if "/" not in ip:
+            expanded.append((row_no, row, None))
+            continue
+        try:
+            network = ipaddress.ip_network(ip, strict=False)
+        except ValueError as e:
+            expanded.append((row_no, row, str(e)))
+            continue
+        if len(expanded) + network.num_addresses > BULK_MAX_HOSTS:
+            expanded.append((row_no, row, f"Range exceeds the {BULK_MAX_HOSTS} host limit"))
+            continue
+        name = row.get("name") or ""
+        for address in network.hosts():
+            host = {**row, "ip_address": str(address)}
+            if "{ip}" in name:
+                host["name"] = name.replace("{ip}", str(address))
+            elif name:
+                host["name"] = f"{name} {address}"
+            expanded.append((row_no, host, None))
+    if len(expanded) > BULK_MAX_HOSTS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_HOSTS} hosts per import")
+    return expanded
+
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+    )
+
+
+def bulk_upsert(db: Session, rows: list, atomic: bool = False, overwrite: bool = True) -> dict:
+    """Per-row report of an import; with `overwrite=False` rows for known IPs are left as "exists"."""
+    results = []
+    valid = []
+    seen = set()
+    for row_no, data, error in _expand_rows(rows):
+        result = {"row": row_no, "ip_address": data.get("ip_address"), "status": "error"}
+        results.append(result)
+        if error is None:
+            try:
+                # The IP-as-name default is for new hosts; update_fields drops it for existing ones
+                host = models.HostCreate.model_validate({"name": data.get("ip_address"), **data})
+                _validate_dns(host)
+                _validate_http(host)
+            except ValidationError as e:
+                error = _validation_message(e)
+            except HTTPException as e:
+                error = e.detail
+        if error is None and host.ip_address in seen:
+            error = "Duplicate ip_address in this import"
+        if error is not None:
+            result["error"] = error
+            continue
+        seen.add(host.ip_address)
+        update_fields = host.model_fields_set
+        if not data.get("name"):
+            update_fields = update_fields - {"name"}
+        valid.append((result, host, update_fields))
+
+    # One query per chunk instead of one lookup per row
+    existing = {}
+    slugs = {}
+    ips = [host.ip_address for _, host, _ in valid]
+    wanted_slugs = [host.heartbeat_slug for _, host, _ in valid if host.heartbeat_slug]
+    for i in range(0, len(ips), _IN_CHUNK):
+        for db_host in db.query(models.HostDB).filter(
+            models.HostDB.ip_address.in_(ips[i : i + _IN_CHUNK])
+        ):
+            existing[db_host.ip_address] = db_host
+    for i in range(0, len(wanted_slugs), _IN_CHUNK):
+        for host_id, slug in db.query(models.HostDB.id, models.HostDB.heartbeat_slug).filter(
+            models.HostDB.heartbeat_slug.in_(wanted_slugs[i : i + _IN_CHUNK])
+        ):
+            slugs[slug] = host_id
+
+    changed = []
+    for result, host, update_fields in valid:
+        db_host = existing.get(host.ip_address)
+        host_id = db_host.id if db_host is not None else None
+        # Slugs are claimed by host id, or by row number for hosts this import creates
+        owner = host_id if host_id is not None else ("row", result["row"])
+        try:
+            if host.parent_id is not None:
+                _validate_parent(db, host_id, host.parent_id)
+            if host.heartbeat_slug and slugs.get(host.heartbeat_slug, owner) != owner:
+                raise HTTPException(status_code=400, detail="heartbeat_slug is already in use")
+        except HTTPException as e:
+            result["error"] = e.detail
+            continue
+        if host.heartbeat_slug:
+            slugs[host.heartbeat_slug] = owner
+
+        if db_host is not None and not overwrite:
+            result["status"] = "exists"
+            result["id"] = db_host.id
+            continue
+        if db_host is None:
+            db_host = models.HostDB(**host.model_dump())
+            db.add(db_host)
+            result["status"] = "created"
+        else:
+            # Only the columns present in the row; the rest of the host is left alone
+            updates = host.model_dump(include=update_fields)
+            if all(getattr(db_host, f) == v for f, v in updates.items()):
+                result["status"] = "unchanged"
+                result["id"] = db_host.id
+                continue
+            for field, value in updates.items():
+                setattr(db_host, field, value)
+            result["status"] = "updated"
+        changed.append((result, db_host))
+
+    failed = sum(1 for r in results if r["status"] == "error")
+    if atomic and failed:
+        db.rollback()
+        for result in results:
+            if result["status"] != "error":
+                result["status"] = "skipped"
+                result.pop("id", None)
+        changed = []
+    elif changed:
+        db.flush()
+        # Captured before commit expires the rows, which would reload them one by one
+        updates = []
+        for result, db_host in changed:
+            result["id"] = db_host.id
+            updates.append(_host_event(db_host))
+        db.commit()
+        # One reschedule for the whole import, then the per-host cache updates
+        scheduler.request_resync()
+        for update in updates:
+            event_bus.publish(HOST_UPDATED, **update)
+
+    summary = {"created": 0, "updated": 0, "unchanged": 0, "exists": 0, "skipped": 0, "error": 0}
+    for result in results:
+        summary[result["status"]] += 1
+    return {**summary, "results": results}
+
+
+@router.post("/hosts/bulk")
+async def bulk_upsert_hosts(
+    request: Request,
+    atomic: bool = False,
+    content_type: str = Header(""),
+    db: Session = Depends(get_db),
+    current_user: auth.User = Depends(get_current_user),
+):
+    """
+    Creates or updates many hosts at once, matched on `ip_address`, in one transaction.
+    Send CSV (`text/csv`, header row of host fields) or JSON. `ip_address` may be a CIDR
+    range. Invalid rows are reported and skipped; with `atomic=true` nothing is written
+    unless every row is valid.
+    """
+    rows = _parse_bulk(await request.body(), content_type)
+    return await run_in_threadpool(bulk_upsert, db, rows, atomic)
+
+
+_HOST_FIELDS = set(models.Host.model_fields)
+_CREATE_FIELDS = set(models.HostCreate.model_fields)
+
+
 @router.get("/hosts/", response_model=list[models.Host])
 def read_hosts(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = None,
+    fields: str | None = None,
+    status: str | None = None,
+    group: str | None = None,
+    monitor_type: str | None = None,
+    name_prefix: str | None = None,
     db: Session = Depends(get_db),
     current_user: auth.User = Depends(get_current_user),
 ):
-    return db.query(models.HostDB).offset(skip).limit(limit).all()
+    """
+    Hosts ordered by id. Pass the `X-Next-Cursor` response header back as `cursor`
+    for constant-time keyset paging; `skip` is only honoured without a cursor.
+    `fields=id,name,...` returns just those columns.
+    """
+    try:
+        selected = pagination.parse_fields(fields, _HOST_FIELDS)
+        after_id = int(pagination.decode_cursor(cursor, 1)[0]) if cursor else None
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if selected is not None:
+        if "id" not in selected:
+            selected.insert(0, "id")
+        query = db.query(*(getattr(models.HostDB, f) for f in selected))
+    else:
+        query = db.query(models.HostDB)
+
+    if status:
+        query = query.filter(models.HostDB.last_status == status)
+    if group:
+        query = query.filter(models.HostDB.group_name == group)
+    if monitor_type:
+        query = query.filter(models.HostDB.monitor_type == monitor_type)
+    if name_prefix:
+        # Range form of LIKE 'prefix%' so SQLite can use ix_hosts_name
+        query = query.filter(
+            models.HostDB.name >= name_prefix, models.HostDB.name < name_prefix + "\uffff"
+        )
+
+    query = query.order_by(models.HostDB.id)
+    if after_id is not None:
+        query = query.filter(models.HostDB.id > after_id)
+    elif skip:
+        query = query.offset(skip)
+    rows = query.limit(limit).all()
+
+    headers = {}
+    if len(rows) == limit:
+        headers["X-Next-Cursor"] = pagination.encode_cursor(rows[-1].id)
+
+    if selected is None:
+        response.headers.update(headers)
+        return rows
+    return Response(
+        content=orjson.dumps([row._asdict() for row in rows]),
+        media_type="application/json",
+        headers=headers,
+    )
 
 
 @router.get("/hosts/{host_id}", response_model=models.Host)
@@ -75,11 +419,15 @@ def update_host(
     db_host = db.query(models.HostDB).filter(models.HostDB.id == host_id).first()
     if db_host is None:
         raise HTTPException(status_code=404, detail="Host not found")
+    _validate_parent(db, host_id, host.parent_id)
+    _validate_dns(host)
+    _validate_http(host)
     for field, value in host.model_dump().items():
         setattr(db_host, field, value)
     db.commit()
     db.refresh(db_host)
-    scheduler.update_jobs()
+    scheduler.request_resync()
+    _publish_host(db_host)
     return db_host
 
 
@@ -92,61 +440,215 @@ def delete_host(
     db_host = db.query(models.HostDB).filter(models.HostDB.id == host_id).first()
     if db_host is None:
         raise HTTPException(status_code=404, detail="Host not found")
+    # Children fall back to having no upstream dependency
+    db.query(models.HostDB).filter(models.HostDB.parent_id == host_id).update(
+        {"parent_id": None}
+    )
     db.delete(db_host)
     db.commit()
-    scheduler.update_jobs()
+    scheduler.request_resync()
+    event_bus.publish(HOST_DELETED, host_id=host_id)
     return {"ok": True}
 
 
+# Single-packet rows leave sent/received NULL: one packet, answered if latency is set
+_METRIC_COLUMNS = (
+    models.PingResultDB.latency,
+    models.PingResultDB.sent,
+    models.PingResultDB.received,
+    models.PingResultDB.jitter,
+)
+
+
+class _MetricTotals:
+    def __init__(self):
+        self.samples = 0
+        self.successful = 0
+        self.total_latency = 0.0
+        self.sent = 0
+        self.received = 0
+
+    def add(self, latency, sent, received) -> float:
+        """Counts one row; returns its packet loss in %."""
+        self.samples += 1
+        if latency is not None:
+            self.successful += 1
+            self.total_latency += latency
+        if sent is None:
+            sent, received = 1, int(latency is not None)
+        self.sent += sent
+        self.received += received or 0
+        return round((1 - (received or 0) / sent) * 100, 1) if sent else 100.0
+
+    def summary(self) -> dict:
+        return {
+            "uptime": (self.successful / self.samples * 100) if self.samples else 0,
+            "avg_latency": (self.total_latency / self.successful) if self.successful else 0,
+            "loss": round((1 - self.received / self.sent) * 100, 1) if self.sent else 0,
+        }
+
+
 @router.get("/metrics/{host_id}")
 def get_metrics(
     host_id: int,
     range: str = "-1h",
+    format: str = "json",
+    vantage: str | None = None,
     db: Session = Depends(get_db),
     current_user: auth.User = Depends(get_current_user),
 ):
+    """
+    Latency samples for a host. `format=columnar` returns parallel arrays
+    (`t` = epoch ms, `v` = latency rounded to 0.01 ms or null when down, and, when the
+    range has multi-packet samples, `l` = packet loss % and `j` = jitter or null)
+    encoded with orjson. `loss` is the packet loss over the range.
+    `vantage` limits samples to one probe agent's ("central" = this server's own probes).
+    """
     now = datetime.utcnow()
-    range_map = {
-        "-1h": timedelta(hours=1),
-        "-6h": timedelta(hours=6),
-        "-24h": timedelta(hours=24),
-        "-7d": timedelta(days=7),
-        "-30d": timedelta(days=30),
-        "-1y": timedelta(days=365),
-        "-2y": timedelta(days=730),
-    }
-    delta = range_map.get(range, timedelta(hours=1))
+    delta = _RANGE_DELTAS.get(range, timedelta(hours=1))
     cutoff = now - delta
 
     limit = _RANGE_LIMITS.get(range, 1440)
+    filters = [models.PingResultDB.host_id == host_id, models.PingResultDB.timestamp >= cutoff]
+    if vantage == agents.CENTRAL:
+        filters.append(models.PingResultDB.vantage.is_(None))
+    elif vantage:
+        filters.append(models.PingResultDB.vantage == vantage)
+    if format == "columnar":
+        return _columnar_metrics(db, filters, limit)
+
     results_db = (
-        db.query(models.PingResultDB.timestamp, models.PingResultDB.latency)
-        .filter(
-            models.PingResultDB.host_id == host_id,
-            models.PingResultDB.timestamp >= cutoff,
-        )
+        db.query(models.PingResultDB.timestamp, *_METRIC_COLUMNS)
+        .filter(*filters)
         .order_by(models.PingResultDB.timestamp.asc())
         .limit(limit)
         .all()
     )
 
     results = []
-    total_pings = 0
-    successful_pings = 0
-    total_latency = 0.0
+    totals = _MetricTotals()
+    for timestamp, latency, sent, received, jitter in results_db:
+        loss = totals.add(latency, sent, received)
+        results.append(
+            {
+                "time": timestamp.isoformat() + "Z",
+                "latency": latency if latency is not None else -1.0,
+                "loss": loss,
+                "jitter": jitter,
+            }
+        )
+    return {"data": results, **totals.summary()}
 
-    for timestamp, latency in results_db:
-        total_pings += 1
-        latency_val = latency if latency is not None else -1.0
-        if latency_val >= 0:
-            successful_pings += 1
-            total_latency += latency_val
-        results.append({"time": timestamp.isoformat() + "Z", "latency": latency_val})
 
-    uptime = (successful_pings / total_pings * 100) if total_pings > 0 else 0
-    avg_latency = (total_latency / successful_pings) if successful_pings > 0 else 0
+# Epoch milliseconds computed by SQLite, so rows never become Python datetimes
+_EPOCH_MS = cast(
+    func.round((func.julianday(models.PingResultDB.timestamp) - 2440587.5) * 86400000),
+    Integer,
+)
 
-    return {"data": results, "uptime": uptime, "avg_latency": avg_latency}
+
+def _columnar_metrics(db: Session, filters: list, limit: int) -> Response:
+    rows = db.execute(
+        select(_EPOCH_MS, *_METRIC_COLUMNS)
+        .where(*filters)
+        .order_by(models.PingResultDB.timestamp.asc())
+        .limit(limit)
+    )
+
+    times = []
+    values = []
+    losses = []
+    jitters = []
+    bursts = False
+    totals = _MetricTotals()
+    for ts_ms, latency, sent, received, jitter in rows:
+        times.append(ts_ms)
+        # Full float precision was most of the payload; 0.01 ms is finer than any chart
+        values.append(round(latency, 2) if latency is not None else None)
+        losses.append(totals.add(latency, sent, received))
+        jitters.append(jitter)
+        bursts = bursts or sent is not None
+
+    payload = {"t": times, "v": values, **totals.summary()}
+    if bursts:
+        # Single-packet loss is implied by `v` and they have no jitter
+        payload.update(l=losses, j=jitters)
+    return Response(content=orjson.dumps(payload), media_type="application/json")
+
+
+_HOP_EPOCH_MS = cast(
+    func.round((func.julianday(models.TraceHopDB.timestamp) - 2440587.5) * 86400000),
+    Integer,
+)
+
+
+@router.get("/traceroute/{host_id}")
+def get_trace_history(
+    host_id: int,
+    range: str = "-1h",
+    db: Session = Depends(get_db),
+    current_user: auth.User = Depends(get_current_user),
+):
+    """
+    Per-hop latency and loss of a traceroute monitor, as parallel arrays per TTL
+    (`t` = epoch ms, `avg`/`min`/`max` in ms, `loss` in %), plus the route changes in
+    the range. Samples are averaged into at most as many buckets as /metrics returns points.
+    """
+    delta = _RANGE_DELTAS.get(range, timedelta(hours=1))
+    cutoff = datetime.utcnow() - delta
+    bucket_ms = max(int(delta.total_seconds() * 1000 / _RANGE_LIMITS.get(range, 1440)), 1)
+    hop = models.TraceHopDB
+    rows = db.execute(
+        select(
+            hop.ttl,
+            func.min(_HOP_EPOCH_MS),
+            func.sum(hop.sent),
+            func.sum(hop.received),
+            # Weighted by replies, so a bucket's average is over packets rather than runs
+            func.sum(hop.latency * hop.received) / func.nullif(func.sum(hop.received), 0),
+            func.min(hop.latency_min),
+            func.max(hop.latency_max),
+        )
+        .where(hop.host_id == host_id, hop.timestamp >= cutoff)
+        .group_by(hop.ttl, cast(_HOP_EPOCH_MS / bucket_ms, Integer))
+        .order_by(hop.ttl, func.min(hop.timestamp))
+    )
+    hops = {}
+    for ttl, ts_ms, sent, received, avg, low, high in rows:
+        series = hops.setdefault(ttl, {"ttl": ttl, "t": [], "avg": [], "min": [], "max": [], "loss": []})
+        series["t"].append(ts_ms)
+        series["avg"].append(round(avg, 2) if avg is not None else None)
+        series["min"].append(low)
+        series["max"].append(high)
+        series["loss"].append(round((1 - received / sent) * 100, 1) if sent else None)
+
+    # Current address per TTL, from the latest trace
+    latest = db.query(func.max(hop.timestamp)).filter(hop.host_id == host_id).scalar()
+    if latest is not None:
+        for ttl, address in db.query(hop.ttl, hop.address).filter(
+            hop.host_id == host_id, hop.timestamp == latest
+        ):
+            if ttl in hops:
+                hops[ttl]["address"] = address
+
+    changes = (
+        db.query(models.RouteChangeDB)
+        .filter(models.RouteChangeDB.host_id == host_id, models.RouteChangeDB.timestamp >= cutoff)
+        .order_by(models.RouteChangeDB.timestamp)
+        .all()
+    )
+    payload = {
+        "hops": [{"address": None, **series} for series in hops.values()],
+        "route_changes": [
+            {
+                "time": change.timestamp.isoformat() + "Z",
+                "previous": orjson.loads(change.previous),
+                "current": orjson.loads(change.current),
+            }
+            for change in changes
+        ],
+    }
+    return Response(content=orjson.dumps(payload), media_type="application/json")
 
 
 @router.get("/uptime/{host_id}")
@@ -156,38 +658,37 @@ def get_uptime_history(
     db: Session = Depends(get_db),
     current_user: auth.User = Depends(get_current_user),
 ):
-    """Daily uptime percentage for the given host."""
+    """Daily uptime percentage for the given host, read from the daily_uptime rollup."""
     now = datetime.utcnow()
     range_map = {
         "-7d": timedelta(days=7),
         "-30d": timedelta(days=30),
         "-90d": timedelta(days=90),
+        "-1y": timedelta(days=365),
     }
     delta = range_map.get(range, timedelta(days=30))
-    cutoff = now - delta
+    cutoff_day = (now - delta).strftime("%Y-%m-%d")
 
-    results_db = (
-        db.query(
-            func.strftime("%Y-%m-%d", models.PingResultDB.timestamp).label("day_key"),
-            func.count(models.PingResultDB.id).label("total"),
-            func.sum(case((models.PingResultDB.latency >= 0, 1), else_=0)).label("up"),
-        )
+    rows = (
+        db.query(models.DailyUptimeDB)
         .filter(
-            models.PingResultDB.host_id == host_id,
-            models.PingResultDB.timestamp >= cutoff,
+            models.DailyUptimeDB.host_id == host_id,
+            models.DailyUptimeDB.day >= cutoff_day,
         )
-        .group_by("day_key")
-        .order_by("day_key")
+        .order_by(models.DailyUptimeDB.day)
         .all()
     )
 
-    daily = []
-    for day_key, total, up in results_db:
-        up_count = up if up is not None else 0
-        pct = round((up_count / total * 100), 1) if total > 0 else 0.0
-        daily.append({"date": day_key, "uptime": pct, "total": total, "up": up_count})
-
-    return daily
+    return [
+        {
+            "date": row.day,
+            "uptime": uptime.uptime_percent(row),
+            "total": row.total,
+            "up": row.up,
+            "loss": uptime.loss_percent(row),
+        }
+        for row in rows
+    ]
 
 
 @router.get("/export/metrics/{host_id}")
@@ -0,0 +1,86 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+import auth
+import maintenance
+import models
+from auth import get_current_user
+from database import get_db
+from events import MAINTENANCE_CHANGED, event_bus
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["Maintenance"])
+
+
+def _validate(schedule: models.MaintenanceScheduleBase):
+    try:
+        maintenance.build_trigger(schedule.cron, schedule.timezone)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid schedule: {e}")
+
+
+@router.get("/maintenance-schedules", response_model=list[models.MaintenanceSchedule])
+def list_maintenance_schedules(
+    db: Session = Depends(get_db), current_user: auth.User = Depends(get_current_user)
+):
+    return db.query(models.MaintenanceScheduleDB).order_by(models.MaintenanceScheduleDB.id).all()
+
+
+@router.post("/maintenance-schedules", response_model=models.MaintenanceSchedule)
+def create_maintenance_schedule(
+    schedule: models.MaintenanceScheduleBase,
+    db: Session = Depends(get_db),
+    current_user: auth.User = Depends(get_current_user),
+):
+    _validate(schedule)
+    db_schedule = models.MaintenanceScheduleDB(**schedule.model_dump())
+    db.add(db_schedule)
+    db.commit()
+    db.refresh(db_schedule)
+    event_bus.publish(MAINTENANCE_CHANGED)
+    return db_schedule
+
+
+@router.put("/maintenance-schedules/{schedule_id}", response_model=models.MaintenanceSchedule)
+def update_maintenance_schedule(
+    schedule_id: int,
+    schedule: models.MaintenanceScheduleBase,
+    db: Session = Depends(get_db),
+    current_user: auth.User = Depends(get_current_user),
+):
+    db_schedule = (
+        db.query(models.MaintenanceScheduleDB)
+        .filter(models.MaintenanceScheduleDB.id == schedule_id)
+        .first()
+    )
+    if db_schedule is None:
+        raise HTTPException(status_code=404, detail="Maintenance schedule not found")
+    _validate(schedule)
+    for field, value in schedule.model_dump().items():
+        setattr(db_schedule, field, value)
+    db.commit()
+    db.refresh(db_schedule)
+    event_bus.publish(MAINTENANCE_CHANGED)
+    return db_schedule
+
+
+@router.delete("/maintenance-schedules/{schedule_id}")
+def delete_maintenance_schedule(
+    schedule_id: int,
+    db: Session = Depends(get_db),
+    current_user: auth.User = Depends(get_current_user),
+):
+    db_schedule = (
+        db.query(models.MaintenanceScheduleDB)
+        .filter(models.MaintenanceScheduleDB.id == schedule_id)
+        .first()
+    )
+    if db_schedule is None:
+        raise HTTPException(status_code=404, detail="Maintenance schedule not found")
+    db.delete(db_schedule)
+    db.commit()
+    event_bus.publish(MAINTENANCE_CHANGED)
+    return {"ok": True}
@@ -0,0 +1,68 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+import auth
+import models
+from auth import get_current_user
+from database import get_db
+from events import RULES_CHANGED, event_bus
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["Alert Rules"])
+
+
+@router.get("/alert-rules", response_model=list[models.AlertRule])
+def list_alert_rules(
+    db: Session = Depends(get_db), current_user: auth.User = Depends(get_current_user)
+):
+    return db.query(models.AlertRuleDB).order_by(models.AlertRuleDB.id).all()
+
+
+@router.post("/alert-rules", response_model=models.AlertRule)
+def create_alert_rule(
+    rule: models.AlertRuleBase,
+    db: Session = Depends(get_db),
+    current_user: auth.User = Depends(get_current_user),
+):
+    db_rule = models.AlertRuleDB(**rule.model_dump())
+    db.add(db_rule)
+    db.commit()
+    db.refresh(db_rule)
+    event_bus.publish(RULES_CHANGED)
+    return db_rule
+
+
+@router.put("/alert-rules/{rule_id}", response_model=models.AlertRule)
+def update_alert_rule(
+    rule_id: int,
+    rule: models.AlertRuleBase,
+    db: Session = Depends(get_db),
+    current_user: auth.User = Depends(get_current_user),
+):
+    db_rule = db.query(models.AlertRuleDB).filter(models.AlertRuleDB.id == rule_id).first()
+    if db_rule is None:
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+    for field, value in rule.model_dump().items():
+        setattr(db_rule, field, value)
+    db.commit()
+    db.refresh(db_rule)
+    event_bus.publish(RULES_CHANGED)
+    return db_rule
+
+
+@router.delete("/alert-rules/{rule_id}")
+def delete_alert_rule(
+    rule_id: int,
+    db: Session = Depends(get_db),
+    current_user: auth.User = Depends(get_current_user),
+):
+    db_rule = db.query(models.AlertRuleDB).filter(models.AlertRuleDB.id == rule_id).first()
+    if db_rule is None:
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+    db.delete(db_rule)
+    db.commit()
+    event_bus.publish(RULES_CHANGED)
+    return {"ok": True}
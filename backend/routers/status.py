@@ -1,23 +1,35 @@
 import asyncio
+import hmac
 import json
 import logging
-from datetime import datetime
+import os
+from typing import Literal
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from sse_starlette.sse import EventSourceResponse
 
 import auth
 import database
+import group_status
+import heartbeats
+import jobstats
+import metrics
 import models
+import scheduler
 from auth import get_current_user
 from database import get_db
-from notifications import notification_manager
+from events import HOST_UPDATED, STATUS_CHANGE, event_bus
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["Status & Events"])
 
+# How long an idle SSE stream waits before re-checking for client disconnect
+SSE_IDLE_TIMEOUT = 15
+# Bearer token Prometheus must send to scrape /prometheus; the endpoint is off when unset
+PROMETHEUS_TOKEN = os.getenv("PROMETHEUS_TOKEN", "")
+
 
 @router.get("/status")
 def get_network_status(
@@ -58,6 +70,48 @@ def get_network_status(
     }
 
 
+def _require_scrape_token(authorization: str | None = Header(None)):
+    if not PROMETHEUS_TOKEN:
+        # Host names and addresses aren't published until a token is configured
+        raise HTTPException(status_code=404, detail="Not Found")
+    expected = f"Bearer {PROMETHEUS_TOKEN}"
+    if not authorization or not hmac.compare_digest(authorization, expected):
+        raise HTTPException(status_code=401, detail="Invalid scrape token")
+
+
+@router.get("/prometheus", dependencies=[Depends(_require_scrape_token)])
+def prometheus_metrics():
+    """
+    OpenMetrics exposition: per-host up/latency/loss gauges, probe duration, scheduler
+    lag and result write histograms, and the notification queue. Rendered from memory.
+    The numbers are this process's own, so only single-process deployments are
+    supported: behind several API workers each scrape would see a different process.
+    """
+    return Response(metrics.exporter.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@router.get("/internal/stats")
+def get_scheduler_stats(current_user: auth.User = Depends(get_current_user)):
+    """
+    Scheduler self-instrumentation for sizing intervals and the worker pool: runtime
+    and start lag per job kind, missed/skipped/coalesced runs and the executor queue.
+    Only the process running the scheduler (the leader) has numbers.
+    """
+    return {
+        "scheduler_running": scheduler.scheduler.running,
+        "scheduled_jobs": len(scheduler.scheduler.get_jobs()),
+        **jobstats.stats.snapshot(),
+    }
+
+
+@router.get("/status/groups")
+def get_group_status(
+    db: Session = Depends(get_db), current_user: auth.User = Depends(get_current_user)
+):
+    """Per-group up/down/maintenance/unknown counts from incrementally maintained counters."""
+    return group_status.tracker.snapshot(db)
+
+
 def _get_sse_data():
     """Sync helper — runs in executor to avoid blocking event loop."""
     db = database.SessionLocal()
@@ -104,43 +158,74 @@ def _get_sse_data():
         db.close()
 
 
+# Host fields the dashboard's SSE host records carry (see _get_sse_data)
+_SSE_FIELDS = (
+    "name",
+    "last_status",
+    "average_latency",
+    "maintenance",
+    "enabled",
+    "group_name",
+    "ip_address",
+    "monitor_type",
+    "port",
+    "ssl_monitor",
+    "ssl_expiry_days",
+    "latency_threshold_ms",
+)
+
+
+def _sse_message(event: dict) -> dict:
+    """
+    Maps a bus event onto a partial host record; the dashboard merges it into its host
+    list by id and recomputes the network status from the merged list.
+    """
+    if event["type"] == STATUS_CHANGE:
+        update = {"id": event["host_id"], "last_status": event["status"]}
+    else:
+        update = {"id": event["host_id"], **{k: event[k] for k in _SSE_FIELDS if k in event}}
+    return {"data": json.dumps([update], default=str), "event": "hosts_update"}
+
+
 @router.get("/events")
 async def event_stream(request: Request):
     async def generate():
-        while True:
-            if await request.is_disconnected():
-                break
+        # Subscribe before taking the snapshot so no transition falls between the two
+        # Probe results are too frequent for browsers and change nothing the dashboard shows
+        with event_bus.subscribe(event_types={STATUS_CHANGE, HOST_UPDATED}) as subscription:
             try:
-                loop = asyncio.get_event_loop()
-                data = await loop.run_in_executor(None, _get_sse_data)
+                data = await asyncio.to_thread(_get_sse_data)
                 yield {"data": json.dumps(data), "event": "hosts_update"}
             except Exception as e:
                 logger.error(f"SSE error: {e}")
-            await asyncio.sleep(5)
+
+            while True:
+                if await request.is_disconnected():
+                    break
+                event = await subscription.get(timeout=SSE_IDLE_TIMEOUT)
+                if event is not None:
+                    yield _sse_message(event)
 
     return EventSourceResponse(generate())
 
 
-@router.post("/heartbeat/{slug}")
-def receive_heartbeat(slug: str, db: Session = Depends(get_db)):
-    host = (
-        db.query(models.HostDB)
-        .filter(models.HostDB.heartbeat_slug == slug, models.HostDB.enabled == True)
-        .first()
-    )
-    if not host:
-        raise HTTPException(status_code=404, detail="Heartbeat slug not found")
+@router.post("/heartbeat/bulk")
+def receive_heartbeats_bulk(payload: models.HeartbeatBulk):
+    """Accepts many pushes in one request, e.g. from a relay aggregating a fleet of cron jobs."""
+    unknown = []
+    for beat in payload.heartbeats:
+        if heartbeats.ingest.push(beat.slug, beat.status, beat.duration_ms) is None:
+            unknown.append(beat.slug)
+    return {"ok": True, "accepted": len(payload.heartbeats) - len(unknown), "unknown": unknown}
 
-    ping_result = models.PingResultDB(host_id=host.id, latency=0.1)
-    db.add(ping_result)
 
-    prev_status = host.last_status
-    host.last_status = "UP"
-    db.commit()
-
-    if prev_status == "DOWN" and not host.maintenance:
-        notification_manager.send_notification(
-            f"🟢 Host {host.name} is UP",
-            f"Host: {host.name}\nHeartbeat received.\nTime: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-        )
-    return {"ok": True, "host": host.name}
+@router.post("/heartbeat/{slug}")
+def receive_heartbeat(
+    slug: str,
+    status: Literal["up", "down"] = "up",
+    duration_ms: float | None = Query(None, ge=0),
+):
+    host = heartbeats.ingest.push(slug, status, duration_ms)
+    if host is None:
+        raise HTTPException(status_code=404, detail="Heartbeat slug not found")
+    return {"ok": True, "host": host["name"]}
@@ -1,25 +1,62 @@
 import asyncio
+import ipaddress
+import json
 import logging
+import os
 import re
+import time
+from contextlib import aclosing
+from datetime import datetime
+from urllib.parse import urlparse
 
-from fastapi import APIRouter, Depends, Request
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from ping3 import ping
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from sqlalchemy import or_, tuple_
 from sqlalchemy.orm import Session
+from sse_starlette.sse import EventSourceResponse
 
 import auth
+import database
+import discovery
 import models
+import pagination
 import scheduler
+import traceroute
 from auth import get_current_user
 from database import get_db
+from routers import hosts as hosts_router
 
 logger = logging.getLogger(__name__)
 limiter = Limiter(key_func=get_remote_address)
 
 router = APIRouter(tags=["Tools & Diagnostics"])
 
+# Serve /speedtest/endpoint/* so other instances can measure throughput to this one.
+# Off by default: the endpoints are unauthenticated and will saturate the link on request.
+SPEEDTEST_SERVER_ENABLED = os.getenv("SPEEDTEST_SERVER_ENABLED", "false").lower() == "true"
+SPEEDTEST_SERVER_MAX_BYTES = 100_000_000
+_ZERO_CHUNK = bytes(64 * 1024)
+
+
+# Batch quick-ping: pings in flight per request, and echo requests per second across
+# every batch running in this process
+BATCH_PING_MAX_TARGETS = 256
+BATCH_PING_CONCURRENCY = int(os.getenv("BATCH_PING_CONCURRENCY", "16"))
+BATCH_PING_RATE = int(os.getenv("BATCH_PING_RATE", "50"))
+
+_TARGET_PATTERN = re.compile(r"^[a-zA-Z0-9.\-_:\/]{1,253}$")
+
+
+def _validate_target(v: str) -> str:
+    if not _TARGET_PATTERN.match(v):
+        raise ValueError("Invalid target: use IP address or hostname only")
+    return v
+
 
 class QuickPingRequest(BaseModel):
     target: str
@@ -27,53 +64,304 @@ class QuickPingRequest(BaseModel):
     @field_validator("target")
     @classmethod
     def validate_target(cls, v: str) -> str:
-        if not re.match(r"^[a-zA-Z0-9.\-_:\/]{1,253}$", v):
-            raise ValueError("Invalid target: use IP address or hostname only")
-        return v
+        return _validate_target(v)
+
+
+class BatchPingRequest(BaseModel):
+    targets: list[str] = Field([], max_length=BATCH_PING_MAX_TARGETS)
+    group: str | None = None
+
+    @field_validator("targets")
+    @classmethod
+    def validate_targets(cls, v: list[str]) -> list[str]:
+        return [_validate_target(t) for t in v]
+
+
+class _RateBudget:
+    """
+    Spaces out starts to `rate` per second for every caller in the process. Slots are
+    handed out by time alone, so it works from any event loop.
+    """
+
+    def __init__(self, rate: int):
+        self.interval = 1 / max(rate, 1)
+        self._next = 0.0
+
+    async def acquire(self):
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+_ping_budget = _RateBudget(BATCH_PING_RATE)
+
+
+async def _ping_target(target: str) -> dict:
+    try:
+        latency = await asyncio.to_thread(ping, target, unit="ms", timeout=2)
+        if latency is None:
+            return {"target": target, "reachable": False, "latency": None, "error": "Timeout"}
+        if latency is False:
+            return {"target": target, "reachable": False, "latency": None, "error": "Unknown host"}
+        return {"target": target, "reachable": True, "latency": latency}
+    except Exception as e:
+        return {"target": target, "reachable": False, "latency": None, "error": str(e)}
 
 
 @router.post("/tools/ping")
 @limiter.limit("10/minute")
 async def quick_ping(request: Request, body: QuickPingRequest):
+    return await _ping_target(body.target)
+
+
+def _group_targets(group: str) -> list[dict]:
+    db = database.SessionLocal()
     try:
-        latency = await asyncio.to_thread(ping, body.target, unit="ms", timeout=2)
-        if latency is None:
-            return {
-                "target": body.target,
-                "reachable": False,
-                "latency": None,
-                "error": "Timeout",
-            }
-        return {"target": body.target, "reachable": True, "latency": latency}
-    except Exception as e:
-        return {
-            "target": body.target,
-            "reachable": False,
-            "latency": None,
-            "error": str(e),
+        rows = (
+            db.query(models.HostDB.id, models.HostDB.name, models.HostDB.ip_address)
+            .filter(models.HostDB.group_name == group)
+            .order_by(models.HostDB.name)
+            .limit(BATCH_PING_MAX_TARGETS)
+            .all()
+        )
+    finally:
+        db.close()
+    # HTTP monitors store a URL; ping the host part
+    return [
+        {"target": (urlparse(ip).hostname or ip) if "://" in ip else ip, "host_id": host_id, "name": name}
+        for host_id, name, ip in rows
+    ]
+
+
+async def _ping_batch(targets: list[dict]):
+    """
+    Yields ("result", payload) per target as soon as its ping completes, then ("done",
+    summary). At most BATCH_PING_CONCURRENCY pings run at once, paced by the shared budget.
+    """
+    started = time.monotonic()
+    slots = asyncio.Semaphore(BATCH_PING_CONCURRENCY)
+
+    async def run(entry):
+        async with slots:
+            await _ping_budget.acquire()
+            return {**entry, **await _ping_target(entry["target"])}
+
+    tasks = [asyncio.create_task(run(entry)) for entry in targets]
+    reachable = 0
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            reachable += result["reachable"]
+            yield "result", result
+        yield "done", {
+            "total": len(targets),
+            "reachable": reachable,
+            "elapsed": round(time.monotonic() - started, 2),
         }
+    finally:
+        # Client went away: don't start the pings still queued
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 
-@router.get("/public-ip-history")
-def get_public_ip_history(db: Session = Depends(get_db)):
-    history_db = (
-        db.query(models.PublicIPHistoryDB)
-        .order_by(models.PublicIPHistoryDB.timestamp.desc())
-        .limit(100)
-        .all()
+@router.post("/tools/ping/batch")
+@limiter.limit("10/minute")
+async def batch_ping(
+    request: Request,
+    body: BatchPingRequest,
+    format: str = "sse",
+    current_user: auth.User = Depends(get_current_user),
+):
+    """
+    Pings a list of targets and/or every host in `group` at once, streaming a `result`
+    per target as it completes and a final `done`. The whole batch counts as one request
+    against the rate limit. `format=ndjson` streams one JSON object per line instead of
+    Server-Sent Events, each carrying its event name in `event`.
+    """
+    if format not in ("sse", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be sse or ndjson")
+    targets = [{"target": t} for t in dict.fromkeys(body.targets)]
+    if body.group is not None:
+        members = await asyncio.to_thread(_group_targets, body.group)
+        if not members:
+            raise HTTPException(status_code=404, detail=f"No hosts in group {body.group}")
+        targets += members
+    if not targets:
+        raise HTTPException(status_code=400, detail="No targets given")
+    if len(targets) > BATCH_PING_MAX_TARGETS:
+        raise HTTPException(
+            status_code=413, detail=f"At most {BATCH_PING_MAX_TARGETS} targets per batch"
+        )
+
+    if format == "ndjson":
+
+        async def lines():
+            async with aclosing(_ping_batch(targets)) as events:
+                async for event, payload in events:
+                    yield orjson.dumps({"event": event, **payload}) + b"\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    async def generate():
+        async with aclosing(_ping_batch(targets)) as events:
+            async for event, payload in events:
+                yield {"event": event, "data": json.dumps(payload)}
+
+    return EventSourceResponse(generate())
+
+
+@router.post("/tools/traceroute")
+@limiter.limit("10/minute")
+async def quick_traceroute(
+    request: Request,
+    body: QuickPingRequest,
+    current_user: auth.User = Depends(get_current_user),
+):
+    """One-off MTR-style trace (all TTLs probed at once), without storing anything."""
+    try:
+        hops = await asyncio.to_thread(traceroute.trace, body.target)
+    except PermissionError:
+        raise HTTPException(status_code=503, detail="Traceroute needs raw socket access (CAP_NET_RAW)")
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "target": body.target,
+        "reached": bool(hops) and hops[-1]["reached"],
+        "hops": hops,
+    }
+
+
+def _monitored_in(network) -> dict[str, int]:
+    db = database.SessionLocal()
+    try:
+        rows = db.query(models.HostDB.id, models.HostDB.ip_address).all()
+    finally:
+        db.close()
+    known = {}
+    for host_id, ip in rows:
+        try:
+            if ipaddress.ip_address(ip) in network:
+                known[ip] = host_id
+        except ValueError:
+            continue  # hostname or URL, not an address
+    return known
+
+
+@router.post("/tools/discovery")
+async def discover_hosts(
+    body: models.DiscoveryRequest,
+    current_user: auth.User = Depends(get_current_user),
+):
+    """
+    Sweeps a CIDR range and streams Server-Sent Events: `start`, then a `host` event
+    per live address (already monitored ones carry `monitored_id`), periodic `progress`
+    and a final `done`. Pass the `host` payloads to /tools/discovery/promote to add them.
+    """
+    try:
+        network = discovery.parse_network(body.network)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if discovery.busy():
+        raise HTTPException(status_code=429, detail="Too many discovery sweeps running")
+    sweep = discovery.Sweep(
+        network,
+        ports=body.ports if body.ports is not None else discovery.DEFAULT_PORTS,
+        icmp=body.icmp,
+        resolve_names=body.resolve_names,
+        known=await asyncio.to_thread(_monitored_in, network),
     )
+    logger.info(f"{current_user.username} started discovery of {network}")
+
+    async def generate():
+        # aclosing: a client disconnect must still stop the sweep and free its slot
+        async with aclosing(sweep.events()) as events:
+            async for event, payload in events:
+                yield {"event": event, "data": json.dumps(payload)}
+
+    return EventSourceResponse(generate())
+
+
+@router.post("/tools/discovery/promote")
+def promote_discovered_hosts(
+    body: models.DiscoveryPromote,
+    db: Session = Depends(get_db),
+    current_user: auth.User = Depends(get_current_user),
+):
+    """Adds discovered hosts as monitored hosts in one go; addresses already monitored are left alone."""
+    rows = [
+        discovery.host_row(found.model_dump(), body.group_name, body.interval)
+        for found in body.hosts
+    ]
+    return hosts_router.bulk_upsert(db, rows, overwrite=False)
+
+
+@router.get("/public-ip-history")
+def get_public_ip_history(
+    version: int = Query(4, description="IP version: 4 or 6"),
+    db: Session = Depends(get_db),
+):
+    if version not in (4, 6):
+        raise HTTPException(status_code=400, detail="version must be 4 or 6")
+    query = db.query(models.PublicIPHistoryDB)
+    if version == 4:
+        query = query.filter(
+            or_(models.PublicIPHistoryDB.version == 4, models.PublicIPHistoryDB.version.is_(None))
+        )
+    else:
+        query = query.filter(models.PublicIPHistoryDB.version == version)
+    history_db = query.order_by(models.PublicIPHistoryDB.timestamp.desc()).limit(100).all()
     return [
-        {"time": r.timestamp.isoformat() + "Z", "ip_address": r.ip_address}
+        {"time": r.timestamp.isoformat() + "Z", "ip_address": r.ip_address, "version": version}
         for r in history_db
     ]
 
 
 @router.post("/speedtest/run")
 def run_speedtest_manual(current_user: auth.User = Depends(get_current_user)):
-    scheduler.scheduler.add_job(scheduler.run_speedtest)
+    # Runs on the speed test thread here; this process may not be the one running the scheduler
+    scheduler.run_speedtest()
     return {"message": "Speed test started"}
 
 
+def _require_speedtest_server():
+    if not SPEEDTEST_SERVER_ENABLED:
+        raise HTTPException(status_code=404, detail="Speed test server is disabled")
+
+
+@router.get("/speedtest/endpoint/ping", dependencies=[Depends(_require_speedtest_server)])
+def speedtest_endpoint_ping():
+    return Response(status_code=204)
+
+
+@router.get("/speedtest/endpoint/download", dependencies=[Depends(_require_speedtest_server)])
+def speedtest_endpoint_download(bytes: int = Query(..., ge=0, le=SPEEDTEST_SERVER_MAX_BYTES)):
+    def body():
+        remaining = bytes
+        while remaining > 0:
+            chunk = _ZERO_CHUNK[: min(remaining, len(_ZERO_CHUNK))]
+            remaining -= len(chunk)
+            yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type="application/octet-stream",
+        headers={"Content-Length": str(bytes), "Cache-Control": "no-store"},
+    )
+
+
+@router.post("/speedtest/endpoint/upload", dependencies=[Depends(_require_speedtest_server)])
+async def speedtest_endpoint_upload(request: Request):
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > SPEEDTEST_SERVER_MAX_BYTES:
+            break
+    return {"received": received}
+
+
 @router.get("/speedtest/history", response_model=list[models.SpeedTestResultBase])
 def get_speedtest_history(db: Session = Depends(get_db)):
     results = (
@@ -88,34 +376,68 @@ def get_speedtest_history(db: Session = Depends(get_db)):
             "download": r.download,
             "upload": r.upload,
             "ping": r.ping,
+            "jitter": r.jitter,
+            "download_latency": r.download_latency,
+            "upload_latency": r.upload_latency,
+            "streams": r.streams,
+            "server_name": r.server_name,
         }
         for r in results
     ]
 
 
+_AUDIT_FIELDS = ["id", "user", "action", "target", "timestamp", "details"]
+
+
 @router.get("/audit-log")
 def get_audit_log(
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = None,
+    fields: str | None = None,
+    action: str | None = None,
+    user: str | None = None,
     db: Session = Depends(get_db),
     current_user: auth.User = Depends(get_current_user),
 ):
+    """
+    Newest entries first, keyset-paged on (timestamp, id): pass the `X-Next-Cursor`
+    response header back as `cursor` to fetch the next page.
+    """
+    try:
+        selected = pagination.parse_fields(fields, _AUDIT_FIELDS) or _AUDIT_FIELDS
+        after = None
+        if cursor:
+            after_ts, after_id = pagination.decode_cursor(cursor, 2)
+            after = (datetime.fromisoformat(after_ts), int(after_id))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # id and timestamp are always read — they form the cursor
+    columns = ["id", "timestamp"] + [f for f in selected if f not in ("id", "timestamp")]
+    query = db.query(*(getattr(models.AuditLogDB, c) for c in columns))
+    if action:
+        query = query.filter(models.AuditLogDB.action == action)
+    if user:
+        query = query.filter(models.AuditLogDB.user == user)
+    if after is not None:
+        query = query.filter(tuple_(models.AuditLogDB.timestamp, models.AuditLogDB.id) < after)
     logs = (
-        db.query(models.AuditLogDB)
-        .order_by(models.AuditLogDB.timestamp.desc())
+        query.order_by(models.AuditLogDB.timestamp.desc(), models.AuditLogDB.id.desc())
         .limit(limit)
         .all()
     )
-    return [
-        {
-            "id": log.id,
-            "user": log.user,
-            "action": log.action,
-            "target": log.target,
-            "timestamp": log.timestamp.isoformat() + "Z",
-            "details": log.details,
-        }
-        for log in logs
-    ]
+
+    entries = []
+    for log in logs:
+        row = log._asdict()
+        row["timestamp"] = row["timestamp"].isoformat() + "Z"
+        entries.append({f: row[f] for f in selected})
+
+    headers = {}
+    if len(logs) == limit:
+        last = logs[-1]
+        headers["X-Next-Cursor"] = pagination.encode_cursor(last.timestamp.isoformat(), last.id)
+    return JSONResponse(content=entries, headers=headers)
 
 
 def _audit(db: Session, user: str, action: str, target: str, details: str = ""):
@@ -0,0 +1,381 @@
+import bisect
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+import database
+from events import (
+    HOST_DELETED,
+    HOST_UPDATED,
+    PROBE_RESULT,
+    RULES_CHANGED,
+    STATUS_CHANGE,
+    event_bus,
+)
+from models import AlertRuleDB, HostDB
+from notifications import notification_manager
+
+logger = logging.getLogger(__name__)
+
+# Defaults for rules saved without an explicit threshold/window
+_DEFAULTS = {
+    "consecutive_failures": (3, None),
+    "loss": (10.0, 300),
+    "latency_p95": (200.0, 600),
+    "no_data": (None, 300),
+}
+# Windowed loss needs this many samples before it can fire, so one lost probe isn't "100% loss"
+MIN_LOSS_SAMPLES = 5
+# Hard cap on buffered samples per (rule, host), whatever the window
+MAX_WINDOW_SAMPLES = 10_000
+# HOST_UPDATED fields that change which rules apply to a host or how alerts name it
+_META_FIELDS = {"name", "group_name", "enabled", "latency_threshold_ms"}
+
+
+class Rule:
+    """Immutable snapshot of an AlertRuleDB row (or an implicit per-host rule)."""
+
+    __slots__ = ("key", "name", "rule_type", "host_id", "group_name", "threshold", "window")
+
+    def __init__(
+        self, key, name, rule_type, host_id=None, group_name=None, threshold=None, window=None
+    ):
+        default_threshold, default_window = _DEFAULTS.get(rule_type, (None, None))
+        self.key = key
+        self.name = name
+        self.rule_type = rule_type
+        self.host_id = host_id
+        self.group_name = group_name
+        self.threshold = threshold if threshold is not None else default_threshold
+        self.window = window if window is not None else default_window
+
+    @classmethod
+    def from_db(cls, row: AlertRuleDB) -> "Rule":
+        return cls(
+            row.id,
+            row.name,
+            row.rule_type,
+            host_id=row.host_id,
+            group_name=row.group_name,
+            threshold=row.threshold,
+            window=row.window_seconds,
+        )
+
+    def applies_to(self, host_id: int, group_name: str | None) -> bool:
+        if self.host_id is not None:
+            return self.host_id == host_id
+        if self.group_name is not None:
+            return self.group_name == group_name
+        return True
+
+
+class RuleState:
+    """
+    Per (rule, host) evaluation state. Windowed rules keep a ring buffer of samples plus
+    running aggregates: loss counts in O(1), and the window's latencies in sorted order
+    (a bisect and a memmove per sample) so percentiles are exact.
+    """
+
+    __slots__ = (
+        "samples",
+        "failures",
+        "consecutive",
+        "latencies",
+        "successes",
+        "firing",
+        "last_seen",
+    )
+
+    def __init__(self):
+        self.samples = deque(maxlen=MAX_WINDOW_SAMPLES)
+        self.failures = 0
+        self.consecutive = 0
+        self.latencies: list[float] = []
+        self.successes = 0
+        self.firing = False
+        self.last_seen = None
+
+    def push(self, ts: float, latency: float | None):
+        if len(self.samples) == self.samples.maxlen:
+            self._forget(self.samples[0])
+        self.samples.append((ts, latency))
+        if latency is None:
+            self.failures += 1
+        else:
+            self.successes += 1
+            bisect.insort(self.latencies, latency)
+
+    def evict_before(self, cutoff: float):
+        while self.samples and self.samples[0][0] < cutoff:
+            self._forget(self.samples.popleft())
+
+    def _forget(self, sample):
+        latency = sample[1]
+        if latency is None:
+            self.failures -= 1
+        else:
+            self.successes -= 1
+            del self.latencies[bisect.bisect_left(self.latencies, latency)]
+
+    def loss_percent(self) -> float:
+        total = self.failures + self.successes
+        return self.failures / total * 100 if total else 0.0
+
+    def percentile(self, q: float) -> float | None:
+        """Nearest-rank q-th percentile of the successful samples in the window."""
+        if not self.latencies:
+            return None
+        return self.latencies[max(math.ceil(q * len(self.latencies)) - 1, 0)]
+
+
+class RuleEngine:
+    """
+    Evaluates alert rules incrementally on each probe result from the event bus.
+    Notifies once when a rule starts firing for a host and once when it resolves.
+    """
+
+    def __init__(self, notify=None):
+        self._notifier = notify
+        self._lock = threading.Lock()
+        self._rules: list[Rule] | None = None
+        self._hosts: dict[int, dict] = {}
+        self._host_rules: dict[int, list[Rule]] = {}
+        # Bumped by forget_host, so a lookup racing a host edit isn't cached
+        self._generation = 0
+        self._states: dict[tuple, RuleState] = {}
+        # Hosts paused behind a failed parent; their silence is expected, not "no data"
+        self._unreachable: set[int] = set()
+
+    def _notify(self, title: str, body: str):
+        (self._notifier or notification_manager.send_notification)(title, body)
+
+    # --- configuration -------------------------------------------------
+
+    def set_rules(self, rules: list[Rule]):
+        with self._lock:
+            self._rules = rules
+            self._host_rules.clear()
+            # Keep state for surviving rules and for implicit (string-keyed) per-host rules
+            keys = {r.key for r in rules}
+            self._states = {
+                k: v for k, v in self._states.items() if k[0] in keys or isinstance(k[0], str)
+            }
+
+    def load_rules(self):
+        db = database.SessionLocal()
+        try:
+            rows = db.query(AlertRuleDB).filter(AlertRuleDB.enabled == True).all()
+            self.set_rules([Rule.from_db(r) for r in rows])
+        finally:
+            db.close()
+
+    def _host_meta(self, host_id: int) -> dict | None:
+        """Cached name/group/threshold for a host. The query on a miss runs outside the lock."""
+        with self._lock:
+            meta = self._hosts.get(host_id)
+            generation = self._generation
+        if meta is not None:
+            return meta
+        db = database.SessionLocal()
+        try:
+            host = (
+                db.query(HostDB.name, HostDB.group_name, HostDB.latency_threshold_ms)
+                .filter(HostDB.id == host_id)
+                .first()
+            )
+        finally:
+            db.close()
+        if host is None:
+            return None
+        meta = {
+            "name": host.name,
+            "group_name": host.group_name,
+            "latency_threshold_ms": host.latency_threshold_ms,
+        }
+        with self._lock:
+            # A host edit while we were querying makes this row stale; use it once, don't cache it
+            if generation == self._generation:
+                meta = self._hosts.setdefault(host_id, meta)
+        return meta
+
+    def _rules_for(self, host_id: int, meta: dict) -> list[Rule]:
+        rules = self._host_rules.get(host_id)
+        if rules is None:
+            rules = [r for r in self._rules if r.applies_to(host_id, meta["group_name"])]
+            if meta["latency_threshold_ms"]:
+                # The per-host latency threshold is an implicit single-sample rule
+                rules.append(
+                    Rule(
+                        f"latency:{host_id}",
+                        "High Latency",
+                        "latency_sample",
+                        host_id=host_id,
+                        threshold=meta["latency_threshold_ms"],
+                    )
+                )
+            self._host_rules[host_id] = rules
+        return rules
+
+    def forget_host(self, host_id: int):
+        with self._lock:
+            self._generation += 1
+            self._hosts.pop(host_id, None)
+            self._host_rules.pop(host_id, None)
+
+    # --- evaluation ----------------------------------------------------
+
+    def on_event(self, event: dict):
+        if event["type"] == PROBE_RESULT:
+            if event.get("origin", event_bus.origin) != event_bus.origin:
+                # Evaluated by the process that produced it; every peer doing so would alert N times
+                return
+            self.observe(
+                event["host_id"],
+                event.get("latency"),
+                event.get("ts"),
+                event.get("suppressed", False),
+            )
+        elif event["type"] == STATUS_CHANGE:
+            with self._lock:
+                if event["status"] == "UNREACHABLE":
+                    self._unreachable.add(event["host_id"])
+                else:
+                    self._unreachable.discard(event["host_id"])
+        elif event["type"] == HOST_DELETED or (
+            event["type"] == HOST_UPDATED and _META_FIELDS.intersection(event)
+        ):
+            # Status and latency updates (e.g. the average_latency refresh) keep the cache
+            self.forget_host(event["host_id"])
+        elif event["type"] == RULES_CHANGED:
+            self.load_rules()
+
+    def observe(
+        self,
+        host_id: int,
+        latency: float | None,
+        ts: float | None = None,
+        suppressed: bool = False,
+    ):
+        """
+        Folds one probe sample into every rule that applies to the host.
+        `suppressed` samples (e.g. during maintenance) update state but never notify.
+        """
+        if self._rules is None:
+            self.load_rules()
+        ts = time.time() if ts is None else ts
+        transitions = []
+        meta = self._host_meta(host_id)
+        if meta is None:
+            return
+        with self._lock:
+            for rule in self._rules_for(host_id, meta):
+                state = self._states.setdefault((rule.key, host_id), RuleState())
+                state.last_seen = ts
+                value = self._evaluate(rule, state, ts, latency)
+                if value is None:
+                    continue
+                breached, detail = value
+                if breached != state.firing:
+                    state.firing = breached
+                    transitions.append((rule, meta, breached, detail))
+
+        if not suppressed:
+            for rule, meta, breached, detail in transitions:
+                self._announce(rule, meta, breached, detail)
+
+    @staticmethod
+    def _evaluate(rule: Rule, state: RuleState, ts: float, latency: float | None):
+        """Returns (breached, detail) or None when the rule has no opinion on this sample."""
+        if rule.rule_type == "consecutive_failures":
+            state.consecutive = state.consecutive + 1 if latency is None else 0
+            return (
+                state.consecutive >= rule.threshold,
+                f"{state.consecutive} consecutive failures",
+            )
+        if rule.rule_type == "loss":
+            state.push(ts, latency)
+            state.evict_before(ts - rule.window)
+            if len(state.samples) < MIN_LOSS_SAMPLES:
+                return None
+            loss = state.loss_percent()
+            return (
+                loss > rule.threshold,
+                f"loss {loss:.1f}% over {rule.window}s (limit {rule.threshold:g}%)",
+            )
+        if rule.rule_type == "latency_p95":
+            state.push(ts, latency)
+            state.evict_before(ts - rule.window)
+            p95 = state.percentile(0.95)
+            if p95 is None:
+                return None
+            return (
+                p95 > rule.threshold,
+                f"p95 {p95:.1f}ms over {rule.window}s (limit {rule.threshold:g}ms)",
+            )
+        if rule.rule_type == "latency_sample":
+            if latency is None:
+                return None
+            return (
+                latency > rule.threshold,
+                f"latency {latency:.2f}ms (threshold {rule.threshold:.0f}ms)",
+            )
+        if rule.rule_type == "no_data":
+            # Receiving a sample always clears a no-data condition
+            return False, "data received"
+        return None
+
+    def check_stale(self, now: float | None = None):
+        """
+        Fires `no_data` rules for hosts whose last sample is older than the rule's window.
+        Cost is proportional to the number of (no_data rule, host) pairs, not to samples.
+        """
+        now = time.time() if now is None else now
+        candidates = []
+        with self._lock:
+            if not self._rules:
+                return
+            no_data = {r.key: r for r in self._rules if r.rule_type == "no_data"}
+            for (key, host_id), state in self._states.items():
+                rule = no_data.get(key)
+                if rule is None or state.firing or state.last_seen is None:
+                    continue
+                if host_id in self._unreachable:
+                    continue
+                if now - state.last_seen > rule.window:
+                    candidates.append((rule, host_id, state, state.last_seen))
+
+        transitions = []
+        for rule, host_id, state, last_seen in candidates:
+            # Firing is only recorded with its alert, so a later "Resolved" always has one
+            meta = self._host_meta(host_id)
+            if meta is None:
+                # The host is gone; there's nothing to alert about, now or later
+                with self._lock:
+                    self._states.pop((rule.key, host_id), None)
+                continue
+            with self._lock:
+                if state.firing or state.last_seen != last_seen:
+                    continue
+                state.firing = True
+            transitions.append((rule, meta, True, f"no data for {now - last_seen:.0f}s"))
+        for rule, meta, breached, detail in transitions:
+            self._announce(rule, meta, breached, detail)
+
+    def _announce(self, rule: Rule, meta: dict, breached: bool, detail: str):
+        if breached:
+            title = f"⚠️ {rule.name}: {meta['name']}"
+        else:
+            title = f"✅ Resolved {rule.name}: {meta['name']}"
+        body = f"Host: {meta['name']}\nRule: {rule.name} ({rule.rule_type})\n{detail}"
+        try:
+            self._notify(title, body)
+        except Exception as e:
+            logger.error(f"Error sending rule alert: {e}")
+
+
+engine = RuleEngine()
+event_bus.add_listener(
+    engine.on_event, {PROBE_RESULT, STATUS_CHANGE, HOST_UPDATED, HOST_DELETED, RULES_CHANGED}
+)
@@ -1,51 +1,113 @@
 import json
 import logging
+import os
 import socket
 import ssl
-import subprocess
+import statistics
 import time
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from urllib.parse import urlparse
 
 import requests
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
 from apscheduler.schedulers.background import BackgroundScheduler
 from ping3 import ping
-from sqlalchemy import func
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
 
+import agents
+import alerts
+import dependencies
+import dns_client
+import dnscache
+import http_assert
+import icmp
+import jobstats
+import maintenance
+import publicip
+import rules
+import throughput
+import traceroute
+import uptime
 from database import SessionLocal
-from models import HostDB, PingResultDB, PublicIPHistoryDB, SpeedTestResultDB
+from events import HOST_UPDATED, PROBE_RESULT, RESYNC_REQUESTED, STATUS_CHANGE, event_bus
+from models import (
+    BURST_FIELDS,
+    DailyUptimeDB,
+    HostDB,
+    NotificationOutboxDB,
+    PingResultDB,
+    PublicIPHistoryDB,
+    RouteChangeDB,
+    SpeedTestResultDB,
+    TraceHopDB,
+)
 from notifications import notification_manager
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-scheduler = BackgroundScheduler()
+
+def _new_scheduler() -> BackgroundScheduler:
+    instance = BackgroundScheduler(executors={"default": jobstats.InstrumentedExecutor()})
+    instance.add_listener(
+        jobstats.stats.on_event, EVENT_JOB_ERROR | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES
+    )
+    return instance
+
+
+scheduler = _new_scheduler()
 _speedtest_executor = ThreadPoolExecutor(max_workers=1)
 _speedtest_running = False
+# Fallback for deployments without an event bus transport: the scheduler process
+# re-reads hosts, agents and cached config from the database this often
+SCHEDULER_RESYNC_INTERVAL = int(os.getenv("SCHEDULER_RESYNC_INTERVAL", "60"))
+# Spacing between the packets of a multi-packet (probe_count > 1) icmp/tcp probe
+PROBE_BURST_INTERVAL = float(os.getenv("PROBE_BURST_INTERVAL", "0.01"))
+# Per-packet timeout, in seconds, shared by single- and multi-packet probes
+PROBE_TIMEOUT = 2
+
+
+# Last recorded public address per IP version, so unchanged results skip the DB
+_last_public_ip: dict[int, str | None] = {}
 
 
 def check_public_ip():
+    for version in publicip.PUBLIC_IP_VERSIONS:
+        try:
+            ip_address = publicip.resolver.resolve(version)
+            if ip_address is None:
+                continue
+            if version not in _last_public_ip:
+                _last_public_ip[version] = _load_last_public_ip(version)
+            last_ip = _last_public_ip[version]
+            if last_ip != ip_address:
+                logger.info(f"Public IPv{version} changed: {last_ip} → {ip_address}")
+                db = SessionLocal()
+                try:
+                    db.add(PublicIPHistoryDB(ip_address=ip_address, version=version))
+                    db.commit()
+                finally:
+                    db.close()
+                _last_public_ip[version] = ip_address
+        except Exception as e:
+            logger.error(f"Error checking public IPv{version}: {e}")
+
+
+def _load_last_public_ip(version: int) -> str | None:
     db = SessionLocal()
     try:
-        response = requests.get("https://api.ipify.org?format=json", timeout=10)
-        if response.status_code == 200:
-            ip_address = response.json().get("ip")
-            last_record = (
-                db.query(PublicIPHistoryDB)
-                .order_by(PublicIPHistoryDB.timestamp.desc())
-                .first()
+        query = db.query(PublicIPHistoryDB.ip_address)
+        if version == 4:
+            # Rows from before IPv6 support have no version
+            query = query.filter(
+                or_(PublicIPHistoryDB.version == 4, PublicIPHistoryDB.version.is_(None))
             )
-            last_ip = last_record.ip_address if last_record else None
-            if last_ip != ip_address:
-                logger.info(f"Public IP changed: {last_ip} → {ip_address}")
-                db.add(PublicIPHistoryDB(ip_address=ip_address))
-                db.commit()
         else:
-            logger.error(f"Failed to get public IP: {response.status_code}")
-    except Exception as e:
-        logger.error(f"Error checking public IP: {e}")
+            query = query.filter(PublicIPHistoryDB.version == version)
+        row = query.order_by(PublicIPHistoryDB.timestamp.desc()).first()
+        return row.ip_address if row else None
     finally:
         db.close()
 
@@ -60,26 +122,27 @@ def _run_speedtest_sync():
     db = SessionLocal()
     try:
         logger.info("Starting Internet Speed Test...")
-        cmd = ["speedtest-cli", "--json", "--secure"]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
-        if result.returncode != 0:
-            logger.error(f"Speedtest failed: {result.stderr}")
-            return
-        data = json.loads(result.stdout)
-        download_mbps = data["download"] / 1_000_000
-        upload_mbps = data["upload"] / 1_000_000
-        ping_ms = data["ping"]
+        result = throughput.ThroughputTest().run()
         logger.info(
-            f"Speedtest: D:{download_mbps:.2f} Mbps U:{upload_mbps:.2f} Mbps P:{ping_ms:.2f}ms"
+            f"Speedtest: D:{result['download']:.2f} Mbps U:{result['upload']:.2f} Mbps "
+            f"P:{result['ping']:.2f}ms J:{result['jitter']:.2f}ms"
         )
         db.add(
             SpeedTestResultDB(
-                download=download_mbps,
-                upload=upload_mbps,
-                ping=ping_ms,
-                server_id=data["server"]["id"],
-                server_name=data["server"]["name"],
-                server_country=data["server"]["country"],
+                download=result["download"],
+                upload=result["upload"],
+                ping=result["ping"],
+                jitter=result["jitter"],
+                download_latency=result["download_latency"],
+                upload_latency=result["upload_latency"],
+                streams=len(result["download_streams"]),
+                stream_mbps=json.dumps(
+                    {
+                        "download": result["download_streams"],
+                        "upload": result["upload_streams"],
+                    }
+                ),
+                server_name=result["server"],
             )
         )
         db.commit()
@@ -95,14 +158,34 @@ def run_speedtest():
     _speedtest_executor.submit(_run_speedtest_sync)
 
 
-def check_http(url: str, expected_status: int = 200, timeout: int = 5):
+def check_http(
+    url: str,
+    expected_status: int = 200,
+    timeout: int = 5,
+    assertion: http_assert.BodyAssertion | None = None,
+):
+    """
+    UP if the status matches and the body passes `assertion`, if any. The body is
+    streamed and only read as far as the assertion needs; without one it's not read.
+    Latency runs until the check is decided.
+    """
     try:
         if not url.startswith("http"):
             url = f"http://{url}"
-        start_time = time.time()
-        response = requests.get(url, timeout=timeout)
-        latency = (time.time() - start_time) * 1000
-        is_up = response.status_code == expected_status
+        # A fresh session per check keeps connect/TLS time in the measurement; only the
+        # name lookup comes from the shared cache
+        with requests.Session() as session:
+            adapter = dnscache.CachedDNSAdapter()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            start_time = time.time()
+            with session.get(url, timeout=timeout, stream=True) as response:
+                is_up = response.status_code == expected_status
+                if is_up and assertion is not None:
+                    is_up, detail = assertion.evaluate(response.iter_content(http_assert.CHUNK_SIZE))
+                    if not is_up:
+                        logger.warning(f"HTTP body assertion failed for {url}: {detail}")
+                latency = (time.time() - start_time) * 1000
         return is_up, latency, response.status_code
     except Exception as e:
         logger.warning(f"HTTP check failed for {url}: {e}")
@@ -151,7 +234,8 @@ def check_ssl_expiry(host: str, port: int = 443):
     try:
         context = ssl.create_default_context()
         context.minimum_version = ssl.TLSVersion.TLSv1_2
-        with socket.create_connection((host, port), timeout=5) as sock:
+        address = dnscache.cache.resolve(host)
+        with socket.create_connection((address, port), timeout=5) as sock:
             with context.wrap_socket(sock, server_hostname=host) as ssock:
                 cert = ssock.getpeercert()
                 expiry_date = datetime.strptime(
@@ -163,14 +247,255 @@ def check_ssl_expiry(host: str, port: int = 443):
         return None
 
 
-def _is_in_maintenance_window(host: HostDB) -> bool:
-    """Returns True if host is currently in a scheduled maintenance window."""
-    if host.maintenance:
-        return True
-    if host.maintenance_start and host.maintenance_end:
-        now = datetime.utcnow()
-        return host.maintenance_start <= now <= host.maintenance_end
-    return False
+def check_dns(
+    name: str,
+    query_name: str,
+    server: str | None = None,
+    record_type: str | None = "A",
+    expected: str | None = None,
+) -> float:
+    """
+    Times a query for `query_name` against `server` (default: the first cache resolver).
+    UP only if the answer has records of `record_type` and contains every value of the
+    comma-separated `expected` list. Returns latency in ms, or -1.
+    """
+    server = server or next(iter(dnscache.cache.servers), None)
+    record_type = (record_type or "A").upper()
+    expected = [e.strip() for e in (expected or "").split(",") if e.strip()]
+    if not server:
+        logger.warning(f"DNS check for {name}: no resolver configured")
+        return -1.0
+    rtype = dns_client.RECORD_TYPES.get(record_type)
+    if rtype is None:
+        logger.warning(f"DNS check for {name}: unsupported record type {record_type}")
+        return -1.0
+
+    start_time = time.time()
+    try:
+        answers = dns_client.query(query_name, rtype, server, timeout=2)
+    except dns_client.DNSError as e:
+        logger.warning(f"DNS {name} ({query_name} {record_type} @{server}) failed: {e}")
+        return -1.0
+    latency = (time.time() - start_time) * 1000
+
+    values = {a["value"].lower().rstrip(".") for a in answers if a["type"] == rtype}
+    missing = [e for e in expected if e.lower().rstrip(".") not in values]
+    if not values or missing:
+        logger.warning(
+            f"DNS {name} ({query_name} {record_type} @{server}): "
+            f"unexpected answer {sorted(values)}, missing {missing}"
+        )
+        return -1.0
+    logger.info(f"DNS {name} ({query_name} {record_type} @{server}): {latency:.2f}ms")
+    return latency
+
+
+def _dns_config(host_id: int) -> dict:
+    db = SessionLocal()
+    try:
+        host = db.query(HostDB).filter(HostDB.id == host_id).first()
+        if not host:
+            return {}
+        return {
+            "server": host.dns_server,
+            "record_type": host.dns_record_type,
+            "expected": host.dns_expected,
+        }
+    finally:
+        db.close()
+
+
+def _http_config(host) -> dict | None:
+    """A host's body-assertion settings, carried in its job args so probes don't query them."""
+    if host.monitor_type != "http" or not host.http_match_type:
+        return None
+    return {
+        "match_type": host.http_match_type,
+        "match": host.http_match,
+        "json_path": host.http_json_path,
+        "max_bytes": host.http_max_bytes,
+    }
+
+
+def _trace(name: str, ip_address: str) -> list[dict]:
+    try:
+        return traceroute.trace(ip_address)
+    except (OSError, ValueError) as e:
+        logger.error(f"Traceroute error for {name}: {e}")
+        return []
+
+
+def summarize_rtts(rtts: list[float | None]) -> dict:
+    """Loss and latency statistics of one burst; `rtts` has None for each lost packet."""
+    replies = [rtt for rtt in rtts if rtt is not None]
+    stats = dict.fromkeys(("latency",) + BURST_FIELDS)
+    stats.update(sent=len(rtts), received=len(replies))
+    if replies:
+        stats.update(
+            latency=round(statistics.fmean(replies), 3),
+            latency_min=round(min(replies), 3),
+            latency_max=round(max(replies), 3),
+            latency_stddev=round(statistics.pstdev(replies), 3),
+        )
+    if len(replies) > 1:
+        # Mean change between consecutive replies (what VoIP folks call jitter)
+        stats["jitter"] = round(
+            statistics.fmean(abs(b - a) for a, b in zip(replies, replies[1:])), 3
+        )
+    return stats
+
+
+def is_burst(monitor_type: str | None, port: int | None, probe_count: int | None) -> bool:
+    if (probe_count or 1) <= 1:
+        return False
+    return (monitor_type or "icmp") == "icmp" or (monitor_type == "tcp" and bool(port))
+
+
+def _tcp_connect(address: str, port: int, timeout: float = PROBE_TIMEOUT) -> float | None:
+    """Connect time in ms, or None if the port didn't accept."""
+    family = socket.AF_INET6 if ":" in address else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        start_time = time.time()
+        result = sock.connect_ex((address, port))
+        end_time = time.time()
+    finally:
+        sock.close()
+    return (end_time - start_time) * 1000 if result == 0 else None
+
+
+def _ping_each(address: str, count: int) -> list[float | None]:
+    """One ping3 echo at a time: for IPv6, or where no ICMP socket of our own can be opened."""
+    rtts = []
+    for i in range(count):
+        if i:
+            time.sleep(PROBE_BURST_INTERVAL)
+        latency = ping(address, unit="ms", timeout=PROBE_TIMEOUT)
+        rtts.append(float(latency) if latency not in (None, False) else None)
+    return rtts
+
+
+def probe_burst(name: str, ip_address: str, port: int | None, monitor_type: str, count: int) -> dict:
+    """
+    Sends `count` ICMP echoes or TCP connects paced PROBE_BURST_INTERVAL apart and
+    returns summarize_rtts() of them. Like probe(), it doesn't touch the database.
+    """
+    try:
+        address = dnscache.cache.resolve(ip_address)
+    except socket.gaierror as e:
+        logger.warning(f"Cannot resolve {name} ({ip_address}): {e}")
+        return summarize_rtts([None] * count)
+
+    if monitor_type == "tcp":
+        # A filtered port would cost the full timeout per packet; cap the whole burst instead
+        deadline = time.monotonic() + PROBE_TIMEOUT + count * PROBE_BURST_INTERVAL
+        rtts = []
+        for i in range(count):
+            if i:
+                time.sleep(PROBE_BURST_INTERVAL)
+            remaining = deadline - time.monotonic()
+            try:
+                rtts.append(_tcp_connect(address, port, remaining) if remaining > 0 else None)
+            except OSError as e:
+                logger.warning(f"TCP error for {name}: {e}")
+                rtts.append(None)
+    elif ":" in address:
+        rtts = _ping_each(address, count)
+    else:
+        try:
+            rtts = icmp.burst(address, count, PROBE_BURST_INTERVAL, PROBE_TIMEOUT)
+        except PermissionError:
+            rtts = _ping_each(address, count)
+
+    stats = summarize_rtts(rtts)
+    if stats["received"]:
+        logger.info(
+            f"{monitor_type.upper()} {name} ({ip_address}): {stats['received']}/{count} "
+            f"avg {stats['latency']:.2f}ms jitter {stats['jitter'] or 0:.2f}ms"
+        )
+    else:
+        logger.warning(f"No replies from {name} ({ip_address}) to {count} probes")
+    return stats
+
+
+def probe(
+    name: str,
+    ip_address: str,
+    port: int = None,
+    monitor_type: str = "icmp",
+    expected_status: int = 200,
+    dns: dict | None = None,
+    http: dict | None = None,
+) -> float:
+    """
+    Runs one check without touching the database (shared with probe agents).
+    Returns latency in ms, or -1 when the target is down.
+    """
+    latency_val = -1.0
+    if monitor_type == "http":
+        try:
+            assertion = http_assert.from_config(http)
+        except ValueError as e:
+            logger.error(f"Invalid HTTP assertion for {name}: {e}")
+            return latency_val
+        is_up, latency_val, _ = check_http(ip_address, expected_status, assertion=assertion)
+        if not is_up:
+            latency_val = -1.0
+    elif monitor_type == "dns":
+        latency_val = check_dns(name, ip_address, **(dns or {}))
+    elif monitor_type == "traceroute":
+        latency_val = traceroute.destination_latency(_trace(name, ip_address))
+    elif monitor_type == "tcp" and port:
+        try:
+            connect_ms = _tcp_connect(dnscache.cache.resolve(ip_address), port)
+            if connect_ms is not None:
+                latency_val = connect_ms
+                logger.info(f"TCP {name} ({ip_address}:{port}): {latency_val:.2f}ms")
+            else:
+                logger.warning(f"TCP failed for {name} ({ip_address}:{port})")
+        except Exception as e:
+            logger.error(f"TCP error for {name}: {e}")
+    else:
+        try:
+            latency = ping(dnscache.cache.resolve(ip_address), unit="ms", timeout=PROBE_TIMEOUT)
+        except socket.gaierror as e:
+            logger.warning(f"Cannot resolve {name} ({ip_address}): {e}")
+            latency = False
+        if latency is None:
+            logger.warning(f"Ping timeout for {name} ({ip_address})")
+        elif latency is not False:  # ping3 returns False on errors
+            latency_val = float(latency)
+            logger.info(f"Ping {name} ({ip_address}): {latency_val:.2f}ms")
+    return latency_val
+
+
+def _mark_unreachable(host_id: int, name: str):
+    """
+    Records that a host is cut off by a failed upstream host. No probe, sample or alert:
+    the parent's own alert already explains the outage.
+    """
+    dependencies.graph.count_skipped()
+    if dependencies.graph.status(host_id) == dependencies.UNREACHABLE:
+        return
+    db = SessionLocal()
+    try:
+        host = db.query(HostDB).filter(HostDB.id == host_id).first()
+        if not host or host.last_status == dependencies.UNREACHABLE:
+            return
+        previous = host.last_status
+        host.last_status = dependencies.UNREACHABLE
+        db.commit()
+        logger.info(f"{name} status: {previous} → {dependencies.UNREACHABLE} (upstream down)")
+        event_bus.publish(
+            STATUS_CHANGE,
+            host_id=host_id,
+            name=name,
+            previous=previous,
+            status=dependencies.UNREACHABLE,
+        )
+    finally:
+        db.close()
 
 
 def ping_host(
@@ -180,164 +505,128 @@ def ping_host(
     port: int = None,
     monitor_type: str = "icmp",
     expected_status: int = 200,
+    probe_count: int = 1,
+    http: dict | None = None,
 ):
+    lag = jobstats.current_lag()
     try:
-        latency_val = -1.0
+        # Children of a DOWN/UNREACHABLE host are paused rather than probed into timeouts
+        if dependencies.graph.is_blocked(host_id):
+            _mark_unreachable(host_id, name)
+            return
 
-        if monitor_type == "heartbeat":
-            # Heartbeat monitors don't get polled — they receive pushes via /heartbeat/{slug}
-            # We just check if a heartbeat was received recently
-            db = SessionLocal()
-            try:
-                host = db.query(HostDB).filter(HostDB.id == host_id).first()
-                if host and host.heartbeat_interval:
-                    cutoff = datetime.utcnow() - timedelta(
-                        seconds=host.heartbeat_interval * 2
-                    )
-                    last = (
-                        db.query(PingResultDB)
-                        .filter(
-                            PingResultDB.host_id == host_id,
-                            PingResultDB.timestamp >= cutoff,
-                        )
-                        .order_by(PingResultDB.timestamp.desc())
-                        .first()
-                    )
-                    latency_val = (
-                        last.latency if last and last.latency is not None else -1.0
-                    )
-            finally:
-                db.close()
-        elif monitor_type == "http":
-            is_up, latency_val, _ = check_http(ip_address, expected_status)
-            if not is_up:
-                latency_val = -1.0
-        elif monitor_type == "tcp" and port:
-            try:
-                start_time = time.time()
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(2)
-                result = sock.connect_ex((ip_address, port))
-                end_time = time.time()
-                sock.close()
-                if result == 0:
-                    latency_val = (end_time - start_time) * 1000
-                    logger.info(
-                        f"TCP {name} ({ip_address}:{port}): {latency_val:.2f}ms"
-                    )
-                else:
-                    logger.warning(f"TCP failed for {name} ({ip_address}:{port})")
-            except Exception as e:
-                logger.error(f"TCP error for {name}: {e}")
+        started = time.perf_counter()
+        hops = None
+        stats = None
+        if is_burst(monitor_type, port, probe_count):
+            stats = probe_burst(name, ip_address, port, monitor_type or "icmp", probe_count)
+            latency_val = stats["latency"] if stats["received"] else -1.0
+        elif monitor_type == "traceroute":
+            # Traced here rather than in probe() so the hops can be stored with the sample
+            hops = _trace(name, ip_address)
+            latency_val = traceroute.destination_latency(hops)
         else:
-            latency = ping(ip_address, unit="ms", timeout=2)
-            if latency is None:
-                logger.warning(f"Ping timeout for {name} ({ip_address})")
-            else:
-                latency_val = float(latency)
-                logger.info(f"Ping {name} ({ip_address}): {latency_val:.2f}ms")
+            dns = _dns_config(host_id) if monitor_type == "dns" else None
+            latency_val = probe(name, ip_address, port, monitor_type, expected_status, dns, http)
+
+        duration = time.perf_counter() - started
 
-        # Save result
+        current_status = "UP" if latency_val >= 0 else "DOWN"
+
+        # Save the result and any status change in one transaction, on one read of the host
+        host = None
+        previous = None
+        group_name = None
+        in_maintenance = False
+        alert_up = None
+        route_change = None
+        started = time.perf_counter()
         db = SessionLocal()
         try:
+            host = db.query(HostDB).filter(HostDB.id == host_id).first()
+            if host is not None:
+                previous = host.last_status
+                group_name = host.group_name
+                in_maintenance = maintenance.in_maintenance(host)
+                if previous == dependencies.UNREACHABLE:
+                    # Back from behind a failed parent: only a recovery if it was DOWN before
+                    alert_up = dependencies.was_down(db, host_id)
+            burst = {f: stats[f] for f in BURST_FIELDS} if stats else {}
             db.add(
                 PingResultDB(
                     host_id=host_id,
                     latency=latency_val if latency_val >= 0 else None,
+                    **burst,
                 )
             )
+            uptime.record_sample(
+                db,
+                host_id,
+                latency_val >= 0,
+                in_maintenance=in_maintenance,
+                sent=stats["sent"] if stats else 1,
+                received=stats["received"] if stats else None,
+            )
+            if hops:
+                route_change = traceroute.record(db, host_id, hops)
+            if host is not None:
+                host.last_status = current_status
             db.commit()
         except Exception as e:
             logger.error(f"Error saving ping result: {e}")
             db.rollback()
+            route_change = None
+            # Nothing was written, so the stored status is unchanged
+            previous = current_status
         finally:
             db.close()
-
-        # Status change detection + alerts
-        db = SessionLocal()
-        try:
-            host = db.query(HostDB).filter(HostDB.id == host_id).first()
-            if not host:
-                return
-
-            current_status = "UP" if latency_val >= 0 else "DOWN"
-
-            if host.last_status != current_status:
-                logger.info(f"{name} status: {host.last_status} → {current_status}")
-                if not _is_in_maintenance_window(host):
-                    icon = "🔴" if current_status == "DOWN" else "🟢"
-                    notification_manager.send_notification(
-                        f"{icon} Host {name} is {current_status}",
-                        f"Host: {name} ({ip_address})\nState: {current_status}\nTime: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-                    )
-                host.last_status = current_status
-                db.commit()
-
-            # Latency threshold alert
-            if (
-                current_status == "UP"
-                and host.latency_threshold_ms
-                and latency_val > host.latency_threshold_ms
-                and not _is_in_maintenance_window(host)
-            ):
-                notification_manager.send_notification(
-                    f"⚡ High Latency: {name}",
-                    f"Host: {name} ({ip_address})\nLatency: {latency_val:.2f}ms\nThreshold: {host.latency_threshold_ms:.0f}ms",
-                )
-        finally:
-            db.close()
-
-    except Exception as e:
-        logger.error(f"Error checking {name}: {e}")
-
-
-def check_heartbeat_timeouts():
-    """Check heartbeat-type hosts for missed heartbeats."""
-    db = SessionLocal()
-    try:
-        hosts = (
-            db.query(HostDB)
-            .filter(
-                HostDB.monitor_type == "heartbeat",
-                HostDB.enabled == True,
-                HostDB.heartbeat_interval != None,
-            )
-            .all()
-        )
-
-        if not hosts:
+        db_write = time.perf_counter() - started
+        traceroute.publish_change(route_change, name)
+        if host is None:
             return
 
-        host_ids = [host.id for host in hosts]
-
-        # Optimize: single query to get the latest ping timestamp for all heartbeat hosts
-        latest_pings = (
-            db.query(PingResultDB.host_id, func.max(PingResultDB.timestamp).label("max_ts"))
-            .filter(PingResultDB.host_id.in_(host_ids))
-            .group_by(PingResultDB.host_id)
-            .all()
+        # Latency and windowed rules are evaluated by the rule engine off this event
+        event_bus.publish(
+            PROBE_RESULT,
+            host_id=host_id,
+            latency=latency_val if latency_val >= 0 else None,
+            status=current_status,
+            suppressed=in_maintenance,
+            monitor_type=monitor_type or "icmp",
+            duration=duration,
+            lag=lag,
+            db_write=db_write,
+            **({"sent": stats["sent"], "received": stats["received"]} if stats else {}),
         )
 
-        latest_ping_map = {row.host_id: row.max_ts for row in latest_pings}
+        if previous != current_status:
+            logger.info(f"{name} status: {previous} → {current_status}")
+            alerts.record_transition(
+                host_id,
+                name,
+                group_name,
+                previous,
+                current_status,
+                address=ip_address,
+                suppressed=in_maintenance,
+                alert_up=alert_up,
+            )
 
-        for host in hosts:
-            cutoff = datetime.utcnow() - timedelta(seconds=host.heartbeat_interval * 2)
-            last_timestamp = latest_ping_map.get(host.id)
-
-            last = True if last_timestamp and last_timestamp >= cutoff else False
-            new_status = "UP" if last else "DOWN"
-            if host.last_status != new_status:
-                host.last_status = new_status
-                db.commit()
-                if new_status == "DOWN" and not _is_in_maintenance_window(host):
-                    notification_manager.send_notification(
-                        f"🔴 Host {host.name} is DOWN",
-                        f"Host: {host.name}\nHeartbeat missed (expected every {host.heartbeat_interval}s).",
-                    )
     except Exception as e:
-        logger.error(f"Error in check_heartbeat_timeouts: {e}")
-    finally:
-        db.close()
+        logger.error(f"Error checking {name}: {e}")
+
+
+def _job_args(host) -> list:
+    return [
+        host.id,
+        host.ip_address,
+        host.name,
+        host.port,
+        host.monitor_type,
+        host.expected_status_code,
+        host.probe_count or 1,
+        _http_config(host),
+    ]
 
 
 def _remove_stale_jobs(enabled_host_ids, ping_jobs):
@@ -347,6 +636,7 @@ def _remove_stale_jobs(enabled_host_ids, ping_jobs):
             host_id = int(job_id.replace("ping_", ""))
             if host_id not in enabled_host_ids:
                 scheduler.remove_job(job_id)
+                jobstats.stats.forget(job_id)
             else:
                 host = enabled_host_ids[host_id]
                 processed_host_ids.add(host_id)
@@ -355,6 +645,11 @@ def _remove_stale_jobs(enabled_host_ids, ping_jobs):
                     scheduler.reschedule_job(
                         job_id, trigger="interval", seconds=host.interval
                     )
+                    jobstats.stats.forget(job_id)
+                # Edited probe settings (address, type, port, packet count) reach the running job
+                args = _job_args(host)
+                if list(job.args) != args:
+                    scheduler.modify_job(job_id, args=args)
         except ValueError:
             continue
     return processed_host_ids
@@ -367,14 +662,7 @@ def _add_or_update_jobs(enabled_host_ids, processed_host_ids):
                 ping_host,
                 "interval",
                 seconds=host.interval,
-                args=[
-                    host.id,
-                    host.ip_address,
-                    host.name,
-                    host.port,
-                    host.monitor_type,
-                    host.expected_status_code,
-                ],
+                args=_job_args(host),
                 id=f"ping_{host.id}",
                 replace_existing=True,
             )
@@ -383,8 +671,18 @@ def _add_or_update_jobs(enabled_host_ids, processed_host_ids):
 def update_jobs():
     db: Session = SessionLocal()
     try:
-        hosts = db.query(HostDB).filter(HostDB.enabled == True).all()
-        enabled_host_ids = {h.id: h for h in hosts}
+        # Heartbeat monitors are push-based; their timeouts are tracked by heartbeats.ingest
+        hosts = (
+            db.query(HostDB)
+            .filter(
+                HostDB.enabled == True,
+                or_(HostDB.monitor_type.is_(None), HostDB.monitor_type != "heartbeat"),
+            )
+            .all()
+        )
+        # Hosts sharded to a live probe agent are probed there instead
+        ring = agents.registry.ring(db)
+        enabled_host_ids = {h.id: h for h in hosts if ring.owner(h.id) == agents.CENTRAL}
         current_jobs = scheduler.get_jobs()
         ping_jobs = {job.id: job for job in current_jobs if job.id.startswith("ping_")}
 
@@ -401,7 +699,7 @@ def update_jobs():
         scheduler.add_job(
             check_public_ip,
             "interval",
-            minutes=30,
+            seconds=publicip.PUBLIC_IP_INTERVAL,
             id="check_public_ip",
             replace_existing=True,
         )
@@ -416,38 +714,95 @@ def update_jobs():
             replace_existing=True,
         )
 
-    scheduler.add_job(
-        calculate_average_latency,
-        "interval",
-        hours=6,
-        id="calculate_average_latency",
-        replace_existing=True,
-    )
-    scheduler.add_job(calculate_average_latency)
-
-    scheduler.add_job(
-        cleanup_old_data,
-        "interval",
-        days=1,
-        id="cleanup_old_data",
-        replace_existing=True,
-    )
+    # update_jobs also runs on every resync; the catch-up runs belong to the first sync only
+    if not scheduler.get_job("calculate_average_latency"):
+        scheduler.add_job(
+            calculate_average_latency,
+            "interval",
+            hours=6,
+            id="calculate_average_latency",
+            replace_existing=True,
+        )
+        scheduler.add_job(calculate_average_latency)
 
-    scheduler.add_job(
-        check_ssl_job, "interval", days=1, id="check_ssl_job", replace_existing=True
-    )
-    scheduler.add_job(check_ssl_job)
+    if not scheduler.get_job("cleanup_old_data"):
+        scheduler.add_job(
+            cleanup_old_data,
+            "interval",
+            days=1,
+            id="cleanup_old_data",
+            replace_existing=True,
+        )
+
+    if not scheduler.get_job("check_ssl_job"):
+        scheduler.add_job(
+            check_ssl_job, "interval", days=1, id="check_ssl_job", replace_existing=True
+        )
+        scheduler.add_job(check_ssl_job)
+
+    if not scheduler.get_job("reconcile"):
+        scheduler.add_job(
+            reconcile,
+            "interval",
+            seconds=SCHEDULER_RESYNC_INTERVAL,
+            id="reconcile",
+            replace_existing=True,
+        )
+
+    if not scheduler.get_job("check_agents"):
+        scheduler.add_job(
+            check_agents,
+            "interval",
+            seconds=max(agents.AGENT_TIMEOUT // 3, 5),
+            id="check_agents",
+            replace_existing=True,
+        )
 
-    if not scheduler.get_job("check_heartbeat_timeouts"):
+    if not scheduler.get_job("check_rule_staleness"):
         scheduler.add_job(
-            check_heartbeat_timeouts,
+            rules.engine.check_stale,
             "interval",
-            minutes=2,
-            id="check_heartbeat_timeouts",
+            seconds=15,
+            id="check_rule_staleness",
             replace_existing=True,
         )
 
 
+def check_agents():
+    """Takes back (or hands out) hosts when probe agents time out or join."""
+    db = SessionLocal()
+    try:
+        changed = agents.registry.changed(db)
+    finally:
+        db.close()
+    if changed:
+        update_jobs()
+
+
+def request_resync():
+    """
+    Called after host or agent edits. Resyncs here if this process runs the scheduler,
+    otherwise asks the one that does (the worker, or the leader among API processes).
+    """
+    if scheduler.running:
+        update_jobs()
+    else:
+        event_bus.publish(RESYNC_REQUESTED)
+
+
+def _on_resync_requested(event: dict):
+    if scheduler.running:
+        update_jobs()
+
+
+def reconcile():
+    """Periodic catch-up with changes made by other processes, in case their events were lost."""
+    update_jobs()
+    maintenance.index.invalidate()
+    dependencies.graph.invalidate()
+    rules.engine.load_rules()
+
+
 def start_scheduler():
     update_jobs()
     if not scheduler.running:
@@ -476,14 +831,18 @@ def calculate_average_latency():
 
         latency_map = {result.host_id: result.avg_latency for result in latency_results}
 
+        updated = []
         for host in hosts:
             try:
                 avg_latency = latency_map.get(host.id)
                 if avg_latency is not None:
                     host.average_latency = avg_latency
+                    updated.append((host.id, avg_latency))
             except Exception as e:
                 logger.error(f"Error calculating latency for {host.name}: {e}")
         db.commit()
+        for host_id, avg_latency in updated:
+            event_bus.publish(HOST_UPDATED, host_id=host_id, average_latency=avg_latency)
     except Exception as e:
         logger.error(f"Error in calculate_average_latency: {e}")
     finally:
@@ -497,6 +856,8 @@ def cleanup_old_data():
         deleted_pings = (
             db.query(PingResultDB).filter(PingResultDB.timestamp < cutoff_date).delete()
         )
+        # Per-hop traceroute samples are raw data too and age out with the pings
+        db.query(TraceHopDB).filter(TraceHopDB.timestamp < cutoff_date).delete()
         deleted_speedtests = (
             db.query(SpeedTestResultDB)
             .filter(SpeedTestResultDB.timestamp < cutoff_date)
@@ -507,6 +868,16 @@ def cleanup_old_data():
             .filter(PublicIPHistoryDB.timestamp < cutoff_date)
             .delete()
         )
+        # Daily rollups are tiny, so they outlive raw pings to back the -1y uptime view
+        rollup_cutoff = (datetime.utcnow() - timedelta(days=730)).strftime("%Y-%m-%d")
+        db.query(DailyUptimeDB).filter(DailyUptimeDB.day < rollup_cutoff).delete()
+        db.query(RouteChangeDB).filter(
+            RouteChangeDB.timestamp < datetime.utcnow() - timedelta(days=730)
+        ).delete()
+        db.query(NotificationOutboxDB).filter(
+            NotificationOutboxDB.status.in_(("sent", "failed")),
+            NotificationOutboxDB.created_at < cutoff_date,
+        ).delete()
         db.commit()
         logger.info(
             f"Cleanup: {deleted_pings} pings, {deleted_speedtests} speedtests, {deleted_ips} IPs deleted."
@@ -516,3 +887,16 @@ def cleanup_old_data():
         db.rollback()
     finally:
         db.close()
+
+
+def stop_scheduler():
+    global scheduler
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+        jobstats.stats.reset_due()
+        logger.info("Scheduler stopped")
+        # Shutdown closes the executor's thread pool for good; a re-election starts a fresh one
+        scheduler = _new_scheduler()
+
+
+event_bus.add_listener(_on_resync_requested, {RESYNC_REQUESTED})
@@ -59,6 +59,7 @@ def client(db_session):
     import database
     from database import get_db
     from main import app
+    from notifications import notification_manager
 
     # Note: `database.SessionLocal` and `database.engine` are already set correctly
     # by the `db_session` fixture.
@@ -71,8 +72,12 @@ def client(db_session):
 
     app.dependency_overrides[get_db] = override_get_db
 
-    with TestClient(app) as c:
-        yield c
+    with pytest.MonkeyPatch.context() as mp:
+        # The outbox dispatcher thread would share the in-memory connection with request
+        # handlers, so the app sends inline; the outbox tests start their own managers
+        mp.setattr(notification_manager, "start", lambda *args, **kwargs: None)
+        with TestClient(app) as c:
+            yield c
 
     app.dependency_overrides.clear()
 
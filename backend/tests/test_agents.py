@@ -0,0 +1,177 @@
+import gzip
+from unittest.mock import MagicMock
+
+import orjson
+import pytest
+import requests
+
+import agents
+from agents import HashRing
+
+
+def test_ring_spreads_hosts_and_moves_few_on_join():
+    ring = HashRing(["a", "b", "c"])
+    owners = {host_id: ring.owner(host_id) for host_id in range(3000)}
+    counts = {m: list(owners.values()).count(m) for m in ring.members}
+    assert all(700 < n < 1300 for n in counts.values())
+
+    grown = HashRing(["a", "b", "c", "d"])
+    moved = [h for h in owners if grown.owner(h) != owners[h]]
+    # Only hosts taken over by the new member move
+    assert all(grown.owner(h) == "d" for h in moved)
+    assert 0.15 < len(moved) / len(owners) < 0.35
+
+    assert HashRing([]).owner(1) is None
+
+
+@pytest.fixture
+def agent_api(client, monkeypatch):
+    import database
+    import scheduler
+
+    monkeypatch.setattr(agents, "AGENT_TOKEN", "agent-secret")
+    monkeypatch.setattr(scheduler, "SessionLocal", database.SessionLocal)
+    headers = {"X-Agent-Token": "agent-secret"}
+    yield headers
+    for name in ("edge-1", "edge-2"):
+        client.delete(f"/agents/{name}", headers=headers)
+
+
+def test_agent_endpoints_are_gated(client, monkeypatch):
+    assert client.post("/agents/register", json={"name": "x"}).status_code == 404
+    monkeypatch.setattr(agents, "AGENT_TOKEN", "agent-secret")
+    response = client.post(
+        "/agents/register", json={"name": "x"}, headers={"X-Agent-Token": "wrong"}
+    )
+    assert response.status_code == 401
+
+
+def test_hosts_are_sharded_between_agents(client, auth_headers, agent_api):
+    import scheduler
+
+    for i in range(6):
+        client.post(
+            "/hosts/",
+            json={"name": f"Shard {i}", "ip_address": f"10.41.0.{i}"},
+            headers=auth_headers,
+        )
+
+    client.post("/agents/register", json={"name": "edge-1", "vantage": "eu"}, headers=agent_api)
+    client.post("/agents/register", json={"name": "edge-2"}, headers=agent_api)
+
+    shards = {}
+    for name in ("edge-1", "edge-2"):
+        response = client.get(f"/agents/{name}/assignments", headers=agent_api)
+        assert response.json()["members"] == ["edge-1", "edge-2"]
+        shards[name] = {h["id"] for h in response.json()["hosts"]}
+    assert shards["edge-1"] and shards["edge-2"]
+    assert not shards["edge-1"] & shards["edge-2"]
+    # The central scheduler hands every probed host over
+    ping_jobs = {j.id for j in scheduler.scheduler.get_jobs() if j.id.startswith("ping_")}
+    assert not ping_jobs & {f"ping_{h}" for h in shards["edge-1"] | shards["edge-2"]}
+
+    listed = {a["name"]: a for a in client.get("/agents", headers=auth_headers).json()}
+    assert listed["edge-1"]["vantage"] == "eu"
+    assert listed["edge-2"]["vantage"] == "edge-2"
+
+    # edge-2 leaves: edge-1 takes over its hosts and keeps its own
+    client.delete("/agents/edge-2", headers=agent_api)
+    response = client.get("/agents/edge-1/assignments", headers=agent_api)
+    assert {h["id"] for h in response.json()["hosts"]} == shards["edge-1"] | shards["edge-2"]
+    assert client.get("/agents/edge-2/assignments", headers=agent_api).status_code == 404
+
+
+def test_compressed_results_are_tagged_with_vantage(client, auth_headers, db_session, agent_api):
+    from models import HostDB, PingResultDB
+
+    host = client.post(
+        "/hosts/", json={"name": "Agent target", "ip_address": "10.41.1.1"}, headers=auth_headers
+    ).json()
+    client.post("/agents/register", json={"name": "edge-1", "vantage": "eu"}, headers=agent_api)
+
+    batch = {
+        "results": [
+            {"host_id": host["id"], "latency": None, "timestamp": "2026-01-01T00:00:00Z"},
+            {"host_id": host["id"], "latency": 12.5, "timestamp": "2026-01-01T00:01:00Z"},
+            {"host_id": 999999, "latency": 1.0},
+            {
+                "host_id": host["id"],
+                "latency": 3.0,
+                "timestamp": "2026-01-01T00:02:00Z",
+                "sent": 5,
+                "received": 7,
+                "jitter": 0.5,
+            },
+        ]
+    }
+    response = client.post(
+        "/agents/edge-1/results",
+        content=gzip.compress(orjson.dumps(batch)),
+        headers={**agent_api, "Content-Encoding": "gzip"},
+    )
+    assert response.json() == {"ok": True, "accepted": 3}
+
+    rows = db_session.query(PingResultDB).filter(PingResultDB.host_id == host["id"]).all()
+    assert sorted((r.latency or 0, r.vantage) for r in rows) == [(0, "eu"), (3.0, "eu"), (12.5, "eu")]
+    burst = next(r for r in rows if r.sent)
+    # received can't exceed sent
+    assert (burst.sent, burst.received, burst.jitter) == (5, 5, 0.5)
+    db_session.expire_all()
+    assert db_session.get(HostDB, host["id"]).last_status == "UP"
+
+    central = client.get(
+        f"/metrics/{host['id']}", params={"range": "-2y", "vantage": "central"}, headers=auth_headers
+    )
+    assert central.json()["data"] == []
+
+    bad = client.post(
+        "/agents/edge-1/results",
+        content=b"not gzip",
+        headers={**agent_api, "Content-Encoding": "gzip"},
+    )
+    assert bad.status_code == 400
+    unknown = client.post("/agents/nobody/results", json={"results": []}, headers=agent_api)
+    assert unknown.status_code == 404
+
+
+def test_agent_buffers_and_pushes_gzip_batches(monkeypatch):
+    import probe_agent
+
+    session = MagicMock()
+    session.headers = {}
+    agent = probe_agent.ProbeAgent("http://central:8000/", "t", "lab-1", "lab", session=session)
+    monkeypatch.setattr(probe_agent.probes, "probe", lambda *args, **kwargs: 4.2)
+    host = {
+        "id": 7,
+        "name": "h",
+        "ip_address": "192.0.2.7",
+        "port": None,
+        "monitor_type": "icmp",
+        "expected_status_code": 200,
+        "dns_server": None,
+        "dns_record_type": "A",
+        "dns_expected": None,
+    }
+    agent.probe(host)
+    agent.probe(host)
+
+    session.post.side_effect = requests.ConnectionError("central down")
+    agent.flush()
+    assert len(agent._buffer) == 2  # kept for retry
+
+    session.post.side_effect = None
+    agent.flush()
+    url = session.post.call_args.args[0]
+    kwargs = session.post.call_args.kwargs
+    assert url == "http://central:8000/agents/lab-1/results"
+    assert kwargs["headers"]["Content-Encoding"] == "gzip"
+    results = orjson.loads(gzip.decompress(kwargs["data"]))["results"]
+    assert [(r["host_id"], r["latency"]) for r in results] == [(7, 4.2), (7, 4.2)]
+    assert agent._buffer == [] and agent.pushed == 2
+
+    # probe_count > 1: one burst per probe, with its statistics in the result
+    monkeypatch.setattr(probe_agent.probes.icmp, "burst", lambda *args: [2.0, None, 4.0])
+    agent.probe({**host, "ip_address": "127.0.0.1", "probe_count": 3})
+    (result,) = agent._buffer
+    assert (result["latency"], result["sent"], result["received"]) == (3.0, 3, 2)
+    assert result["jitter"] == 2.0
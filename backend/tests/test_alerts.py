@@ -0,0 +1,106 @@
+import time
+
+from alerts import AlertAggregator
+
+
+def _add_down(aggregator, host_id, name, group):
+    aggregator.add(host_id, name, group, "DOWN", f"🔴 Host {name} is DOWN", f"Host: {name}")
+
+
+def test_mass_outage_becomes_one_digest_per_group():
+    sent = []
+    aggregator = AlertAggregator(window=60, scope="group", send=lambda t, b: sent.append((t, b)))
+    for i in range(37):
+        _add_down(aggregator, i, f"dc1-host{i}", "DC-1")
+    _add_down(aggregator, 100, "edge-1", "Edge")
+    aggregator.flush()
+
+    titles = {t for t, _ in sent}
+    assert len(sent) == 2
+    assert titles == {"🔴 Host edge-1 is DOWN", "🔴 37 hosts DOWN in group DC-1"}
+
+
+def test_global_scope_and_mixed_statuses():
+    sent = []
+    aggregator = AlertAggregator(window=60, scope="global", send=lambda t, b: sent.append((t, b)))
+    _add_down(aggregator, 1, "a", "G1")
+    _add_down(aggregator, 2, "b", "G2")
+    aggregator.add(3, "c", "G2", "UP", "🟢 Host c is UP", "Host: c")
+    aggregator.flush()
+
+    assert len(sent) == 1
+    title, body = sent[0]
+    assert title == "🔴 2 hosts DOWN, 🟢 1 host UP"
+    assert "DOWN: a, b" in body
+    assert "UP: c" in body
+
+
+def test_flap_inside_the_window_cancels_out():
+    sent = []
+    aggregator = AlertAggregator(window=60, send=lambda t, b: sent.append((t, b)))
+    _add_down(aggregator, 1, "flappy", "G")
+    aggregator.add(1, "flappy", "G", "UP", "🟢 Host flappy is UP", "Host: flappy")
+    _add_down(aggregator, 2, "other", "G")
+    aggregator.flush()
+
+    # DOWN then UP within one window: no alert for flappy at all
+    assert sent == [("🔴 Host other is DOWN", "Host: other")]
+
+    sent.clear()
+    _add_down(aggregator, 1, "flappy", "G")
+    aggregator.add(1, "flappy", "G", "UP", "🟢 Host flappy is UP", "Host: flappy")
+    _add_down(aggregator, 1, "flappy", "G")
+    aggregator.flush()
+    assert sent == [("🔴 Host flappy is DOWN", "Host: flappy")]
+
+
+def test_hosts_sharing_a_name_do_not_cancel_out():
+    sent = []
+    aggregator = AlertAggregator(window=60, scope="global", send=lambda t, b: sent.append((t, b)))
+    _add_down(aggregator, 1, "router", "G")
+    aggregator.add(2, "router", "G", "UP", "🟢 Host router is UP", "Host: router")
+    aggregator.flush()
+
+    assert sent == [("🔴 1 host DOWN, 🟢 1 host UP", "DOWN: router\nUP: router")]
+
+
+def test_window_timer_flushes_automatically():
+    sent = []
+    aggregator = AlertAggregator(window=0.05, send=lambda t, b: sent.append((t, b)))
+    _add_down(aggregator, 1, "x", "G")
+    _add_down(aggregator, 2, "y", "G")
+    deadline = time.time() + 2
+    while not sent and time.time() < deadline:
+        time.sleep(0.01)
+    assert sent == [("🔴 2 hosts DOWN in group G", "DOWN: x, y")]
+
+
+def test_zero_window_sends_immediately():
+    sent = []
+    aggregator = AlertAggregator(window=0, send=lambda t, b: sent.append((t, b)))
+    _add_down(aggregator, 1, "x", "G")
+    assert sent == [("🔴 Host x is DOWN", "Host: x")]
+
+
+def test_record_transition_publishes_and_filters_alerts(monkeypatch):
+    import alerts
+    from events import event_bus
+
+    published = []
+    monkeypatch.setattr(event_bus, "publish", lambda event_type, **kw: published.append(kw))
+    sent = []
+    monkeypatch.setattr(
+        alerts, "aggregator", AlertAggregator(window=0, send=lambda t, b: sent.append((t, b)))
+    )
+
+    alerts.record_transition(1, "gw", "Core", "UP", "DOWN", address="10.0.0.1")
+    alerts.record_transition(2, "sw", "Core", "UP", "UNREACHABLE")
+    alerts.record_transition(2, "sw", "Core", "UNREACHABLE", "UP")
+    alerts.record_transition(3, "db", "Core", "UP", "DOWN", suppressed=True)
+    alerts.record_transition(4, "job", "Core", "UNKNOWN", "UP", alert_up=False)
+
+    assert [e["status"] for e in published] == ["DOWN", "UNREACHABLE", "UP", "DOWN", "UP"]
+    assert len(sent) == 1
+    title, body = sent[0]
+    assert title == "🔴 Host gw is DOWN"
+    assert body.startswith("Host: gw (10.0.0.1)\nState: DOWN\nTime: ")
@@ -49,3 +49,31 @@ def test_audit_logs_default_details(client, db_session):
     assert log.action == action
     assert log.target == target
     assert log.details == ""
+
+
+def test_audit_log_keyset_pagination(client, db_session, auth_headers):
+    from main import _audit
+
+    for i in range(5):
+        _audit(db_session, user="pager", action="PAGE_TEST", target=f"t{i}")
+
+    seen = []
+    cursor = None
+    while True:
+        url = "/audit-log?action=PAGE_TEST&limit=2&fields=target"
+        if cursor:
+            url += f"&cursor={cursor}"
+        response = client.get(url, headers=auth_headers)
+        assert response.status_code == 200
+        seen.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert [e["target"] for e in seen] == ["t4", "t3", "t2", "t1", "t0"]
+    assert all(set(e) == {"target"} for e in seen)
+
+
+def test_audit_log_limit_is_bounded(client, auth_headers):
+    response = client.get("/audit-log?limit=100000", headers=auth_headers)
+    assert response.status_code == 422
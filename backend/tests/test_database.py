@@ -98,5 +98,10 @@ def test_migrate_db_adds_missing_columns(monkeypatch):
 
         assert "server_id" in column_names_speedtest
         assert "server_country" in column_names_speedtest
+
+        # Secondary indexes are created on existing tables
+        index_names = [row[1] for row in db.execute(text("PRAGMA index_list(hosts)"))]
+        assert "ix_hosts_last_status" in index_names
+        assert "ix_hosts_group_name" in index_names
     finally:
         db.close()
@@ -0,0 +1,140 @@
+from unittest.mock import patch
+
+from dependencies import UNREACHABLE, DependencyGraph
+from events import HOST_DELETED, HOST_UPDATED, STATUS_CHANGE
+
+
+def _graph(parents, statuses):
+    graph = DependencyGraph()
+    graph._parent = dict(parents)
+    graph._status = dict(statuses)
+    graph._loaded = True
+    return graph
+
+
+def test_blocking_ancestor_walks_the_chain():
+    # 1 (gateway) <- 2 (switch) <- 3 (server)
+    graph = _graph({1: None, 2: 1, 3: 2}, {1: "UP", 2: "UP", 3: "UP"})
+    assert not graph.is_blocked(3)
+
+    graph.on_event({"type": STATUS_CHANGE, "host_id": 1, "status": "DOWN"})
+    assert graph.blocking_ancestor(2) == 1
+    assert graph.blocking_ancestor(3) == 1
+
+    graph.on_event({"type": STATUS_CHANGE, "host_id": 2, "status": UNREACHABLE})
+    assert graph.blocking_ancestor(3) == 2
+
+    graph.on_event({"type": STATUS_CHANGE, "host_id": 1, "status": "UP"})
+    graph.on_event({"type": STATUS_CHANGE, "host_id": 2, "status": "UP"})
+    assert not graph.is_blocked(3)
+
+
+def test_graph_follows_host_updates_and_deletes():
+    graph = _graph({1: None, 2: None}, {1: "DOWN", 2: "UP"})
+    graph.on_event({"type": HOST_UPDATED, "host_id": 2, "parent_id": 1, "last_status": "UP"})
+    assert graph.is_blocked(2)
+
+    graph.on_event({"type": HOST_DELETED, "host_id": 1})
+    assert not graph.is_blocked(2)
+    assert graph._parent[2] is None
+
+
+def test_parent_validation_and_delete(client, auth_headers, db_session):
+    from models import HostDB
+
+    def create(name, ip, parent_id=None):
+        return client.post(
+            "/hosts/",
+            json={"name": name, "ip_address": ip, "parent_id": parent_id},
+            headers=auth_headers,
+        )
+
+    gateway = create("Dep Gateway", "10.20.0.1").json()
+    server = create("Dep Server", "10.20.0.2", gateway["id"]).json()
+    assert server["parent_id"] == gateway["id"]
+
+    assert create("Orphan", "10.20.0.3", 999999).status_code == 400
+
+    # gateway -> server -> gateway would be a loop
+    gateway["parent_id"] = server["id"]
+    response = client.put(f"/hosts/{gateway['id']}", json=gateway, headers=auth_headers)
+    assert response.status_code == 400
+    server["parent_id"] = server["id"]
+    response = client.put(f"/hosts/{server['id']}", json=server, headers=auth_headers)
+    assert response.status_code == 400
+
+    assert client.delete(f"/hosts/{gateway['id']}", headers=auth_headers).status_code == 200
+    db_session.expire_all()
+    assert db_session.get(HostDB, server["id"]).parent_id is None
+
+
+def test_children_of_down_host_are_paused_without_alerts(client, db_session, monkeypatch):
+    import database
+    import dependencies
+    import scheduler
+    from models import HostDB
+
+    monkeypatch.setattr(scheduler, "SessionLocal", database.SessionLocal)
+    gateway = HostDB(name="Paused Gateway", ip_address="10.21.0.1", last_status="DOWN")
+    db_session.add(gateway)
+    db_session.commit()
+    child = HostDB(
+        name="Paused Child", ip_address="10.21.0.2", last_status="UP", parent_id=gateway.id
+    )
+    db_session.add(child)
+    db_session.commit()
+    dependencies.graph.invalidate()
+
+    skipped = dependencies.graph.skipped_probes
+    with patch("scheduler.ping") as mock_ping, patch("alerts.aggregator.add") as mock_alert:
+        scheduler.ping_host(child.id, child.ip_address, child.name)
+        scheduler.ping_host(child.id, child.ip_address, child.name)
+        mock_ping.assert_not_called()
+        mock_alert.assert_not_called()
+
+    db_session.expire_all()
+    assert db_session.get(HostDB, child.id).last_status == UNREACHABLE
+    assert dependencies.graph.skipped_probes == skipped + 2
+
+    # Gateway recovers: the child is probed again and its return to UP is not alerted
+    gateway.last_status = "UP"
+    db_session.commit()
+    dependencies.graph.on_event({"type": STATUS_CHANGE, "host_id": gateway.id, "status": "UP"})
+    with patch("scheduler.ping", return_value=5.0), patch("alerts.aggregator.add") as mock_alert:
+        scheduler.ping_host(child.id, child.ip_address, child.name)
+        mock_alert.assert_not_called()
+
+    db_session.expire_all()
+    assert db_session.get(HostDB, child.id).last_status == "UP"
+
+
+def test_host_down_before_its_parent_failed_alerts_on_recovery(client, db_session, monkeypatch):
+    import database
+    import dependencies
+    import scheduler
+    from models import HostDB
+
+    monkeypatch.setattr(scheduler, "SessionLocal", database.SessionLocal)
+    gateway = HostDB(name="Flaky Gateway", ip_address="10.21.1.1", last_status="UP")
+    db_session.add(gateway)
+    db_session.commit()
+    child = HostDB(
+        name="Flaky Child", ip_address="10.21.1.2", last_status="UP", parent_id=gateway.id
+    )
+    db_session.add(child)
+    db_session.commit()
+    dependencies.graph.invalidate()
+
+    # The child fails first, then its gateway: DOWN -> UNREACHABLE
+    with patch("scheduler.ping", return_value=-1.0), patch("alerts.aggregator.add"):
+        scheduler.ping_host(child.id, child.ip_address, child.name)
+    dependencies.graph.on_event({"type": STATUS_CHANGE, "host_id": gateway.id, "status": "DOWN"})
+    scheduler.ping_host(child.id, child.ip_address, child.name)
+    db_session.expire_all()
+    assert db_session.get(HostDB, child.id).last_status == UNREACHABLE
+
+    # Back UP: the DOWN alert went out, so the recovery must too
+    dependencies.graph.on_event({"type": STATUS_CHANGE, "host_id": gateway.id, "status": "UP"})
+    with patch("scheduler.ping", return_value=5.0), patch("alerts.aggregator.add") as mock_alert:
+        scheduler.ping_host(child.id, child.ip_address, child.name)
+        assert mock_alert.call_args.args[3] == "UP"
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import socket
+
+import pytest
+
+import discovery
+
+
+@pytest.fixture
+def listener():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(16)
+    yield sock.getsockname()[1]
+    sock.close()
+
+
+def test_parse_network_limits():
+    assert discovery.parse_network("192.168.1.7/22").num_addresses == 1024
+    with pytest.raises(ValueError):
+        discovery.parse_network("10.0.0.0/8")
+    with pytest.raises(ValueError):
+        discovery.parse_network("2001:db8::/120")
+
+
+def test_sweep_reports_open_ports_and_frees_its_slot(listener):
+    async def run():
+        sweep = discovery.Sweep(
+            discovery.parse_network("127.0.0.1/32"),
+            ports=[listener],
+            icmp=False,
+            resolve_names=False,
+            known={"127.0.0.1": 5},
+        )
+        return [event async for event in sweep.events()]
+
+    events = asyncio.run(run())
+    assert [name for name, _ in events] == ["start", "host", "done"]
+    assert events[1][1] == {
+        "ip_address": "127.0.0.1",
+        "hostname": None,
+        "latency": None,
+        "open_ports": [listener],
+        "monitored_id": 5,
+    }
+    assert not discovery.busy()
+
+
+def _sse_events(text: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in text.replace("\r\n", "\n").split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_discovery_stream_and_promotion(client, auth_headers, listener):
+    request = {"network": "127.0.0.1/32", "ports": [listener], "icmp": False, "resolve_names": False}
+    response = client.post("/tools/discovery", json=request, headers=auth_headers)
+    assert response.status_code == 200
+    events = _sse_events(response.text)
+    assert events[0] == (
+        "start",
+        {"network": "127.0.0.1/32", "total": 1, "ports": [listener], "icmp": False},
+    )
+    found = [payload for name, payload in events if name == "host"]
+    assert [h["open_ports"] for h in found] == [[listener]]
+
+    report = client.post(
+        "/tools/discovery/promote", json={"hosts": found}, headers=auth_headers
+    ).json()
+    assert report["created"] == 1
+    host = client.get(f"/hosts/{report['results'][0]['id']}", headers=auth_headers).json()
+    # No ping reply, so it's monitored over TCP on the port that answered
+    assert (host["monitor_type"], host["port"], host["group_name"]) == ("tcp", listener, "Discovered")
+
+    again = client.post("/tools/discovery", json=request, headers=auth_headers)
+    rediscovered = [p for name, p in _sse_events(again.text) if name == "host"]
+    assert rediscovered[0]["monitored_id"] == host["id"]
+    report = client.post(
+        "/tools/discovery/promote", json={"hosts": rediscovered}, headers=auth_headers
+    ).json()
+    assert (report["created"], report["exists"]) == (0, 1)
+    client.delete(f"/hosts/{host['id']}", headers=auth_headers)
+
+
+def test_discovery_rejects_bad_ranges_and_overload(client, auth_headers, monkeypatch):
+    assert client.post("/tools/discovery", json={"network": "10.0.0.0/8"}).status_code == 401
+    response = client.post("/tools/discovery", json={"network": "10.0.0.0/8"}, headers=auth_headers)
+    assert response.status_code == 400
+    monkeypatch.setattr(discovery, "_active", discovery.DISCOVERY_MAX_SWEEPS)
+    response = client.post(
+        "/tools/discovery", json={"network": "10.0.0.0/30"}, headers=auth_headers
+    )
+    assert response.status_code == 429
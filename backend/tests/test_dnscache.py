@@ -0,0 +1,176 @@
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import dns_client
+import dnscache
+from dnscache import DNSCache
+
+
+def _fake_query(answers, delay=0.0):
+    """Fake `dns_client.query`: name -> list of (type, ttl, value); records every call."""
+    calls = []
+
+    def query(name, rtype, server, timeout=2.0, port=53):
+        calls.append((name, rtype, server))
+        time.sleep(delay)
+        return [
+            {"name": name, "type": t, "ttl": ttl, "value": value}
+            for t, ttl, value in answers.get(name, [])
+            if t in (rtype, dns_client.CNAME)
+        ]
+
+    return query, calls
+
+
+def test_answers_are_cached_for_their_ttl(monkeypatch):
+    query, calls = _fake_query(
+        {"svc.example": [(dns_client.CNAME, 30, "edge.example"), (dns_client.A, 300, "192.0.2.1")]}
+    )
+    monkeypatch.setattr(dnscache.dns_client, "query", query)
+    cache = DNSCache(servers=["192.0.2.53"])
+
+    assert cache.resolve("svc.example") == "192.0.2.1"
+    assert cache.resolve("SVC.example.") == "192.0.2.1"
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    # The shortest TTL in the chain (the CNAME) bounds the entry
+    assert cache._entries["svc.example"].ttl == 30
+
+    cache._entries["svc.example"].expires = time.monotonic() - 1
+    cache.resolve("svc.example")
+    assert len(calls) == 2
+
+
+def test_concurrent_misses_share_one_lookup(monkeypatch):
+    query, calls = _fake_query({"busy.example": [(dns_client.A, 60, "192.0.2.2")]}, delay=0.2)
+    monkeypatch.setattr(dnscache.dns_client, "query", query)
+    cache = DNSCache(servers=["192.0.2.53"])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: cache.resolve("busy.example"), range(8)))
+    assert results == ["192.0.2.2"] * 8
+    assert len(calls) == 1
+
+
+def test_entries_near_expiry_refresh_in_background(monkeypatch):
+    query, calls = _fake_query({"warm.example": [(dns_client.A, 100, "192.0.2.3")]})
+    monkeypatch.setattr(dnscache.dns_client, "query", query)
+    cache = DNSCache(servers=["192.0.2.53"])
+    cache.resolve("warm.example")
+
+    cache._entries["warm.example"].expires = time.monotonic() + 5  # under 10% of the TTL left
+    assert cache.resolve("warm.example") == "192.0.2.3"  # served from cache, not blocked
+    deadline = time.monotonic() + 2
+    while len(calls) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(calls) == 2
+    assert cache.refreshes == 1
+
+
+def test_system_resolver_fallback_and_negative_caching(monkeypatch):
+    cache = DNSCache(servers=[])
+    assert cache.resolve("localhost") in ("127.0.0.1", "::1")
+    assert cache.resolve("192.0.2.9") == "192.0.2.9"
+
+    lookups = []
+
+    def missing(host, *args, **kwargs):
+        lookups.append(host)
+        raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+
+    monkeypatch.setattr(dnscache.socket, "getaddrinfo", missing)
+    for _ in range(2):
+        with pytest.raises(socket.gaierror):
+            cache.resolve("nowhere.invalid")
+    assert lookups == ["nowhere.invalid"]
+
+
+def test_malformed_reply_moves_on_to_the_next_server(monkeypatch):
+    good, calls = _fake_query({"svc.example": [(dns_client.A, 60, "192.0.2.4")]})
+
+    def query(name, rtype, server, timeout=2.0, port=53):
+        if server == "192.0.2.53":
+            return dns_client.parse_response(struct.pack("!HHHHHH", 1, 0x8180, 0, 1, 0, 0), 1)
+        return good(name, rtype, server, timeout, port)
+
+    monkeypatch.setattr(dns_client, "query", query)
+    cache = DNSCache(servers=["192.0.2.53", "192.0.2.54"])
+    assert cache.resolve("svc.example") == "192.0.2.4"
+    assert calls == [("svc.example", dns_client.A, "192.0.2.54")]
+
+
+class _EchoHostHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.seen_hosts.append(self.headers["Host"])
+        self.send_response(204)
+        self.end_headers()
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _EchoHostHandler)
+    server.seen_hosts = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_check_connects_to_cached_address(http_server, monkeypatch):
+    import scheduler
+
+    port = http_server.server_address[1]
+    monkeypatch.setattr(dnscache.cache, "_entries", {"app.internal.test": dnscache._Entry(["127.0.0.1"], None, 60)})
+
+    is_up, latency, status = scheduler.check_http(f"http://app.internal.test:{port}/health", 204)
+    assert (is_up, status) == (True, 204)
+    assert latency >= 0
+    assert http_server.seen_hosts == [f"app.internal.test:{port}"]
+
+
+def test_dns_monitor(client, auth_headers, db_session, monkeypatch):
+    import database
+    import scheduler
+    from models import HostDB
+
+    monkeypatch.setattr(scheduler, "SessionLocal", database.SessionLocal)
+    host = {
+        "name": "Resolver check",
+        "ip_address": "www.dns-monitor.example",
+        "monitor_type": "dns",
+        "dns_server": "192.0.2.53",
+        "dns_record_type": "a",
+        "dns_expected": "192.0.2.80",
+    }
+    bad = client.post("/hosts/", json=dict(host, dns_record_type="SRV"), headers=auth_headers)
+    assert bad.status_code == 400
+    bad = client.post("/hosts/", json=dict(host, dns_server="ns.example"), headers=auth_headers)
+    assert bad.status_code == 400
+    created = client.post("/hosts/", json=host, headers=auth_headers).json()
+    assert created["dns_record_type"] == "A"
+
+    answers = {"www.dns-monitor.example": [(dns_client.A, 60, "192.0.2.80")]}
+    query, calls = _fake_query(answers)
+    monkeypatch.setattr(scheduler.dns_client, "query", query)
+
+    def check():
+        scheduler.ping_host(created["id"], created["ip_address"], created["name"], monitor_type="dns")
+        db_session.expire_all()
+        return db_session.query(HostDB).filter(HostDB.id == created["id"]).first().last_status
+
+    assert check() == "UP"
+    assert calls[-1] == ("www.dns-monitor.example", dns_client.A, "192.0.2.53")
+
+    # A resolver returning the wrong address is as bad as one that doesn't answer
+    answers["www.dns-monitor.example"] = [(dns_client.A, 60, "203.0.113.66")]
+    assert check() == "DOWN"
@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from events import PROBE_RESULT, STATUS_CHANGE, EventBus, UDPTransport
+
+
+def test_listener_receives_published_event():
+    bus = EventBus()
+    received = []
+    bus.add_listener(received.append)
+
+    bus.publish(STATUS_CHANGE, host_id=1, previous="UP", status="DOWN")
+
+    assert len(received) == 1
+    assert received[0]["type"] == STATUS_CHANGE
+    assert received[0]["host_id"] == 1
+    assert received[0]["status"] == "DOWN"
+
+
+def test_listener_event_type_filter():
+    bus = EventBus()
+    received = []
+    bus.add_listener(received.append, event_types={STATUS_CHANGE})
+
+    bus.publish(PROBE_RESULT, host_id=1, latency=5.0, status="UP")
+    bus.publish(STATUS_CHANGE, host_id=1, previous="DOWN", status="UP")
+
+    assert [e["type"] for e in received] == [STATUS_CHANGE]
+
+
+def test_listener_errors_do_not_break_publish():
+    bus = EventBus()
+    received = []
+
+    def broken(event):
+        raise ValueError("boom")
+
+    bus.add_listener(broken)
+    bus.add_listener(received.append)
+    bus.publish(PROBE_RESULT, host_id=1)
+
+    assert len(received) == 1
+
+
+@pytest.mark.asyncio
+async def test_subscription_receives_events_from_other_threads():
+    bus = EventBus()
+    with bus.subscribe(event_types={STATUS_CHANGE}) as sub:
+        start = time.perf_counter()
+        threading.Thread(
+            target=bus.publish, args=(STATUS_CHANGE,), kwargs={"host_id": 7, "status": "DOWN"}
+        ).start()
+        event = await sub.get(timeout=1)
+        elapsed = time.perf_counter() - start
+
+    assert event is not None
+    assert event["host_id"] == 7
+    assert elapsed < 0.1
+
+
+@pytest.mark.asyncio
+async def test_subscription_timeout_and_unsubscribe():
+    bus = EventBus()
+    sub = bus.subscribe()
+    assert await sub.get(timeout=0.01) is None
+
+    sub.close()
+    bus.publish(PROBE_RESULT, host_id=1)
+    await asyncio.sleep(0.01)
+    assert sub.queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_drops_instead_of_blocking():
+    bus = EventBus()
+    with bus.subscribe(maxsize=1) as sub:
+        bus.publish(PROBE_RESULT, host_id=1)
+        bus.publish(PROBE_RESULT, host_id=2)
+        await asyncio.sleep(0.01)
+        assert sub.queue.qsize() == 1
+        assert sub.dropped == 1
+
+
+def test_udp_transport_forwards_between_buses():
+    receiver_transport = UDPTransport(("127.0.0.1", 0), [])
+    receiver = EventBus(receiver_transport)
+    received = threading.Event()
+    events = []
+
+    def on_event(event):
+        events.append(event)
+        received.set()
+
+    receiver.add_listener(on_event)
+    sender = EventBus(UDPTransport(None, [receiver_transport.address]))
+    try:
+        sender.publish(STATUS_CHANGE, host_id=3, status="UP")
+        assert received.wait(timeout=2)
+        assert events[0]["host_id"] == 3
+        assert events[0]["origin"] == sender.origin
+    finally:
+        sender.transport.stop()
+        receiver.transport.stop()
+
+
+def test_ping_host_publishes_probe_result_and_transition(client, db_session, monkeypatch):
+    import database
+    import scheduler
+    from events import event_bus
+    from models import HostDB
+
+    monkeypatch.setattr(scheduler, "SessionLocal", database.SessionLocal)
+    host = HostDB(name="Bus Host", ip_address="10.9.0.1", last_status="UP")
+    db_session.add(host)
+    db_session.commit()
+
+    received = []
+    event_bus.add_listener(received.append)
+    try:
+        with patch("scheduler.ping", return_value=None):
+            scheduler.ping_host(host.id, host.ip_address, host.name)
+    finally:
+        event_bus.remove_listener(received.append)
+
+    types = [e["type"] for e in received if e.get("host_id") == host.id]
+    assert types == [PROBE_RESULT, STATUS_CHANGE]
+    assert received[-1]["previous"] == "UP"
+    assert received[-1]["status"] == "DOWN"
+
+
+def test_sse_messages_are_partial_host_records():
+    import json
+
+    from events import HOST_UPDATED
+    from routers.status import _sse_message
+
+    message = _sse_message({"type": STATUS_CHANGE, "host_id": 4, "previous": "UP", "status": "DOWN"})
+    assert message["event"] == "hosts_update"
+    assert json.loads(message["data"]) == [{"id": 4, "last_status": "DOWN"}]
+
+    # The periodic latency average reaches the dashboard without waiting for a poll
+    message = _sse_message({"type": HOST_UPDATED, "host_id": 4, "average_latency": 3.5, "parent_id": 1})
+    assert json.loads(message["data"]) == [{"id": 4, "average_latency": 3.5}]
@@ -0,0 +1,193 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import group_status
+from events import HOST_DELETED, HOST_UPDATED, STATUS_CHANGE
+from group_status import GroupStatusTracker
+from maintenance import MaintenanceIndex
+
+# 2024-03-04 00:30 UTC, a Monday
+NOW = datetime(2024, 3, 4, 0, 30, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.fixture
+def schedules(monkeypatch):
+    """Replaces the recurring-window index with one compiled from the given schedules."""
+
+    def install(*rows):
+        index = MaintenanceIndex()
+        index.compile(
+            [
+                SimpleNamespace(
+                    name="window", timezone="UTC", **{"host_id": None, "group_name": None, **row}
+                )
+                for row in rows
+            ],
+            NOW,
+        )
+        monkeypatch.setattr(group_status.maintenance, "index", index)
+
+    install()
+    return install
+
+
+def _host_event(host_id, group, status="UNKNOWN", latency=None, **overrides):
+    event = {
+        "type": HOST_UPDATED,
+        "host_id": host_id,
+        "group_name": group,
+        "enabled": True,
+        "maintenance": False,
+        "last_status": status,
+        "average_latency": latency,
+        "maintenance_window": None,
+    }
+    event.update(overrides)
+    return event
+
+
+def _loaded_tracker():
+    tracker = GroupStatusTracker()
+    tracker._loaded = True
+    return tracker
+
+
+def test_counters_follow_status_changes(schedules):
+    tracker = _loaded_tracker()
+    tracker.on_event(_host_event(1, "DC-1", "UP", 10.0))
+    tracker.on_event(_host_event(2, "DC-1", "UP", 30.0))
+    tracker.on_event(_host_event(3, "DC-2"))
+
+    groups = {g["group"]: g for g in tracker.snapshot(db=None)}
+    assert groups["DC-1"]["up"] == 2
+    assert groups["DC-1"]["avg_latency"] == 20.0
+    assert groups["DC-2"]["unknown"] == 1
+
+    tracker.on_event({"type": STATUS_CHANGE, "host_id": 2, "status": "DOWN"})
+    groups = {g["group"]: g for g in tracker.snapshot(db=None)}
+    assert groups["DC-1"]["up"] == 1
+    assert groups["DC-1"]["down"] == 1
+    assert groups["DC-1"]["avg_latency"] == 10.0
+
+
+def test_maintenance_disabled_and_deleted_hosts(schedules):
+    tracker = _loaded_tracker()
+    tracker.on_event(_host_event(1, "Lab", "DOWN", maintenance=True))
+    tracker.on_event(_host_event(2, "Lab", "UP", enabled=False))
+    tracker.on_event(_host_event(3, "Edge", "UP"))
+
+    groups = {g["group"]: g for g in tracker.snapshot(db=None)}
+    assert groups["Lab"]["total"] == 1
+    assert groups["Lab"]["maintenance"] == 1
+
+    tracker.on_event({"type": HOST_DELETED, "host_id": 3})
+    assert "Edge" not in {g["group"] for g in tracker.snapshot(db=None)}
+
+    # Moving a host between groups
+    tracker.on_event(_host_event(1, "Prod", "DOWN"))
+    groups = {g["group"]: g for g in tracker.snapshot(db=None)}
+    assert "Lab" not in groups
+    assert groups["Prod"]["down"] == 1
+
+
+def test_maintenance_windows_count_while_open(schedules):
+    schedules(
+        {"cron": "0 0 * * *", "duration_minutes": 60, "host_id": 2},
+        {"cron": "0 0 * * *", "duration_minutes": 60, "group_name": "Lab"},
+    )
+    tracker = _loaded_tracker()
+    tracker.on_event(_host_event(1, "DC-1", "UP", 10.0, maintenance_window=[NOW - 60, NOW + 60]))
+    tracker.on_event(_host_event(2, "DC-1", "DOWN"))
+    tracker.on_event(_host_event(3, "DC-1", "UP", 30.0))
+    tracker.on_event(_host_event(4, "Lab", "DOWN"))
+
+    groups = {g["group"]: g for g in tracker.snapshot(db=None, now=NOW)}
+    assert groups["DC-1"]["maintenance"] == 2
+    assert groups["DC-1"]["up"] == 1
+    assert groups["DC-1"]["down"] == 0
+    assert groups["DC-1"]["avg_latency"] == 30.0
+    assert groups["Lab"]["maintenance"] == 1
+    assert groups["Lab"]["down"] == 0
+
+    # Once the windows close the hosts count under their status again
+    later = NOW + 2 * 3600
+    groups = {g["group"]: g for g in tracker.snapshot(db=None, now=later)}
+    assert groups["DC-1"]["maintenance"] == 0
+    assert groups["DC-1"]["up"] == 2
+    assert groups["Lab"]["down"] == 1
+
+
+def test_events_during_load_are_replayed(schedules, monkeypatch):
+    tracker = GroupStatusTracker()
+    stale = SimpleNamespace(
+        id=1,
+        group_name="DC-1",
+        enabled=True,
+        maintenance=False,
+        last_status="UP",
+        average_latency=None,
+        maintenance_start=None,
+        maintenance_end=None,
+    )
+
+    class Query:
+        def all(self):
+            # A probe result lands after the query read the row, before the load finishes
+            tracker.on_event({"type": STATUS_CHANGE, "host_id": 1, "status": "DOWN"})
+            tracker.on_event(_host_event(2, "DC-1", "UP"))
+            return [stale]
+
+    db = SimpleNamespace(query=lambda *columns: Query())
+    groups = {g["group"]: g for g in tracker.snapshot(db)}
+    assert groups["DC-1"]["total"] == 2
+    assert groups["DC-1"]["down"] == 1
+    assert groups["DC-1"]["up"] == 1
+
+
+def test_group_status_endpoint(client, auth_headers):
+    from events import event_bus
+
+    # First read loads the counters; later changes arrive only as events
+    client.get("/status/groups", headers=auth_headers)
+    resp = client.post(
+        "/hosts/",
+        json={"name": "Group Host", "ip_address": "10.60.0.1", "group_name": "Tiles"},
+        headers=auth_headers,
+    )
+    host_id = resp.json()["id"]
+    event_bus.publish(STATUS_CHANGE, host_id=host_id, status="UP")
+
+    response = client.get("/status/groups", headers=auth_headers)
+    assert response.status_code == 200
+    tiles = next(g for g in response.json() if g["group"] == "Tiles")
+    assert tiles["total"] == 1
+    assert tiles["up"] == 1
+
+    client.delete(f"/hosts/{host_id}", headers=auth_headers)
+    groups = client.get("/status/groups", headers=auth_headers).json()
+    assert "Tiles" not in {g["group"] for g in groups}
+
+
+def test_group_status_requires_auth(client):
+    assert client.get("/status/groups").status_code == 401
+
+
+def test_refresh_picks_up_edits_made_by_other_processes(client, auth_headers, db_session):
+    import worker
+    from models import HostDB
+
+    client.get("/status/groups", headers=auth_headers)
+    # Written by another API process: no event reaches this one
+    host = HostDB(name="Elsewhere", ip_address="10.60.0.2", group_name="Remote", last_status="UP")
+    db_session.add(host)
+    db_session.commit()
+
+    worker.refresh_caches()
+    groups = {g["group"]: g for g in client.get("/status/groups", headers=auth_headers).json()}
+    assert groups["Remote"]["up"] == 1
+
+    db_session.delete(host)
+    db_session.commit()
+    worker.refresh_caches()
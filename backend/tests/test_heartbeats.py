@@ -0,0 +1,232 @@
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+import heartbeats
+from heartbeats import HeartbeatIngest
+from models import HostDB, PingResultDB
+
+
+@pytest.fixture
+def inline_ingest(client):
+    """The app's flusher thread is paused so pushes are written inline on the test thread."""
+    heartbeats.ingest.stop()
+    heartbeats.ingest.invalidate()
+    # Deadlines armed by other tests would expire in the middle of this one
+    heartbeats.ingest._deadlines.clear()
+    heartbeats.ingest._heap.clear()
+    yield heartbeats.ingest
+    heartbeats.ingest.start()
+
+
+def _heartbeat_host(db, slug, status="UNKNOWN"):
+    host = HostDB(
+        name=f"HB {slug}",
+        ip_address=f"hb:{slug}",
+        monitor_type="heartbeat",
+        heartbeat_slug=slug,
+        heartbeat_interval=60,
+        last_status=status,
+    )
+    db.add(host)
+    db.commit()
+    return host
+
+
+def _pings(db, host_id):
+    return db.query(PingResultDB).filter(PingResultDB.host_id == host_id).all()
+
+
+def test_single_push_and_failure_status(client, db_session, inline_ingest):
+    host = _heartbeat_host(db_session, "hb-single", status="DOWN")
+
+    response = client.post("/heartbeat/hb-single", params={"duration_ms": 42})
+    assert response.json() == {"ok": True, "host": "HB hb-single"}
+    db_session.expire_all()
+    assert db_session.get(HostDB, host.id).last_status == "UP"
+    assert [p.latency for p in _pings(db_session, host.id)] == [42]
+
+    client.post("/heartbeat/hb-single", params={"status": "down"})
+    db_session.expire_all()
+    assert db_session.get(HostDB, host.id).last_status == "DOWN"
+    assert _pings(db_session, host.id)[-1].latency is None
+
+    assert client.post("/heartbeat/no-such-slug").status_code == 404
+
+
+def test_slug_created_by_another_process_resolves(client, db_session, inline_ingest):
+    assert inline_ingest.resolve("hb-other-process") is None
+    # Added through another process, so this one's slug map never heard of it
+    host = _heartbeat_host(db_session, "hb-other-process")
+    assert client.post("/heartbeat/hb-other-process").status_code == 200
+    assert inline_ingest._slugs["hb-other-process"]["id"] == host.id
+
+
+def test_bulk_push_reports_unknown_slugs(client, db_session, inline_ingest):
+    a = _heartbeat_host(db_session, "hb-bulk-a")
+    b = _heartbeat_host(db_session, "hb-bulk-b")
+
+    response = client.post(
+        "/heartbeat/bulk",
+        json={
+            "heartbeats": [
+                {"slug": "hb-bulk-a"},
+                {"slug": "hb-bulk-b", "status": "down"},
+                {"slug": "hb-bulk-missing"},
+            ]
+        },
+    )
+    assert response.json() == {"ok": True, "accepted": 2, "unknown": ["hb-bulk-missing"]}
+    db_session.expire_all()
+    assert db_session.get(HostDB, a.id).last_status == "UP"
+    assert db_session.get(HostDB, b.id).last_status == "DOWN"
+
+
+def test_background_flusher_batches_writes(client, db_session, inline_ingest):
+    hosts = [_heartbeat_host(db_session, f"hb-batch-{i}") for i in range(5)]
+    ingest = HeartbeatIngest()
+    ingest.load()
+    ingest.start()
+    try:
+        for _ in range(200):
+            for host in hosts:
+                ingest.push(host.heartbeat_slug)
+    finally:
+        ingest.stop()
+
+    assert ingest.written == ingest.received == 1000
+    assert ingest.flushes < 1000
+    db_session.expire_all()
+    for host in hosts:
+        assert len(_pings(db_session, host.id)) == 200
+        assert db_session.get(HostDB, host.id).last_status == "UP"
+
+
+def test_failed_flush_keeps_the_batch_for_retry(client, db_session, inline_ingest, monkeypatch):
+    host = _heartbeat_host(db_session, "hb-retry")
+    ingest = HeartbeatIngest()
+    ingest.load()
+    # Buffer pushes as if the flusher were running, and flush by hand
+    ingest._flusher = SimpleNamespace(is_alive=lambda: True)
+    ingest.push("hb-retry", duration_ms=1)
+    ingest.push("hb-retry", duration_ms=2)
+
+    real_insert = heartbeats.insert
+    monkeypatch.setattr(heartbeats, "insert", lambda table: 1 / 0)
+    ingest.flush()
+    assert ingest.written == 0
+    assert len(ingest._pending) == 2
+
+    monkeypatch.setattr(heartbeats, "insert", real_insert)
+    ingest.push("hb-retry", duration_ms=3)
+    ingest.flush()
+    assert [p.latency for p in _pings(db_session, host.id)] == [1, 2, 3]
+
+    # Past the cap the oldest heartbeats are dropped
+    monkeypatch.setattr(heartbeats, "HEARTBEAT_MAX_PENDING", 2)
+    ingest._requeue([(host.id, None, 1, True)] * 3)
+    assert len(ingest._pending) == 2
+    assert ingest.dropped == 1
+    ingest._pending.clear()
+
+
+def test_every_sample_in_a_batch_counts(client, db_session, inline_ingest):
+    from models import DailyUptimeDB
+
+    host = _heartbeat_host(db_session, "hb-flap", status="UP")
+    ingest = HeartbeatIngest()
+    ingest.load()
+    # Buffer pushes as if the flusher were running, and flush by hand
+    ingest._flusher = SimpleNamespace(is_alive=lambda: True)
+    ingest.push("hb-flap", status="down")
+    ingest.push("hb-flap")
+    with patch("alerts.record_transition") as transition:
+        ingest.flush()
+
+    assert [c.args[3:5] for c in transition.call_args_list] == [("UP", "DOWN"), ("DOWN", "UP")]
+    day = db_session.query(DailyUptimeDB).filter_by(host_id=host.id).one()
+    assert (day.total, day.up) == (2, 1)
+
+
+def test_rearmed_deadline_supersedes_the_old_one():
+    ingest = HeartbeatIngest()
+    ingest._expire = lambda host_ids: None
+    ingest.arm(1, 100.0)
+    ingest.arm(2, 150.0)
+    ingest.arm(1, 200.0)  # host 1 pushed again
+
+    assert ingest.next_deadline() == 150.0
+    assert ingest.expire_due(now=160.0) == [2]
+    assert ingest.expire_due(now=190.0) == []
+    assert ingest.expire_due(now=200.0) == [1]
+    assert ingest.next_deadline() is None
+
+
+def test_missed_deadline_marks_host_down(client, db_session, inline_ingest):
+    host = _heartbeat_host(db_session, "hb-deadline", status="UP")
+    client.post("/heartbeat/hb-deadline")
+    window = heartbeats.timeout_window("heartbeat", 60)
+    deadline = inline_ingest._deadlines[host.id]
+    assert deadline == pytest.approx(time.time() + window, abs=5)
+
+    with patch("alerts.aggregator.add") as mock_alert:
+        assert inline_ingest.expire_due(now=deadline + 1) == [host.id]
+        mock_alert.assert_called_once()
+    db_session.expire_all()
+    assert db_session.get(HostDB, host.id).last_status == "DOWN"
+    assert [p.latency for p in _pings(db_session, host.id)] == [0.1, None]
+
+    # Still silent: every further heartbeat_interval is one more missed sample, no new alert
+    next_slot = inline_ingest._deadlines[host.id]
+    assert next_slot == deadline + 60
+    with patch("alerts.aggregator.add") as mock_alert:
+        assert inline_ingest.expire_due(now=next_slot) == [host.id]
+        mock_alert.assert_not_called()
+    assert [p.latency for p in _pings(db_session, host.id)] == [0.1, None, None]
+    assert host.id in inline_ingest._deadlines
+
+    client.post("/heartbeat/hb-deadline")
+    db_session.expire_all()
+    assert db_session.get(HostDB, host.id).last_status == "UP"
+    assert host.id in inline_ingest._deadlines
+
+
+def test_host_edits_arm_and_disarm_deadlines(client, auth_headers, inline_ingest):
+    response = client.post(
+        "/hosts/",
+        json={
+            "name": "HB via API",
+            "ip_address": "hb:api",
+            "monitor_type": "heartbeat",
+            "heartbeat_slug": "hb-api",
+            "heartbeat_interval": 30,
+        },
+        headers=auth_headers,
+    )
+    host = response.json()
+    assert host["id"] in inline_ingest._deadlines
+    assert client.post("/heartbeat/hb-api").status_code == 200
+
+    host.update(monitor_type="icmp", heartbeat_slug=None)
+    client.put(f"/hosts/{host['id']}", json=host, headers=auth_headers)
+    assert host["id"] not in inline_ingest._deadlines
+    assert client.post("/heartbeat/hb-api").status_code == 404
+
+
+def test_push_seen_by_another_process_rearms_instead_of_expiring(client, db_session, inline_ingest):
+    host = _heartbeat_host(db_session, "hb-elsewhere", status="UP")
+    window = heartbeats.timeout_window("heartbeat", 60)
+    now = time.time()
+    # This process last saw a push long ago; another API process recorded a fresh one
+    inline_ingest.arm(host.id, now - 1)
+    db_session.add(PingResultDB(host_id=host.id, latency=0.1))
+    db_session.commit()
+
+    with patch("alerts.aggregator.add") as mock_alert:
+        assert inline_ingest.expire_due(now=now) == [host.id]
+        mock_alert.assert_not_called()
+    db_session.expire_all()
+    assert db_session.get(HostDB, host.id).last_status == "UP"
+    assert inline_ingest._deadlines[host.id] == pytest.approx(now + window, abs=5)
@@ -221,3 +221,207 @@ def test_get_uptime_history_authenticated(client, auth_headers):
     response = client.get(f"/uptime/{host_id}", headers=auth_headers)
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+
+
+def test_get_metrics_columnar_format(client, auth_headers, db_session):
+    from datetime import datetime, timedelta
+
+    import models
+
+    create_resp = client.post(
+        "/hosts/",
+        json={
+            "name": "Host Metrics Columnar",
+            "ip_address": "10.0.0.8",
+            "interval": 30,
+        },
+        headers=auth_headers,
+    )
+    host_id = create_resp.json()["id"]
+
+    ts = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=10)
+    db_session.add_all(
+        [
+            models.PingResultDB(host_id=host_id, latency=10.004321, timestamp=ts),
+            models.PingResultDB(
+                host_id=host_id, latency=None, timestamp=ts + timedelta(minutes=1)
+            ),
+        ]
+    )
+    db_session.commit()
+
+    response = client.get(
+        f"/metrics/{host_id}?format=columnar", headers=auth_headers
+    )
+    assert response.status_code == 200
+    data = response.json()
+
+    expected_ms = int((ts - datetime(1970, 1, 1)).total_seconds() * 1000)
+    assert data["t"] == [expected_ms, expected_ms + 60_000]
+    assert data["v"] == [10.0, None]
+    assert "l" not in data and "j" not in data
+    assert data["uptime"] == 50.0
+    assert data["avg_latency"] == 10.004321
+
+
+def test_read_hosts_keyset_pagination_and_filters(client, auth_headers, db_session):
+    import models
+
+    db_session.add_all(
+        [
+            models.HostDB(
+                name=f"Keyset {i:02d}",
+                ip_address=f"10.50.0.{i}",
+                group_name="Keyset-Group",
+                monitor_type="tcp" if i % 2 else "icmp",
+                last_status="UP" if i < 3 else "DOWN",
+            )
+            for i in range(5)
+        ]
+    )
+    db_session.commit()
+
+    first = client.get(
+        "/hosts/?group=Keyset-Group&limit=2", headers=auth_headers
+    )
+    assert first.status_code == 200
+    cursor = first.headers["X-Next-Cursor"]
+    second = client.get(
+        f"/hosts/?group=Keyset-Group&limit=2&cursor={cursor}", headers=auth_headers
+    )
+    third = client.get(
+        f"/hosts/?group=Keyset-Group&limit=2&cursor={second.headers['X-Next-Cursor']}",
+        headers=auth_headers,
+    )
+    names = [h["name"] for r in (first, second, third) for h in r.json()]
+    assert names == [f"Keyset {i:02d}" for i in range(5)]
+    assert "X-Next-Cursor" not in third.headers
+
+    tcp_down = client.get(
+        "/hosts/?group=Keyset-Group&monitor_type=tcp&status=DOWN", headers=auth_headers
+    ).json()
+    assert [h["name"] for h in tcp_down] == ["Keyset 03"]
+
+    prefixed = client.get("/hosts/?name_prefix=Keyset 0", headers=auth_headers).json()
+    assert len(prefixed) == 5
+
+
+def test_read_hosts_field_projection(client, auth_headers):
+    response = client.get(
+        "/hosts/?fields=name,last_status&name_prefix=Keyset", headers=auth_headers
+    )
+    assert response.status_code == 200
+    for host in response.json():
+        assert set(host) == {"id", "name", "last_status"}
+
+    bad = client.get("/hosts/?fields=name,password", headers=auth_headers)
+    assert bad.status_code == 400
+
+    bad_cursor = client.get("/hosts/?cursor=not-a-cursor", headers=auth_headers)
+    assert bad_cursor.status_code == 400
+
+
+def test_bulk_import_expands_cidr_and_upserts(client, auth_headers):
+    from unittest.mock import patch
+
+    existing = client.post(
+        "/hosts/",
+        json={"name": "Bulk existing", "ip_address": "10.43.0.1", "interval": 30},
+        headers=auth_headers,
+    ).json()
+
+    rows = [
+        {"name": "rack-{ip}", "ip_address": "10.43.0.0/29", "group_name": "Rack"},
+        {"name": "dup", "ip_address": "10.43.0.2"},
+        {"ip_address": "10.43.1.0/16"},
+        {"name": "bad", "ip_address": "10.43.2.1", "interval": "often"},
+    ]
+    with patch("scheduler.request_resync") as resync:
+        response = client.post("/hosts/bulk", json={"hosts": rows}, headers=auth_headers)
+    assert response.status_code == 200
+    report = response.json()
+    assert resync.call_count == 1
+    assert (report["created"], report["updated"], report["error"]) == (5, 1, 3)
+
+    by_ip = {r["ip_address"]: r for r in report["results"] if r["status"] != "error"}
+    assert by_ip["10.43.0.1"] == {
+        "row": 1,
+        "ip_address": "10.43.0.1",
+        "status": "updated",
+        "id": existing["id"],
+    }
+    errors = [r for r in report["results"] if r["status"] == "error"]
+    assert [r["row"] for r in errors] == [2, 3, 4]
+    assert "Duplicate" in errors[0]["error"]
+    assert "limit" in errors[1]["error"]
+    assert errors[2]["error"].startswith("interval")
+
+    updated = client.get(f"/hosts/{existing['id']}", headers=auth_headers).json()
+    # Fields absent from the row keep their values
+    assert (updated["name"], updated["group_name"], updated["interval"]) == (
+        "rack-10.43.0.1",
+        "Rack",
+        30,
+    )
+
+    again = client.post("/hosts/bulk", json=rows[:1], headers=auth_headers).json()
+    assert again["unchanged"] == 6
+
+
+def test_bulk_update_without_a_name_keeps_the_name(client, auth_headers):
+    existing = client.post(
+        "/hosts/",
+        json={"name": "Named host", "ip_address": "10.43.5.1"},
+        headers=auth_headers,
+    ).json()
+
+    rows = [{"ip_address": "10.43.5.1", "interval": 45}, {"ip_address": "10.43.5.2"}]
+    report = client.post("/hosts/bulk", json=rows, headers=auth_headers).json()
+    assert (report["created"], report["updated"]) == (1, 1)
+
+    updated = client.get(f"/hosts/{existing['id']}", headers=auth_headers).json()
+    assert (updated["name"], updated["interval"]) == ("Named host", 45)
+    # New hosts without a name are still named after their address
+    created = next(r for r in report["results"] if r["status"] == "created")
+    assert client.get(f"/hosts/{created['id']}", headers=auth_headers).json()["name"] == "10.43.5.2"
+
+
+def test_bulk_import_rejects_a_slug_shared_by_new_rows(client, auth_headers):
+    rows = [
+        {"ip_address": "10.43.6.1", "monitor_type": "heartbeat", "heartbeat_slug": "bulk-shared"},
+        {"ip_address": "10.43.6.2", "monitor_type": "heartbeat", "heartbeat_slug": "bulk-shared"},
+    ]
+    response = client.post("/hosts/bulk", json=rows, headers=auth_headers)
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["created"], report["error"]) == (1, 1)
+    assert report["results"][1]["error"] == "heartbeat_slug is already in use"
+
+
+def test_bulk_import_csv_and_atomic(client, auth_headers):
+    body = "name,ip_address,monitor_type,port\nweb,10.43.9.1,tcp,443\nmail,10.43.9.2,,\n"
+    response = client.post(
+        "/hosts/bulk?atomic=true",
+        content=body + "broken,10.43.9.3,tcp,not-a-port\n",
+        headers={**auth_headers, "Content-Type": "text/csv"},
+    )
+    report = response.json()
+    assert (report["skipped"], report["error"]) == (2, 1)
+    names = {h["name"] for h in client.get("/hosts/?name_prefix=web", headers=auth_headers).json()}
+    assert "web" not in names
+
+    report = client.post(
+        "/hosts/bulk", content=body, headers={**auth_headers, "Content-Type": "text/csv"}
+    ).json()
+    assert report["created"] == 2
+    web = client.get(f"/hosts/{report['results'][0]['id']}", headers=auth_headers).json()
+    assert (web["monitor_type"], web["port"]) == ("tcp", 443)
+    mail = client.get(f"/hosts/{report['results'][1]['id']}", headers=auth_headers).json()
+    assert (mail["monitor_type"], mail["port"]) == ("icmp", None)
+
+    bad = client.post(
+        "/hosts/bulk",
+        content="name,address\nx,y\n",
+        headers={**auth_headers, "Content-Type": "text/csv"},
+    )
+    assert bad.status_code == 400
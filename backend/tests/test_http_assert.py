@@ -0,0 +1,167 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_assert
+from http_assert import BodyAssertion
+
+_PAGE_BYTES = 8 * 1024 * 1024
+
+
+class _PageHandler(BaseHTTPRequestHandler):
+    """/big: a multi-megabyte page with a marker near the start; /health: a JSON document."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/health":
+            body = b'{"status": "ok", "checks": [{"name": "db", "up": true}]}'
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(_PAGE_BYTES))
+        self.end_headers()
+        try:
+            self.wfile.write(b"<html>" + b" " * 40000 + b"BUILD-OK</html>")
+            sent = 40014
+            while sent < _PAGE_BYTES:
+                chunk = b"x" * min(64 * 1024, _PAGE_BYTES - sent)
+                self.wfile.write(chunk)
+                sent += len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the monitor hung up once it had seen enough
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _PageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _chunks(data: bytes, size: int, consumed: list):
+    for i in range(0, len(data), size):
+        consumed.append(i)
+        yield data[i : i + size]
+
+
+def test_keyword_and_regex_stop_at_first_match():
+    body = b"a" * 100 + b"status: healthy" + b"b" * 1000
+    consumed = []
+    assert BodyAssertion("contains", "healthy").evaluate(_chunks(body, 10, consumed))[0]
+    # The keyword straddles chunks 10 and 11; nothing after it is read
+    assert len(consumed) == 12
+
+    consumed = []
+    assert BodyAssertion("regex", r"status: \w+y").evaluate(_chunks(body, 10, consumed))[0]
+    assert len(consumed) == 12
+
+    assert not BodyAssertion("not_contains", "healthy").evaluate(_chunks(body, 10, []))[0]
+    assert BodyAssertion("not_contains", "error").evaluate(_chunks(body, 10, []))[0]
+    passed, detail = BodyAssertion("contains", "error").evaluate(_chunks(body, 10, []))
+    assert not passed and detail == f"not found in {len(body)} bytes"
+
+
+def test_reads_stop_at_the_byte_cap():
+    body = b"x" * 5000 + b"needle"
+    consumed = []
+    passed, detail = BodyAssertion("contains", "needle", max_bytes=1000).evaluate(
+        _chunks(body, 100, consumed)
+    )
+    assert not passed and detail == "not found in 1000 bytes"
+    assert len(consumed) == 10
+
+
+def test_json_path_assertions():
+    body = b'{"status": "ok", "version": 3, "checks": [{"up": true}]}'
+
+    def check(path, match=None, max_bytes=None):
+        return BodyAssertion("json", match, path, max_bytes).evaluate([body])
+
+    assert check("status", "ok")[0]
+    assert check("$.version", "3")[0]
+    assert check("$.checks[0].up", "true")[0]
+    assert check("checks.0.up")[0]
+    assert check("status", "degraded") == (False, "JSON value was 'ok'")
+    assert check("checks.1.up") == (False, "JSON path not found")
+    assert not check("status", "ok", max_bytes=10)[0]
+
+
+def test_invalid_configurations_are_rejected():
+    with pytest.raises(ValueError):
+        BodyAssertion("regex", "(unclosed")
+    with pytest.raises(ValueError):
+        BodyAssertion("contains", "")
+    with pytest.raises(ValueError):
+        BodyAssertion("json", "ok")
+    with pytest.raises(ValueError):
+        BodyAssertion("xpath", "x")
+    assert http_assert.from_config({"match_type": None, "match": "x"}) is None
+
+
+def test_compiled_assertions_are_reused():
+    config = {"match_type": "regex", "match": r"status: \w+", "json_path": None, "max_bytes": None}
+    assert http_assert.from_config(config) is http_assert.from_config(dict(config))
+    assert http_assert.from_config(config) is not http_assert.from_config(dict(config, match="x"))
+
+
+def test_http_check_streams_only_what_it_needs(http_server):
+    import scheduler
+
+    assertion = BodyAssertion("contains", "BUILD-OK")
+    is_up, latency, status = scheduler.check_http(f"{http_server}/big", assertion=assertion)
+    assert (is_up, status) == (True, 200) and latency >= 0
+
+    missing = BodyAssertion("contains", "BUILD-FAILED", max_bytes=256 * 1024)
+    assert scheduler.check_http(f"{http_server}/big", assertion=missing)[0] is False
+
+
+def test_http_monitor_with_json_assertion(client, auth_headers, db_session, http_server, monkeypatch):
+    import database
+    import scheduler
+    from models import HostDB
+
+    monkeypatch.setattr(scheduler, "SessionLocal", database.SessionLocal)
+    host = {
+        "name": "Health JSON",
+        "ip_address": f"{http_server}/health",
+        "monitor_type": "http",
+        "http_match_type": "json",
+        "http_match": "ok",
+    }
+    bad = client.post("/hosts/", json=host, headers=auth_headers)
+    assert bad.status_code == 400 and "JSON path" in bad.json()["detail"]
+    bad = client.post(
+        "/hosts/", json=dict(host, http_match_type="regex", http_match="("), headers=auth_headers
+    )
+    assert bad.status_code == 400
+
+    created = client.post(
+        "/hosts/", json=dict(host, http_json_path="$.status"), headers=auth_headers
+    ).json()
+
+    def run_job():
+        # The assertion settings travel in the job's args, as update_jobs() schedules them
+        db_session.expire_all()
+        scheduler.ping_host(*scheduler._job_args(db_session.get(HostDB, created["id"])))
+        db_session.expire_all()
+
+    run_job()
+    assert db_session.get(HostDB, created["id"]).last_status == "UP"
+
+    client.put(
+        f"/hosts/{created['id']}",
+        json=dict(host, http_json_path="$.checks[0].up", http_match="false"),
+        headers=auth_headers,
+    )
+    run_job()
+    assert db_session.get(HostDB, created["id"]).last_status == "DOWN"
+    client.delete(f"/hosts/{created['id']}", headers=auth_headers)
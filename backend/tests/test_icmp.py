@@ -0,0 +1,25 @@
+import struct
+
+import pytest
+
+import icmp
+
+
+def test_echo_packets_round_trip():
+    packet = icmp.echo_request(0x1234, 7)
+    assert icmp.checksum(packet) == 0
+    reply = b"\x00" + packet[1:]
+    assert icmp.parse_echo_reply(reply, raw=False) == (0x1234, 7)
+    ip_header = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 0, 0, 0, 64, 1, 0, b"\0" * 4, b"\0" * 4)
+    assert icmp.parse_echo_reply(ip_header + reply, raw=True) == (0x1234, 7)
+    assert icmp.parse_echo_reply(packet, raw=False) is None  # a request, not a reply
+
+
+def test_burst_to_loopback():
+    sock, _ = icmp.open_socket()
+    if sock is None:
+        pytest.skip("no ICMP socket in this environment")
+    sock.close()
+    rtts = icmp.burst("127.0.0.1", 4, interval=0.005, timeout=1.0)
+    assert len(rtts) == 4
+    assert all(rtt is not None and rtt >= 0 for rtt in rtts)
@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from apscheduler.schedulers.background import BackgroundScheduler
+
+import jobstats
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    fresh = jobstats.SchedulerStats()
+    monkeypatch.setattr(jobstats, "stats", fresh)
+    return fresh
+
+
+def _job(job_id, interval=60):
+    return SimpleNamespace(id=job_id, trigger=SimpleNamespace(interval=timedelta(seconds=interval)))
+
+
+def test_counts_coalesced_skipped_and_missed_runs(stats, caplog):
+    due = datetime.now(timezone.utc) - timedelta(minutes=10)
+    job = _job("ping_7")
+    stats.submitted(job, [due])
+    stats.started(job, [due])
+    stats.finished(job, 0.2)
+    # Three intervals later: two runs were folded into this one
+    with caplog.at_level(logging.WARNING, logger="jobstats"):
+        stats.submitted(job, [due + timedelta(minutes=3)])
+        stats.on_event(
+            SimpleNamespace(
+                code=EVENT_JOB_MAX_INSTANCES,
+                job_id="ping_7",
+                scheduled_run_times=[due + timedelta(minutes=4)],
+            )
+        )
+        stats.on_event(SimpleNamespace(code=EVENT_JOB_MISSED, job_id="ping_8"))
+        stats.on_event(SimpleNamespace(code=EVENT_JOB_MISSED, job_id="ping_9"))
+
+    ping = stats.snapshot()["jobs"]["ping"]
+    assert (ping["coalesced"], ping["skipped"], ping["missed"], ping["runs"]) == (2, 1, 2, 1)
+    assert ping["runtime"]["max"] == 0.2
+    # Ten minutes late is well past the lag threshold
+    assert ping["lag"]["count"] == 1 and ping["lag"]["max"] > 590
+    warnings = [r.message for r in caplog.records]
+    assert any("folded 2 overdue ping" in w for w in warnings)
+    # One warning per reason and kind within WARN_INTERVAL
+    assert sum("missed" in w for w in warnings) == 1
+    assert stats.snapshot()["executor"]["queued"] == 1
+
+
+def test_standby_gap_is_not_counted_as_coalesced_runs(stats, monkeypatch):
+    from unittest.mock import MagicMock
+
+    import scheduler
+
+    due = datetime.now(timezone.utc) - timedelta(hours=1)
+    job = _job("ping_4")
+    stats.submitted(job, [due])
+    monkeypatch.setattr(scheduler, "scheduler", MagicMock(running=True))
+    monkeypatch.setattr(scheduler, "_new_scheduler", MagicMock())
+    scheduler.stop_scheduler()
+
+    # Re-elected an hour later: the first run starts a fresh count
+    stats.submitted(job, [due + timedelta(hours=1)])
+    assert stats.snapshot()["jobs"]["ping"]["coalesced"] == 0
+
+
+def test_instrumented_executor_reports_queue_and_lag(stats):
+    scheduler = BackgroundScheduler(executors={"default": jobstats.InstrumentedExecutor(max_workers=1)})
+    release = threading.Event()
+    lags = []
+
+    def slow():
+        lags.append(jobstats.current_lag())
+        release.wait(5)
+
+    scheduler.start()
+    try:
+        for i in range(3):
+            scheduler.add_job(slow, id=f"slow_{i}")
+        deadline = time.monotonic() + 5
+        while stats.snapshot()["executor"]["queued"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        executor = stats.snapshot()["executor"]
+        assert (executor["workers"], executor["running"], executor["queued"]) == (1, 1, 2)
+        release.set()
+        while stats.snapshot()["jobs"].get("slow", {}).get("runs", 0) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        release.set()
+        scheduler.shutdown()
+
+    slow_stats = stats.snapshot()["jobs"]["slow"]
+    assert slow_stats["runs"] == 3 and slow_stats["runtime"]["count"] == 3
+    assert stats.snapshot()["executor"]["peak_queued"] == 2
+    assert all(lag is not None and lag >= 0 for lag in lags)
+    assert jobstats.current_lag() is None
+
+
+def test_refused_submission_is_not_left_queued(stats):
+    pool = jobstats._TimedPool(1)
+    pool.shutdown()
+    due = datetime.now(timezone.utc)
+    with pytest.raises(RuntimeError):
+        pool.submit(lambda *args: None, _job("ping_3"), "default", [due], "apscheduler")
+    assert stats.snapshot()["executor"]["queued"] == 0
+
+
+def test_pool_override_matches_apscheduler_run_job():
+    import inspect
+
+    from apscheduler.executors.base import run_job
+
+    # _TimedPool.submit unpacks these positionally; see the note on the class
+    assert list(inspect.signature(run_job).parameters) == [
+        "job",
+        "jobstore_alias",
+        "run_times",
+        "logger_name",
+    ]
+
+
+def test_job_kind():
+    assert jobstats.job_kind("ping_42") == "ping"
+    assert jobstats.job_kind("cleanup_old_data") == "cleanup_old_data"
+
+
+def test_internal_stats_endpoint(client, auth_headers):
+    assert client.get("/internal/stats").status_code == 401
+    body = client.get("/internal/stats", headers=auth_headers).json()
+    assert body["scheduler_running"] is True
+    assert body["executor"]["workers"] == jobstats.SCHEDULER_WORKERS
+    assert body["scheduled_jobs"] >= 1
+    assert set(body["executor"]) == {"workers", "queued", "running", "peak_queued"}
@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+from leader import LeaderElection, LeaderLock
+
+
+@pytest.fixture
+def lease_name(client, db_session):
+    from models import LeaderLeaseDB
+
+    yield "test-lease"
+    db_session.query(LeaderLeaseDB).filter(LeaderLeaseDB.name == "test-lease").delete()
+    db_session.commit()
+
+
+def _expire(db_session, name):
+    from models import LeaderLeaseDB
+
+    db_session.query(LeaderLeaseDB).filter(LeaderLeaseDB.name == name).update(
+        {"expires_at": datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db_session.commit()
+
+
+def test_only_one_holder_until_the_lease_lapses(db_session, lease_name):
+    a = LeaderLock(lease_name, ttl=30, holder="a")
+    b = LeaderLock(lease_name, ttl=30, holder="b")
+
+    assert a.try_acquire()
+    assert not b.try_acquire()
+    assert a.try_acquire()  # renewal
+    assert b.current() == "a"
+
+    _expire(db_session, lease_name)
+    assert b.current() is None
+    assert b.try_acquire()
+    assert not a.try_acquire()
+
+
+def test_election_hands_over_on_stop(db_session, lease_name):
+    started, stopped = MagicMock(), MagicMock()
+    first = LeaderElection(LeaderLock(lease_name, holder="first"), started, stopped)
+    standby = LeaderElection(LeaderLock(lease_name, holder="standby"), MagicMock(), MagicMock())
+
+    first.start()
+    standby.start()
+    try:
+        assert first.is_leader and not standby.is_leader
+        started.assert_called_once()
+
+        first.stop()
+        stopped.assert_called_once()
+        # Released on stop, so the standby doesn't wait out the TTL
+        standby._step()
+        assert standby.is_leader
+        standby.on_elected.assert_called_once()
+    finally:
+        first.stop()
+        standby.stop()
+
+
+def test_leader_steps_down_when_the_lease_is_taken(db_session, lease_name):
+    stopped = MagicMock()
+    election = LeaderElection(LeaderLock(lease_name, holder="old"), MagicMock(), stopped)
+    election._step()
+    assert election.is_leader
+
+    _expire(db_session, lease_name)
+    assert LeaderLock(lease_name, holder="new").try_acquire()
+    election._step()
+    assert not election.is_leader
+    stopped.assert_called_once()
+
+
+def test_resync_requests_reach_the_scheduler_process(monkeypatch):
+    import scheduler
+    from events import RESYNC_REQUESTED, event_bus
+
+    update_jobs = MagicMock()
+    monkeypatch.setattr(scheduler, "update_jobs", update_jobs)
+    published = []
+    monkeypatch.setattr(event_bus, "publish", lambda event_type, **kw: published.append(event_type))
+    stub = MagicMock(running=False)
+    monkeypatch.setattr(scheduler, "scheduler", stub)
+
+    # API-only process: ask whoever runs the scheduler
+    scheduler.request_resync()
+    assert published == [RESYNC_REQUESTED]
+    update_jobs.assert_not_called()
+
+    stub.running = True
+    scheduler._on_resync_requested({"type": RESYNC_REQUESTED})
+    update_jobs.assert_called_once()
+
+
+def test_resync_does_not_repeat_startup_runs(client, monkeypatch):
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    import database
+    import scheduler
+
+    monkeypatch.setattr(scheduler, "SessionLocal", database.SessionLocal)
+    fresh = BackgroundScheduler()
+    monkeypatch.setattr(scheduler, "scheduler", fresh)
+
+    scheduler.update_jobs()
+    jobs = len(fresh.get_jobs())
+    # A periodic reconcile must not queue another SSL check or latency average
+    scheduler.update_jobs()
+    assert len(fresh.get_jobs()) == jobs
+
+
+def test_lease_check_errors_keep_leadership_until_it_expires():
+    import time
+
+    lock = MagicMock(ttl=30, try_acquire=MagicMock(return_value=True))
+    stopped = MagicMock()
+    election = LeaderElection(lock, MagicMock(), stopped)
+    election._step()
+    assert election.is_leader
+
+    # The database is briefly unavailable: nobody else can take the lease yet
+    lock.try_acquire.side_effect = OSError("database is locked")
+    election._step()
+    assert election.is_leader
+    stopped.assert_not_called()
+
+    # The lease would lapse before the next check, while another process could take it
+    election._expires_at = time.monotonic() + election.interval / 2
+    election._step()
+    assert not election.is_leader
+    stopped.assert_called_once()
+
+
+def test_scheduler_runs_jobs_again_after_re_election(monkeypatch):
+    import threading
+
+    import scheduler
+
+    monkeypatch.setattr(scheduler, "update_jobs", MagicMock())
+    monkeypatch.setattr(scheduler, "scheduler", scheduler._new_scheduler())
+    lock = MagicMock(ttl=30)
+    election = LeaderElection(lock, scheduler.start_scheduler, scheduler.stop_scheduler)
+    try:
+        for acquired in (True, False, True):
+            lock.try_acquire.return_value = acquired
+            election._step()
+        assert election.is_leader and scheduler.scheduler.running
+
+        ran = threading.Event()
+        scheduler.scheduler.add_job(ran.set)
+        assert ran.wait(timeout=5)
+    finally:
+        scheduler.stop_scheduler()
@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from maintenance import MaintenanceIndex, in_maintenance
+
+
+def _ts(*args, tz=timezone.utc):
+    return datetime(*args, tzinfo=tz).timestamp()
+
+
+def _schedule(cron, minutes, host_id=None, group_name=None, tz="UTC", name="window"):
+    return SimpleNamespace(
+        name=name,
+        cron=cron,
+        duration_minutes=minutes,
+        host_id=host_id,
+        group_name=group_name,
+        timezone=tz,
+    )
+
+
+def test_index_answers_by_scope():
+    # 2024-03-04 is a Monday
+    now = _ts(2024, 3, 4, 0, 0)
+    index = MaintenanceIndex()
+    index.compile(
+        [
+            _schedule("0 2 * * *", 60, host_id=1),
+            _schedule("30 3 * * mon", 30, group_name="DC-1"),
+            _schedule("0 12 1 * *", 10),
+        ],
+        now,
+    )
+
+    assert index.is_active(1, "Other", _ts(2024, 3, 5, 2, 30))
+    assert not index.is_active(1, "Other", _ts(2024, 3, 5, 3, 0))
+    assert not index.is_active(2, "Other", _ts(2024, 3, 5, 2, 30))
+
+    assert index.is_active(2, "DC-1", _ts(2024, 3, 4, 3, 45))
+    assert not index.is_active(2, "DC-1", _ts(2024, 3, 5, 3, 45))
+
+    # A window already open when the index was compiled is still found
+    index.compile([_schedule("0 23 * * *", 120)], _ts(2024, 3, 4, 0, 30))
+    assert index.is_active(5, None, _ts(2024, 3, 4, 0, 30))
+
+
+def test_overlapping_windows_merge_and_respect_timezone():
+    now = _ts(2024, 7, 1, 0, 0)
+    index = MaintenanceIndex()
+    index.compile(
+        [
+            _schedule("0 1 * * *", 60, host_id=1, tz="Europe/Rome"),
+            _schedule("30 1 * * *", 60, host_id=1, tz="Europe/Rome"),
+        ],
+        now,
+    )
+    starts, ends = index._windows[("host", 1)]
+    # The 30 Jun window is inside the lookback, then one per day over the 7-day horizon
+    assert len(starts) == len(ends) == 8
+    # 01:00-02:30 Rome time is 23:00-00:30 UTC in summer
+    assert starts[0] == _ts(2024, 6, 30, 23, 0)
+    assert ends[0] == _ts(2024, 7, 1, 0, 30)
+    assert index.active_until(1, None, _ts(2024, 7, 1, 0, 15)) == ends[0]
+
+
+def test_in_maintenance_combines_flag_one_off_and_schedules():
+    now = _ts(2024, 3, 4, 12, 0)
+    host = SimpleNamespace(
+        id=7, group_name="Lab", maintenance=False, maintenance_start=None, maintenance_end=None
+    )
+    import maintenance
+
+    maintenance.index.compile([], now)
+    assert not in_maintenance(host, now)
+    host.maintenance_start = datetime(2024, 3, 4, 11, 0)
+    host.maintenance_end = datetime(2024, 3, 4, 13, 0)
+    assert in_maintenance(host, now)
+    host.maintenance_start = host.maintenance_end = None
+    host.maintenance = True
+    assert in_maintenance(host, now)
+
+
+def test_schedule_crud_refreshes_index(client, auth_headers, db_session):
+    import maintenance
+    from models import HostDB
+
+    host = HostDB(name="Scheduled", ip_address="10.30.0.1", group_name="Sched")
+    db_session.add(host)
+    db_session.commit()
+
+    bad = client.post(
+        "/maintenance-schedules",
+        json={"name": "bad", "cron": "every sunday", "group_name": "Sched"},
+        headers=auth_headers,
+    )
+    assert bad.status_code == 400
+
+    response = client.post(
+        "/maintenance-schedules",
+        json={"name": "always", "cron": "* * * * *", "duration_minutes": 5, "group_name": "Sched"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert maintenance.in_maintenance(host)
+
+    schedule_id = response.json()["id"]
+    assert client.delete(f"/maintenance-schedules/{schedule_id}", headers=auth_headers).json() == {
+        "ok": True
+    }
+    assert not maintenance.in_maintenance(host)
@@ -0,0 +1,145 @@
+import time
+
+import pytest
+
+import metrics
+from events import HOST_DELETED, HOST_UPDATED, PROBE_RESULT, STATUS_CHANGE
+
+
+def _samples(text: str) -> dict[str, float]:
+    assert text.endswith("# EOF\n")
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def _host(host_id, name, group="Core", monitor_type="icmp", last_status="UNKNOWN"):
+    return {
+        "type": HOST_UPDATED,
+        "host_id": host_id,
+        "name": name,
+        "group_name": group,
+        "monitor_type": monitor_type,
+        "enabled": True,
+        "last_status": last_status,
+    }
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = metrics.Exporter()
+    monkeypatch.setattr(exporter, "_loaded", True)
+    return exporter
+
+
+def test_host_gauges_follow_events(exporter):
+    exporter.on_event(_host(1, 'Core "switch"'))
+    exporter.on_event(_host(2, "Edge"))
+    exporter.on_event(
+        {"type": PROBE_RESULT, "host_id": 1, "latency": 12.5, "status": "UP", "sent": 4, "received": 3}
+    )
+    exporter.on_event({"type": PROBE_RESULT, "host_id": 2, "latency": None, "status": "DOWN"})
+
+    samples = _samples(exporter.render())
+    core = 'host_id="1",name="Core \\"switch\\"",group="Core",monitor_type="icmp"'
+    edge = 'host_id="2",name="Edge",group="Core",monitor_type="icmp"'
+    assert samples["netmon_hosts"] == 2
+    assert samples[f"netmon_host_up{{{core}}}"] == 1
+    assert samples[f"netmon_host_up{{{edge}}}"] == 0
+    assert samples[f"netmon_host_latency_seconds{{{core}}}"] == 0.0125
+    assert f"netmon_host_latency_seconds{{{edge}}}" not in samples
+    assert samples[f"netmon_host_packet_loss_ratio{{{core}}}"] == 0.25
+    assert samples[f"netmon_host_packet_loss_ratio{{{edge}}}"] == 1.0
+
+    exporter.on_event({"type": STATUS_CHANGE, "host_id": 2, "status": "UP"})
+    exporter.on_event(_host(1, "Renamed", last_status="UP"))
+    exporter.on_event({"type": HOST_DELETED, "host_id": 2})
+    samples = _samples(exporter.render())
+    assert samples["netmon_hosts"] == 1
+    renamed = 'host_id="1",name="Renamed",group="Core",monitor_type="icmp"'
+    assert samples[f"netmon_host_up{{{renamed}}}"] == 1
+    assert not any("Edge" in name or "switch" in name for name in samples)
+
+
+def test_timing_histograms(exporter):
+    for duration in (0.004, 0.02, 3.0):
+        exporter.on_event(
+            {
+                "type": PROBE_RESULT,
+                "host_id": 99,
+                "latency": 1.0,
+                "status": "UP",
+                "monitor_type": "http",
+                "duration": duration,
+                "lag": 0.002,
+                "db_write": 0.0008,
+            }
+        )
+    samples = _samples(exporter.render())
+    assert samples['netmon_probe_duration_seconds_bucket{monitor_type="http",le="0.005"}'] == 1
+    assert samples['netmon_probe_duration_seconds_bucket{monitor_type="http",le="0.025"}'] == 2
+    assert samples['netmon_probe_duration_seconds_bucket{monitor_type="http",le="+Inf"}'] == 3
+    assert samples['netmon_probe_duration_seconds_count{monitor_type="http"}'] == 3
+    assert samples['netmon_probe_duration_seconds_sum{monitor_type="http"}'] == pytest.approx(3.024)
+    assert samples['netmon_scheduler_lag_seconds_bucket{le="0.001"}'] == 0
+    assert samples['netmon_scheduler_lag_seconds_bucket{le="0.005"}'] == 3
+    assert samples['netmon_db_write_seconds_bucket{le="0.001"}'] == 3
+    assert samples["netmon_notification_queue_depth"] == 0
+
+
+def test_render_is_fast_and_never_queries(exporter, monkeypatch):
+    for host_id in range(10_000):
+        exporter.on_event(_host(host_id, f"host-{host_id}", group=f"rack-{host_id % 40}"))
+        exporter.on_event(
+            {"type": PROBE_RESULT, "host_id": host_id, "latency": 3.2, "status": "UP", "duration": 0.01}
+        )
+
+    def no_queries():
+        raise AssertionError("render queried the database")
+
+    monkeypatch.setattr(metrics.database, "SessionLocal", no_queries)
+    exporter.render()
+    started = time.perf_counter()
+    for _ in range(10):
+        text = exporter.render()
+    elapsed = (time.perf_counter() - started) / 10
+    assert text.count("netmon_host_up{") == 10_000
+    # Well under 10 ms on a developer machine; the bound leaves room for slow CI runners
+    assert elapsed < 0.05
+
+
+def test_prometheus_endpoint(client, db_session, monkeypatch):
+    import database
+    import scheduler
+    from models import HostDB
+    from routers import status
+
+    monkeypatch.setattr(scheduler, "SessionLocal", database.SessionLocal)
+    host = HostDB(name="Scraped", ip_address="10.9.0.49", last_status="UP")
+    db_session.add(host)
+    db_session.commit()
+    metrics.exporter.load()
+    monkeypatch.setattr(scheduler, "ping", lambda *args, **kwargs: 7.0)
+    scheduler.ping_host(host.id, host.ip_address, host.name)
+
+    # Off until a scrape token is configured
+    assert client.get("/prometheus").status_code == 404
+    monkeypatch.setattr(status, "PROMETHEUS_TOKEN", "scrape-secret")
+    scrape = {"Authorization": "Bearer scrape-secret"}
+
+    response = client.get("/prometheus", headers=scrape)
+    assert response.headers["content-type"].startswith("application/openmetrics-text")
+    samples = _samples(response.text)
+    labels = f'host_id="{host.id}",name="Scraped",group="General",monitor_type="icmp"'
+    assert samples[f"netmon_host_up{{{labels}}}"] == 1
+    assert samples[f"netmon_host_latency_seconds{{{labels}}}"] == 0.007
+    assert samples['netmon_probe_duration_seconds_count{monitor_type="icmp"}'] >= 1
+    assert samples["netmon_db_write_seconds_count"] >= 1
+
+    assert client.get("/prometheus").status_code == 401
+    wrong = client.get("/prometheus", headers={"Authorization": "Bearer guess"})
+    assert wrong.status_code == 401
+
@@ -1,5 +1,9 @@
 from unittest.mock import Mock
 
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
 from notifications import NotificationManager
 
 
@@ -78,3 +82,153 @@ def test_send_notification_exception():
     # Should not raise
     manager.send_notification("Test Title", "Test Body")
     manager.apobj.notify.assert_called_once_with(title="Test Title", body="Test Body")
+
+
+class _FakeChannel:
+    service_name = "fake"
+
+    def __init__(self, name, results):
+        self.name = name
+        self.results = list(results)
+        self.calls = []
+
+    def url(self):
+        return f"fake://{self.name}"
+
+    def notify(self, body, title):
+        self.calls.append(title)
+        return self.results.pop(0) if self.results else True
+
+
+class _FakeApprise(list):
+    def __bool__(self):
+        return len(self) > 0
+
+
+@pytest.fixture
+def file_db(tmp_path, monkeypatch):
+    """Outbox workers use their own connections, so give them a real file database."""
+    import database
+    import models
+
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/outbox.db", connect_args={"check_same_thread": False}
+    )
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(database, "SessionLocal", Session)
+    db = Session()
+    try:
+        yield db
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def _wait_for(predicate, timeout=3.0):
+    import time
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_outbox_delivers_asynchronously(file_db):
+    import models
+
+    manager = NotificationManager()
+    channel = _FakeChannel("a", [True])
+    manager.apobj = _FakeApprise([channel])
+    manager.start(workers=2)
+    try:
+        manager.send_notification("Outbox Title", "Body")
+        assert _wait_for(lambda: channel.calls == ["Outbox Title"])
+        assert _wait_for(lambda: manager.stats()["sent"] == 1)
+    finally:
+        manager.stop()
+
+    row = (
+        file_db.query(models.NotificationOutboxDB)
+        .filter(models.NotificationOutboxDB.title == "Outbox Title")
+        .one()
+    )
+    assert row.status == "sent"
+    assert row.attempts == 1
+
+
+def test_outbox_retries_only_failed_channels(file_db, monkeypatch):
+    from datetime import timedelta
+
+    import models
+    import notifications
+
+    monkeypatch.setattr(notifications, "retry_delay", lambda attempts: timedelta(0))
+    manager = NotificationManager()
+    healthy = _FakeChannel("healthy", [True])
+    flaky = _FakeChannel("flaky", [False, True])
+    manager.apobj = _FakeApprise([healthy, flaky])
+    manager.start(workers=1)
+    try:
+        manager.send_notification("Retry Title", "Body")
+        assert _wait_for(lambda: len(flaky.calls) == 2)
+        assert _wait_for(lambda: manager.stats()["sent"] == 1)
+    finally:
+        manager.stop()
+
+    assert healthy.calls == ["Retry Title"]
+    stats = manager.stats()
+    assert stats["retried"] == 1
+    row = (
+        file_db.query(models.NotificationOutboxDB)
+        .filter(models.NotificationOutboxDB.title == "Retry Title")
+        .one()
+    )
+    file_db.refresh(row)
+    assert row.status == "sent"
+    assert row.attempts == 2
+
+
+def test_retry_delay_is_exponential_and_capped():
+    from notifications import RETRY_MAX_SECONDS, retry_delay
+
+    assert retry_delay(1).total_seconds() == 5
+    assert retry_delay(3).total_seconds() == 20
+    assert retry_delay(50).total_seconds() == RETRY_MAX_SECONDS
+
+
+def test_crashed_delivery_goes_back_to_pending(file_db, monkeypatch):
+    from datetime import datetime
+
+    import models
+
+    manager = NotificationManager()
+    manager.apobj = _FakeApprise([_FakeChannel("a", [True])])
+
+    def crash(title, body, delivered):
+        raise RuntimeError("channel plugin blew up")
+
+    monkeypatch.setattr(manager, "_deliver", crash)
+
+    def row():
+        file_db.expire_all()
+        return (
+            file_db.query(models.NotificationOutboxDB)
+            .filter(models.NotificationOutboxDB.title == "Crash Title")
+            .one()
+        )
+
+    manager.start(workers=1)
+    try:
+        manager.send_notification("Crash Title", "Body")
+        # Counters move before the commit, so wait for the row itself
+        assert _wait_for(lambda: row().attempts == 1)
+    finally:
+        manager.stop()
+
+    crashed = row()
+    assert crashed.status == "pending"
+    assert crashed.last_error == "channel plugin blew up"
+    assert crashed.next_attempt_at > datetime.utcnow()
@@ -0,0 +1,116 @@
+import socket
+import struct
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+import dns_client
+from publicip import PublicIPResolver
+
+
+def _answers(mapping):
+    """Fake `lookup`: provider -> (delay, address or exception)."""
+
+    def lookup(provider, version):
+        delay, result = mapping[provider]
+        time.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return lookup
+
+
+def test_first_quorum_wins_without_waiting_for_stragglers():
+    resolver = PublicIPResolver(quorum=2, timeout=5)
+    resolver.lookup = _answers(
+        {
+            "fast": (0.0, "203.0.113.7"),
+            "broken": (0.0, ValueError("bad")),
+            "medium": (0.05, "203.0.113.7"),
+            "slow": (2.0, "203.0.113.7"),
+        }
+    )
+    start = time.perf_counter()
+    assert resolver.resolve(4, ["fast", "broken", "medium", "slow"]) == "203.0.113.7"
+    assert time.perf_counter() - start < 1
+
+
+def test_disagreement_returns_none():
+    resolver = PublicIPResolver(quorum=2, timeout=1)
+    resolver.lookup = _answers({"a": (0, "203.0.113.1"), "b": (0, "203.0.113.2")})
+    assert resolver.resolve(4, ["a", "b"]) is None
+    # A single configured provider is its own quorum
+    assert resolver.resolve(4, ["a"]) == "203.0.113.1"
+
+
+def test_lookup_validates_address_family():
+    resolver = PublicIPResolver()
+    with patch.object(dns_client, "query", return_value=[{"value": "2001:db8::1"}]):
+        with pytest.raises(ValueError):
+            resolver.lookup("dns-txt:o-o.myaddr.l.google.com@216.239.32.10", 4)
+        assert resolver.lookup("dns:myip.opendns.com@2620:119:35::35", 6) == "2001:db8::1"
+
+
+@pytest.fixture
+def fake_dns_server():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(5)
+
+    def serve():
+        try:
+            packet, addr = sock.recvfrom(512)
+        except OSError:
+            return
+        question = packet[12:]
+        header = struct.pack("!HHHHHH", struct.unpack("!H", packet[:2])[0], 0x8180, 1, 1, 0, 0)
+        answer = struct.pack("!HHHIH", 0xC00C, dns_client.A, 1, 300, 4) + bytes([192, 0, 2, 55])
+        sock.sendto(header + question + answer, addr)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield sock.getsockname()[1]
+    sock.close()
+
+
+def test_dns_client_round_trip(fake_dns_server):
+    answers = dns_client.query("myip.example", dns_client.A, "127.0.0.1", port=fake_dns_server)
+    assert answers == [{"name": "myip.example", "type": dns_client.A, "ttl": 300, "value": "192.0.2.55"}]
+
+
+def test_malformed_replies_raise_dns_error():
+    header = struct.pack("!HHHHHH", 7, 0x8180, 1, 1, 0, 0)
+    question = dns_client.build_query("myip.example", dns_client.A, 7)[12:]
+    # Answer cut off inside its fixed fields, and an A record with a 3-byte address
+    for answer in (
+        b"\xc0\x0c\x00\x01",
+        struct.pack("!HHHIH", 0xC00C, dns_client.A, 1, 300, 3) + bytes([192, 0, 2]),
+    ):
+        with pytest.raises(dns_client.DNSError, match="Malformed DNS reply"):
+            dns_client.parse_response(header + question + answer, 7)
+
+
+def test_check_public_ip_records_changes_per_version(client, db_session, monkeypatch):
+    import database
+    import scheduler
+    from models import PublicIPHistoryDB
+
+    monkeypatch.setattr(scheduler, "SessionLocal", database.SessionLocal)
+    monkeypatch.setattr(scheduler, "_last_public_ip", {})
+    monkeypatch.setattr(scheduler.publicip, "PUBLIC_IP_VERSIONS", [4, 6])
+    answers = {4: "198.51.100.4", 6: "2001:db8::6"}
+    monkeypatch.setattr(scheduler.publicip.resolver, "resolve", lambda version: answers[version])
+
+    scheduler.check_public_ip()
+    scheduler.check_public_ip()
+    answers[6] = None  # no IPv6 quorum this time: nothing recorded
+    scheduler.check_public_ip()
+
+    rows = db_session.query(PublicIPHistoryDB).filter(PublicIPHistoryDB.version != None).all()
+    assert sorted((r.version, r.ip_address) for r in rows) == [(4, "198.51.100.4"), (6, "2001:db8::6")]
+
+    response = client.get("/public-ip-history", params={"version": 6})
+    assert [r["ip_address"] for r in response.json()] == ["2001:db8::6"]
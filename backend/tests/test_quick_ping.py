@@ -0,0 +1,87 @@
+import asyncio
+import json
+import time
+
+import orjson
+
+from routers import tools
+
+
+def _sse_events(text: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in text.replace("\r\n", "\n").strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def _fake_ping(delays: dict):
+    def fake(target, unit="ms", timeout=2):
+        time.sleep(delays.get(target, 0))
+        return None if target.startswith("10.") else delays.get(target, 0) * 1000 + 1
+
+    return fake
+
+
+def test_batch_ping_streams_results_as_they_complete(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(tools, "ping", _fake_ping({"192.0.2.1": 0.3, "192.0.2.2": 0.0}))
+    response = client.post(
+        "/tools/ping/batch",
+        json={"targets": ["192.0.2.1", "192.0.2.2", "10.9.9.9", "192.0.2.2"]},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    events = _sse_events(response.text)
+    results = [payload for name, payload in events if name == "result"]
+    # Duplicates are pinged once; the slow target arrives last
+    assert [r["target"] for r in results][-1] == "192.0.2.1"
+    assert sorted(r["target"] for r in results) == ["10.9.9.9", "192.0.2.1", "192.0.2.2"]
+    assert next(r for r in results if r["target"] == "10.9.9.9")["error"] == "Timeout"
+    assert events[-1][0] == "done"
+    assert (events[-1][1]["total"], events[-1][1]["reachable"]) == (3, 2)
+
+
+def test_batch_ping_by_group_as_ndjson(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(tools, "ping", _fake_ping({}))
+    created = [
+        client.post(
+            "/hosts/",
+            json={"name": f"Rack {i}", "ip_address": ip, "group_name": "Rack 7"},
+            headers=auth_headers,
+        ).json()
+        for i, ip in enumerate(["198.51.100.71", "http://rack7.example.com/health"])
+    ]
+    response = client.post(
+        "/tools/ping/batch?format=ndjson", json={"group": "Rack 7"}, headers=auth_headers
+    )
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [orjson.loads(line) for line in response.text.splitlines()]
+    results = {r["name"]: r for r in lines if r["event"] == "result"}
+    assert results["Rack 0"]["host_id"] == created[0]["id"]
+    # URL monitors are pinged by hostname
+    assert results["Rack 1"]["target"] == "rack7.example.com"
+    assert lines[-1]["event"] == "done"
+    for host in created:
+        client.delete(f"/hosts/{host['id']}", headers=auth_headers)
+
+
+def test_batch_ping_validation(client, auth_headers):
+    assert client.post("/tools/ping/batch", json={"targets": ["127.0.0.1"]}).status_code == 401
+    bad = client.post("/tools/ping/batch", json={"targets": ["; rm -rf /"]}, headers=auth_headers)
+    assert bad.status_code == 422
+    empty = client.post("/tools/ping/batch", json={"targets": []}, headers=auth_headers)
+    assert empty.status_code == 400
+    missing = client.post("/tools/ping/batch", json={"group": "No such group"}, headers=auth_headers)
+    assert missing.status_code == 404
+
+
+def test_rate_budget_spaces_starts_across_callers():
+    budget = tools._RateBudget(50)
+
+    async def run():
+        started = time.monotonic()
+        await asyncio.gather(*(budget.acquire() for _ in range(6)))
+        return time.monotonic() - started
+
+    # Six starts at 50/s: the last one waits five intervals
+    assert 0.09 <= asyncio.run(run()) < 0.5
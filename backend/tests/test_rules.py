@@ -0,0 +1,191 @@
+from types import SimpleNamespace
+
+import database
+from events import HOST_UPDATED
+from rules import Rule, RuleEngine
+
+
+def _engine(rules, hosts=None):
+    sent = []
+    engine = RuleEngine(notify=lambda t, b: sent.append((t, b)))
+    engine.set_rules(rules)
+    for host_id, meta in (hosts or {1: {"name": "web-1", "group_name": "DC-1"}}).items():
+        meta.setdefault("latency_threshold_ms", None)
+        engine._hosts[host_id] = meta
+    return engine, sent
+
+
+def test_consecutive_failures_fires_once_and_resolves():
+    engine, sent = _engine([Rule(1, "3 failures", "consecutive_failures", threshold=3)])
+    for ts in range(5):
+        engine.observe(1, None, ts=ts)
+    assert [t for t, _ in sent] == ["⚠️ 3 failures: web-1"]
+
+    engine.observe(1, 10.0, ts=6)
+    assert sent[-1][0] == "✅ Resolved 3 failures: web-1"
+
+
+def test_loss_over_window_evicts_old_samples():
+    engine, sent = _engine([Rule(1, "Loss", "loss", threshold=20, window=60)])
+    for ts in range(0, 50, 10):
+        engine.observe(1, None if ts == 0 else 5.0, ts=ts)
+    # 1 of 5 lost = 20%, not above the limit
+    assert sent == []
+    engine.observe(1, None, ts=50)
+    assert sent[-1][0] == "⚠️ Loss: web-1"
+    assert "loss 33.3%" in sent[-1][1]
+
+    # Once the failures age out of the 60 s window the rule resolves
+    for ts in range(120, 180, 10):
+        engine.observe(1, 5.0, ts=ts)
+    assert sent[-1][0] == "✅ Resolved Loss: web-1"
+
+
+def test_p95_latency_rule():
+    engine, sent = _engine([Rule(1, "Slow", "latency_p95", threshold=100, window=600)])
+    for ts in range(19):
+        engine.observe(1, 20.0, ts=ts)
+    engine.observe(1, 500.0, ts=19)
+    # One slow sample in 20 is exactly the 95th percentile boundary — still fine
+    assert sent == []
+    engine.observe(1, 500.0, ts=20)
+    engine.observe(1, 500.0, ts=21)
+    assert sent[-1][0] == "⚠️ Slow: web-1"
+
+
+def test_p95_is_exact_rather_than_a_bucket_edge():
+    engine, sent = _engine([Rule(1, "Slow", "latency_p95", threshold=100, window=600)])
+    # p95 is 98 ms; the 1.2x bucket edge (102 ms) above it would report over the 100 ms limit
+    for ts, latency in enumerate(range(80, 100)):
+        engine.observe(1, float(latency), ts=ts)
+    assert sent == []
+    assert engine._states[(1, 1)].percentile(0.95) == 98.0
+
+    engine.observe(1, 101.0, ts=20)
+    engine.observe(1, 101.0, ts=21)
+    assert sent[-1][0] == "⚠️ Slow: web-1"
+
+
+def test_no_data_rule_fires_from_staleness_check():
+    engine, sent = _engine([Rule(1, "Silent", "no_data", window=300)])
+    engine.observe(1, 5.0, ts=1000)
+    engine.check_stale(now=1200)
+    assert sent == []
+    engine.check_stale(now=1400)
+    assert sent[-1][0] == "⚠️ Silent: web-1"
+    engine.check_stale(now=1500)
+    assert len(sent) == 1
+
+    engine.observe(1, 5.0, ts=1501)
+    assert sent[-1][0] == "✅ Resolved Silent: web-1"
+
+
+def test_no_data_for_a_deleted_host_never_fires(monkeypatch):
+    engine, sent = _engine([Rule(1, "Silent", "no_data", window=300)])
+    engine.observe(1, 5.0, ts=1000)
+    engine.forget_host(1)
+    monkeypatch.setattr(engine, "_host_meta", lambda host_id: None)
+    engine.check_stale(now=1400)
+    assert sent == []
+    assert (1, 1) not in engine._states
+
+
+def test_rules_scoped_by_group_and_host():
+    hosts = {
+        1: {"name": "web-1", "group_name": "DC-1"},
+        2: {"name": "web-2", "group_name": "DC-2"},
+    }
+    engine, sent = _engine(
+        [
+            Rule(1, "DC-1 down", "consecutive_failures", group_name="DC-1", threshold=1),
+            Rule(2, "web-2 down", "consecutive_failures", host_id=2, threshold=2),
+        ],
+        hosts,
+    )
+    engine.observe(1, None, ts=1)
+    engine.observe(2, None, ts=1)
+    assert [t for t, _ in sent] == ["⚠️ DC-1 down: web-1"]
+    engine.observe(2, None, ts=2)
+    assert sent[-1][0] == "⚠️ web-2 down: web-2"
+
+
+def test_latency_threshold_is_edge_triggered():
+    engine, sent = _engine(
+        [], {1: {"name": "web-1", "group_name": "DC-1", "latency_threshold_ms": 100}}
+    )
+    for ts in range(5):
+        engine.observe(1, 250.0, ts=ts)
+    assert [t for t, _ in sent] == ["⚠️ High Latency: web-1"]
+
+
+def test_suppressed_samples_update_state_without_notifying():
+    engine, sent = _engine([Rule(1, "Down", "consecutive_failures", threshold=1)])
+    engine.observe(1, None, ts=1, suppressed=True)
+    engine.observe(1, None, ts=2)
+    assert sent == []
+
+
+def test_metadata_cache_ignores_latency_only_updates():
+    engine, _ = _engine([Rule(1, "Down", "consecutive_failures", threshold=1)])
+    engine.on_event({"type": HOST_UPDATED, "host_id": 1, "average_latency": 12.5})
+    assert 1 in engine._hosts
+
+    engine.on_event({"type": HOST_UPDATED, "host_id": 1, "name": "web-1b", "group_name": "DC-1"})
+    assert 1 not in engine._hosts
+
+
+def test_probe_results_from_other_processes_are_not_evaluated():
+    from events import PROBE_RESULT, event_bus
+
+    engine, sent = _engine([Rule(1, "Down", "consecutive_failures", threshold=1)])
+    engine.on_event({"type": PROBE_RESULT, "host_id": 1, "latency": None, "origin": "peer"})
+    assert sent == []
+
+    engine.on_event(
+        {"type": PROBE_RESULT, "host_id": 1, "latency": None, "origin": event_bus.origin}
+    )
+    assert sent[-1][0] == "⚠️ Down: web-1"
+
+
+def test_metadata_query_runs_outside_the_lock(monkeypatch):
+    engine, sent = _engine([Rule(1, "Down", "consecutive_failures", threshold=1)], {})
+    held = []
+
+    class Session:
+        def query(self, *columns):
+            held.append(engine._lock.locked())
+            return self
+
+        def filter(self, *args):
+            return self
+
+        def first(self):
+            return SimpleNamespace(name="db-1", group_name=None, latency_threshold_ms=None)
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(database, "SessionLocal", Session)
+    engine.observe(7, None, ts=1)
+    assert held == [False]
+    assert sent[-1][0] == "⚠️ Down: db-1"
+
+
+def test_alert_rule_crud(client, auth_headers):
+    created = client.post(
+        "/alert-rules",
+        json={"name": "Loss", "rule_type": "loss", "threshold": 5, "window_seconds": 300},
+        headers=auth_headers,
+    )
+    assert created.status_code == 200
+    rule_id = created.json()["id"]
+
+    rules = client.get("/alert-rules", headers=auth_headers).json()
+    assert any(r["id"] == rule_id for r in rules)
+
+    bad = client.post(
+        "/alert-rules", json={"name": "x", "rule_type": "bogus"}, headers=auth_headers
+    )
+    assert bad.status_code == 422
+
+    assert client.delete(f"/alert-rules/{rule_id}", headers=auth_headers).status_code == 200
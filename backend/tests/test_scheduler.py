@@ -1,9 +1,12 @@
 from datetime import datetime, timedelta
 from unittest.mock import MagicMock, patch
 
-from scheduler import check_ssl_expiry
+import orjson
 
+from scheduler import check_ssl_expiry, is_burst, summarize_rtts
 
+
+@patch("scheduler.dnscache.cache.resolve", new=lambda host: "192.0.2.10")
 @patch("scheduler.datetime")
 @patch("scheduler.socket.create_connection")
 @patch("scheduler.ssl.create_default_context")
@@ -35,12 +38,14 @@ def test_check_ssl_expiry_valid_cert(
 
     # Verify
     assert days == 10
-    mock_create_connection.assert_called_once_with(("example.com", 443), timeout=5)
+    # Connects to the cached address; SNI still carries the hostname
+    mock_create_connection.assert_called_once_with(("192.0.2.10", 443), timeout=5)
     mock_context_instance.wrap_socket.assert_called_once_with(
         mock_sock, server_hostname="example.com"
     )
 
 
+@patch("scheduler.dnscache.cache.resolve", new=lambda host: "192.0.2.10")
 @patch("scheduler.datetime")
 @patch("scheduler.socket.create_connection")
 @patch("scheduler.ssl.create_default_context")
@@ -73,6 +78,7 @@ def test_check_ssl_expiry_expired_cert(
     assert days == -5
 
 
+@patch("scheduler.dnscache.cache.resolve", new=lambda host: "192.0.2.10")
 @patch("scheduler.socket.create_connection")
 def test_check_ssl_expiry_connection_error(mock_create_connection):
     mock_create_connection.side_effect = TimeoutError("Connection timed out")
@@ -84,6 +90,7 @@ def test_check_ssl_expiry_connection_error(mock_create_connection):
     assert days is None
 
 
+@patch("scheduler.dnscache.cache.resolve", new=lambda host: "192.0.2.10")
 @patch("scheduler.socket.create_connection")
 @patch("scheduler.ssl.create_default_context")
 def test_check_ssl_expiry_cert_parse_error(mock_ssl_context, mock_create_connection):
@@ -103,3 +110,110 @@ def test_check_ssl_expiry_cert_parse_error(mock_ssl_context, mock_create_connect
 
     # Verify
     assert days is None
+
+
+def test_summarize_rtts_counts_loss_and_jitter():
+    stats = summarize_rtts([10.0, None, 14.0, 12.0])
+    assert (stats["sent"], stats["received"]) == (4, 3)
+    assert stats["latency"] == 12.0
+    assert (stats["latency_min"], stats["latency_max"]) == (10.0, 14.0)
+    assert stats["latency_stddev"] == 1.633
+    # |14 - 10| and |12 - 14| over the replies, lost packets skipped
+    assert stats["jitter"] == 3.0
+
+    lost = summarize_rtts([None, None])
+    assert (lost["sent"], lost["received"], lost["latency"], lost["jitter"]) == (2, 0, None, None)
+
+    assert is_burst("icmp", None, 5) and is_burst(None, None, 2)
+    assert not is_burst("icmp", None, 1) and not is_burst("http", 80, 5)
+    assert not is_burst("tcp", None, 5)
+
+
+def test_multi_packet_probe_is_stored_with_loss(client, auth_headers, db_session, monkeypatch):
+    import database
+    import scheduler
+    from models import DailyUptimeDB, PingResultDB
+
+    monkeypatch.setattr(scheduler, "SessionLocal", database.SessionLocal)
+    host = client.post(
+        "/hosts/",
+        json={"name": "Burst target", "ip_address": "198.51.100.46", "probe_count": 4},
+        headers=auth_headers,
+    ).json()
+    assert host["probe_count"] == 4
+    bursts = [[1.0, None, 3.0, None], [None] * 4]
+    monkeypatch.setattr(scheduler.icmp, "burst", lambda address, count, *args: bursts.pop(0))
+
+    for _ in range(2):
+        scheduler.ping_host(host["id"], host["ip_address"], host["name"], probe_count=4)
+
+    rows = db_session.query(PingResultDB).filter_by(host_id=host["id"]).order_by(PingResultDB.id).all()
+    assert [(r.latency, r.sent, r.received) for r in rows] == [(2.0, 4, 2), (None, 4, 0)]
+    assert (rows[0].latency_min, rows[0].latency_max, rows[0].jitter) == (1.0, 3.0, 2.0)
+    day = db_session.query(DailyUptimeDB).filter_by(host_id=host["id"]).one()
+    assert (day.total, day.up, day.packets_sent, day.packets_received) == (2, 1, 8, 2)
+
+    metrics = client.get(f"/metrics/{host['id']}", headers=auth_headers).json()
+    assert [d["loss"] for d in metrics["data"]] == [50.0, 100.0]
+    assert metrics["loss"] == 75.0 and metrics["uptime"] == 50.0
+    columnar = orjson.loads(
+        client.get(f"/metrics/{host['id']}?format=columnar", headers=auth_headers).content
+    )
+    assert columnar["l"] == [50.0, 100.0] and columnar["j"] == [2.0, None]
+    history = client.get(f"/uptime/{host['id']}", headers=auth_headers).json()
+    assert history[-1]["loss"] == 75.0
+
+
+def test_edited_probe_settings_reach_the_scheduled_job(client, db_session, monkeypatch):
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    import database
+    import scheduler
+    from models import HostDB
+
+    monkeypatch.setattr(scheduler, "SessionLocal", database.SessionLocal)
+    monkeypatch.setattr(scheduler, "scheduler", BackgroundScheduler())
+    host = HostDB(name="Edited", ip_address="198.51.100.44", monitor_type="tcp", port=22)
+    db_session.add(host)
+    db_session.commit()
+    try:
+        scheduler.update_jobs()
+        host.port = 2222
+        db_session.commit()
+        scheduler.update_jobs()
+        assert scheduler.scheduler.get_job(f"ping_{host.id}").args[3] == 2222
+    finally:
+        db_session.delete(host)
+        db_session.commit()
+
+
+def test_probe_reads_the_host_row_once(client, db_session, monkeypatch):
+    from sqlalchemy import event
+
+    import database
+    import scheduler
+    from models import HostDB
+
+    monkeypatch.setattr(scheduler, "SessionLocal", database.SessionLocal)
+    host = HostDB(name="One read", ip_address="198.51.100.47", last_status="UP")
+    db_session.add(host)
+    db_session.commit()
+    host_id = host.id
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", record)
+    try:
+        with patch("scheduler.ping", return_value=-1.0), patch("alerts.aggregator.add") as alert:
+            scheduler.ping_host(host_id, "198.51.100.47", "One read")
+    finally:
+        event.remove(database.engine, "before_cursor_execute", record)
+
+    # Full HostDB rows; the rule engine's metadata lookup selects only a few columns
+    host_reads = [s for s in statements if "hosts.ip_address" in s and "WHERE hosts.id" in s]
+    assert len(host_reads) == 1
+    assert alert.call_args.args[3] == "DOWN"
+    db_session.expire_all()
+    assert db_session.get(HostDB, host_id).last_status == "DOWN"
@@ -0,0 +1,106 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from throughput import ThroughputTest, _jitter
+
+
+class _SpeedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        size = int(parse_qs(url.query).get("bytes", ["0"])[0])
+        self.send_response(200)
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        block = bytes(64 * 1024)
+        try:
+            while size > 0:
+                chunk = block[: min(size, len(block))]
+                self.wfile.write(chunk)
+                size -= len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_POST(self):
+        # Chunked upload bodies: read until the terminating zero-length chunk
+        while True:
+            size = int(self.rfile.readline().strip() or b"0", 16)
+            self.rfile.read(size + 2)
+            if size == 0:
+                break
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@pytest.fixture
+def speed_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SpeedHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_multi_stream_run_against_local_server(speed_server):
+    result = ThroughputTest(
+        download_url=f"{speed_server}/down?bytes={{bytes}}",
+        upload_url=f"{speed_server}/up",
+        latency_url=f"{speed_server}/down?bytes=0",
+        streams=3,
+        duration=0.5,
+        request_bytes=2_000_000,
+    ).run()
+
+    assert result["server"] == "127.0.0.1"
+    assert len(result["download_streams"]) == len(result["upload_streams"]) == 3
+    assert all(mbps > 0 for mbps in result["download_streams"])
+    assert result["download"] > 0
+    assert result["upload"] > 0
+    assert result["ping"] > 0
+    assert result["download_latency"] is not None
+
+
+def test_unreachable_target_raises():
+    test = ThroughputTest(latency_url="http://127.0.0.1:9/", duration=0.1)
+    with pytest.raises(RuntimeError):
+        test.run()
+
+
+def test_jitter():
+    assert _jitter([10.0]) == 0.0
+    assert _jitter([10.0, 12.0, 11.0]) == 1.5
+
+
+def test_self_hosted_endpoint(client, monkeypatch):
+    from routers import tools
+
+    assert client.get("/speedtest/endpoint/ping").status_code == 404
+
+    monkeypatch.setattr(tools, "SPEEDTEST_SERVER_ENABLED", True)
+    assert client.get("/speedtest/endpoint/ping").status_code == 204
+    response = client.get("/speedtest/endpoint/download", params={"bytes": 100_000})
+    assert len(response.content) == 100_000
+    assert client.get("/speedtest/endpoint/download", params={"bytes": 10**12}).status_code == 422
+    response = client.post("/speedtest/endpoint/upload", content=b"x" * 50_000)
+    assert response.json() == {"received": 50_000}
+
+
+def test_manual_run_starts_without_the_scheduler(client, auth_headers, monkeypatch):
+    import scheduler
+
+    ran = threading.Event()
+    monkeypatch.setattr(scheduler, "_run_speedtest_sync", ran.set)
+    # As in a process that isn't the leader: a scheduler that was never started
+    monkeypatch.setattr(scheduler, "scheduler", scheduler._new_scheduler())
+    assert client.post("/speedtest/run", headers=auth_headers).status_code == 200
+    assert ran.wait(timeout=5)
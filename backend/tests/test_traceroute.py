@@ -0,0 +1,178 @@
+import struct
+from datetime import datetime, timedelta
+
+import icmp
+import traceroute
+from events import ROUTE_CHANGED, event_bus
+
+
+def _ip_header(src: bytes = b"\xc0\x00\x02\x01") -> bytes:
+    return struct.pack("!BBHHHBBH4s4s", 0x45, 0, 0, 0, 0, 64, 1, 0, src, b"\0" * 4)
+
+
+def test_parse_response_matches_replies_and_quoted_probes():
+    probe = icmp.echo_request(0xBEEF, 1 << 8 | 5)
+
+    reply = _ip_header() + b"\x00" + probe[1:]
+    assert traceroute.parse_response(reply) == (icmp.ECHO_REPLY, 0xBEEF, 0x105)
+
+    # Time exceeded quotes the expired packet: its IP header and first 8 ICMP bytes
+    exceeded = _ip_header() + struct.pack("!BBHI", 11, 0, 0, 0) + _ip_header() + probe[:8]
+    assert traceroute.parse_response(exceeded) == (icmp.TIME_EXCEEDED, 0xBEEF, 0x105)
+
+    other = _ip_header() + struct.pack("!BBHI", 5, 0, 0, 0)  # redirect
+    assert traceroute.parse_response(other) is None
+
+
+def test_route_changed_ignores_silent_hops():
+    assert not traceroute.route_changed(["a", None, "c"], ["a", "b", "c"])
+    assert traceroute.route_changed(["a", "b", "c"], ["a", "x", "c"])
+    assert traceroute.route_changed(["a", "c"], ["a", "b", "c"])
+
+
+def test_route_changed_compares_incomplete_traces_as_a_prefix():
+    # The second trace stopped at hop 2; hops it never got to aren't a change
+    assert not traceroute.route_changed(["a", "b", "c"], ["a", "b"], complete=False)
+    assert traceroute.route_changed(["a", "b", "c"], ["a", "x"], complete=False)
+
+
+def test_route_is_remembered_only_after_commit(client, db_session):
+    from models import HostDB
+
+    host = HostDB(name="Trace cache", ip_address="192.0.2.47", monitor_type="traceroute")
+    db_session.add(host)
+    db_session.commit()
+    host_id = host.id
+
+    first = traceroute.record(db_session, host_id, _hops("10.0.0.1", "192.0.2.47"))
+    db_session.rollback()
+    traceroute.publish_change(None, "Trace cache")
+    assert host_id not in traceroute._routes
+
+    db_session.commit()
+    traceroute.publish_change(first, "Trace cache")
+    assert traceroute._routes[host_id] == (["10.0.0.1", "192.0.2.47"], True)
+
+    # A trace cut short after hop 1 neither reroutes nor forgets the rest of the path
+    short = _hops("10.0.0.1", None)
+    short[-1]["reached"] = False
+    result = traceroute.record(db_session, host_id, short)
+    db_session.commit()
+    traceroute.publish_change(result, "Trace cache")
+    assert not result["changed"]
+    assert traceroute._routes[host_id] == (["10.0.0.1", "192.0.2.47"], True)
+
+
+def _hops(*addresses, lost=0):
+    hops = []
+    for ttl, address in enumerate(addresses, start=1):
+        received = 3 - lost if ttl == 2 else 3
+        hops.append(
+            {
+                "ttl": ttl,
+                "address": address,
+                "sent": 3,
+                "received": received,
+                "avg": 10.0 * ttl,
+                "min": 10.0 * ttl - 1,
+                "max": 10.0 * ttl + 1,
+                "reached": ttl == len(addresses),
+            }
+        )
+    return hops
+
+
+def test_traceroute_monitor_stores_hops_and_route_changes(
+    client, auth_headers, db_session, monkeypatch
+):
+    import database
+    import scheduler
+    from models import HostDB, PingResultDB, RouteChangeDB, TraceHopDB
+
+    monkeypatch.setattr(scheduler, "SessionLocal", database.SessionLocal)
+    host = client.post(
+        "/hosts/",
+        json={"name": "Trace target", "ip_address": "192.0.2.45", "monitor_type": "traceroute"},
+        headers=auth_headers,
+    ).json()
+
+    traces = [
+        _hops("10.0.0.1", "198.51.100.1", "192.0.2.45"),
+        _hops("10.0.0.1", None, "192.0.2.45", lost=3),
+        _hops("10.0.0.1", "198.51.100.9", "192.0.2.45", lost=1),
+    ]
+    monkeypatch.setattr(scheduler.traceroute, "trace", lambda target: traces.pop(0))
+    received = []
+    event_bus.add_listener(received.append, {ROUTE_CHANGED})
+    try:
+        for _ in range(3):
+            scheduler.ping_host(host["id"], host["ip_address"], host["name"], monitor_type="traceroute")
+    finally:
+        event_bus.remove_listener(received.append)
+
+    assert db_session.query(TraceHopDB).filter(TraceHopDB.host_id == host["id"]).count() == 9
+    latencies = [r.latency for r in db_session.query(PingResultDB).filter_by(host_id=host["id"])]
+    assert latencies == [30.0, 30.0, 30.0]
+    assert db_session.get(HostDB, host["id"]).last_status == "UP"
+    # Only the third trace rerouted: a silent hop isn't a change
+    changes = db_session.query(RouteChangeDB).filter_by(host_id=host["id"]).all()
+    assert len(changes) == 1
+    assert [e["current"] for e in received] == [["10.0.0.1", "198.51.100.9", "192.0.2.45"]]
+    assert received[0]["previous"] == ["10.0.0.1", "198.51.100.1", "192.0.2.45"]
+
+    history = client.get(f"/traceroute/{host['id']}", params={"range": "-24h"}, headers=auth_headers)
+    hops = history.json()["hops"]
+    assert [(h["ttl"], h["address"]) for h in hops] == [
+        (1, "10.0.0.1"),
+        (2, "198.51.100.9"),
+        (3, "192.0.2.45"),
+    ]
+    # All three traces land in one bucket: 4 of 9 packets to hop 2 were lost
+    assert hops[1]["loss"] == [44.4]
+    assert hops[1]["avg"] == [20.0]
+    assert (hops[1]["min"], hops[1]["max"]) == ([19.0], [21.0])
+    assert len(history.json()["route_changes"]) == 1
+
+    # Hop samples age out with the raw pings
+    db_session.query(TraceHopDB).filter_by(host_id=host["id"]).update(
+        {"timestamp": datetime.utcnow() - timedelta(days=31)}
+    )
+    db_session.commit()
+    scheduler.cleanup_old_data()
+    assert db_session.query(TraceHopDB).filter_by(host_id=host["id"]).count() == 0
+    assert db_session.query(RouteChangeDB).filter_by(host_id=host["id"]).count() == 1
+
+
+def test_failed_trace_marks_host_down(client, auth_headers, db_session, monkeypatch):
+    import database
+    import scheduler
+    from models import HostDB
+
+    monkeypatch.setattr(scheduler, "SessionLocal", database.SessionLocal)
+    host = client.post(
+        "/hosts/",
+        json={"name": "Trace denied", "ip_address": "192.0.2.46", "monitor_type": "traceroute"},
+        headers=auth_headers,
+    ).json()
+
+    def denied(target):
+        raise PermissionError("raw sockets need CAP_NET_RAW")
+
+    monkeypatch.setattr(scheduler.traceroute, "trace", denied)
+    scheduler.ping_host(host["id"], host["ip_address"], host["name"], monitor_type="traceroute")
+    db_session.expire_all()
+    assert db_session.get(HostDB, host["id"]).last_status == "DOWN"
+
+
+def test_traceroute_tool(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(traceroute, "trace", lambda target: _hops("10.0.0.1", "192.0.2.9"))
+    response = client.post("/tools/traceroute", json={"target": "192.0.2.9"}, headers=auth_headers)
+    assert response.json()["reached"] is True
+    assert [h["address"] for h in response.json()["hops"]] == ["10.0.0.1", "192.0.2.9"]
+
+    def denied(target):
+        raise PermissionError()
+
+    monkeypatch.setattr(traceroute, "trace", denied)
+    response = client.post("/tools/traceroute", json={"target": "192.0.2.9"}, headers=auth_headers)
+    assert response.status_code == 503
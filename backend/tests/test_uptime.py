@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+
+import models
+import uptime
+
+
+def _rows(db, host_id):
+    return {
+        r.day: r
+        for r in db.query(models.DailyUptimeDB).filter(models.DailyUptimeDB.host_id == host_id)
+    }
+
+
+def test_record_sample_is_time_weighted(client, db_session):
+    host_id = 9001
+    t0 = datetime(2024, 3, 1, 10, 0, 0)
+    uptime.record_sample(db_session, host_id, True, t0)
+    uptime.record_sample(db_session, host_id, False, t0 + timedelta(minutes=30))
+    uptime.record_sample(db_session, host_id, True, t0 + timedelta(minutes=40))
+    db_session.commit()
+
+    row = _rows(db_session, host_id)["2024-03-01"]
+    assert row.total == 3
+    assert row.up == 2
+    assert row.up_seconds == 1800
+    assert row.down_seconds == 600
+    assert uptime.uptime_percent(row) == 75.0
+
+
+def test_record_sample_splits_interval_at_midnight(client, db_session):
+    host_id = 9002
+    uptime.record_sample(db_session, host_id, False, datetime(2024, 3, 1, 23, 50))
+    uptime.record_sample(db_session, host_id, True, datetime(2024, 3, 2, 0, 10))
+    db_session.commit()
+
+    rows = _rows(db_session, host_id)
+    assert rows["2024-03-01"].down_seconds == 600
+    assert rows["2024-03-02"].down_seconds == 600
+    assert rows["2024-03-02"].total == 1
+
+
+def test_record_sample_caps_long_gaps(client, db_session):
+    host_id = 9003
+    t0 = datetime(2024, 3, 1, 0, 0)
+    uptime.record_sample(db_session, host_id, True, t0)
+    uptime.record_sample(db_session, host_id, True, t0 + timedelta(hours=5))
+    db_session.commit()
+
+    row = _rows(db_session, host_id)["2024-03-01"]
+    assert row.up_seconds == uptime.MAX_SAMPLE_GAP.total_seconds()
+
+
+def test_uptime_endpoint_reads_rollup(client, auth_headers, db_session):
+    host_id = 9004
+    today = datetime.utcnow()
+    old_day = (today - timedelta(days=200)).strftime("%Y-%m-%d")
+    db_session.add_all(
+        [
+            models.DailyUptimeDB(
+                host_id=host_id, day=old_day, total=10, up=5, up_seconds=0.0, down_seconds=0.0
+            ),
+            models.DailyUptimeDB(
+                host_id=host_id,
+                day=today.strftime("%Y-%m-%d"),
+                total=4,
+                up=1,
+                up_seconds=900.0,
+                down_seconds=100.0,
+            ),
+        ]
+    )
+    db_session.commit()
+
+    recent = client.get(f"/uptime/{host_id}", headers=auth_headers).json()
+    assert len(recent) == 1
+    assert recent[0]["uptime"] == 90.0
+    assert recent[0]["total"] == 4
+
+    year = client.get(f"/uptime/{host_id}?range=-1y", headers=auth_headers).json()
+    assert [d["date"] for d in year][0] == old_day
+    assert year[0]["uptime"] == 50.0
+
+
+def test_record_sample_excludes_maintenance(client, db_session):
+    host_id = 9005
+    t0 = datetime(2024, 3, 1, 10, 0, 0)
+    uptime.record_sample(db_session, host_id, True, t0)
+    # Host goes down inside a maintenance window, then comes back after it
+    uptime.record_sample(db_session, host_id, False, t0 + timedelta(minutes=10), in_maintenance=True)
+    uptime.record_sample(db_session, host_id, False, t0 + timedelta(minutes=50), in_maintenance=True)
+    uptime.record_sample(db_session, host_id, True, t0 + timedelta(minutes=60))
+    db_session.commit()
+
+    row = _rows(db_session, host_id)["2024-03-01"]
+    assert row.total == 2
+    assert row.up == 2
+    assert row.up_seconds == 600
+    assert row.down_seconds == 0
+    assert uptime.uptime_percent(row) == 100.0
+
+
+def test_day_row_created_by_another_writer_is_reused(client, db_session, monkeypatch):
+    import database
+
+    host_id = 9007
+    other = database.SessionLocal()
+    other.add(models.DailyUptimeDB(host_id=host_id, day="2024-03-05", total=4, up=4))
+    other.commit()
+    other.close()
+
+    # This writer looked the day up just before the other one committed its row
+    find = uptime._find
+    calls = []
+
+    def stale_find(*args):
+        calls.append(args)
+        return None if len(calls) == 1 else find(*args)
+
+    monkeypatch.setattr(uptime, "_find", stale_find)
+    uptime.record_sample(db_session, host_id, True, datetime(2024, 3, 5, 12, 0))
+    db_session.commit()
+
+    row = _rows(db_session, host_id)["2024-03-05"]
+    assert (row.total, row.up) == (5, 5)
+    assert len(calls) == 2
+
+
+def test_backfill_runs_at_process_init(client, monkeypatch):
+    from unittest.mock import MagicMock
+
+    import worker
+
+    # Not from start_services: by then the heartbeat flusher may have written a sample
+    backfill = MagicMock()
+    monkeypatch.setattr(uptime, "backfill_daily_uptime", backfill)
+    worker.init_process()
+    backfill.assert_called_once()
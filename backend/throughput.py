@@ -0,0 +1,175 @@
+import logging
+import os
+import statistics
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# HTTP targets for the built-in speed test. "{bytes}" in the download URL is replaced with
+# the requested payload size. Any server implementing the same three calls works, e.g.
+# another NetworkMonitor backend (".../speedtest/endpoint/download?bytes={bytes}").
+SPEEDTEST_DOWNLOAD_URL = os.getenv(
+    "SPEEDTEST_DOWNLOAD_URL", "https://speed.cloudflare.com/__down?bytes={bytes}"
+)
+SPEEDTEST_UPLOAD_URL = os.getenv("SPEEDTEST_UPLOAD_URL", "https://speed.cloudflare.com/__up")
+SPEEDTEST_LATENCY_URL = os.getenv(
+    "SPEEDTEST_LATENCY_URL", "https://speed.cloudflare.com/__down?bytes=0"
+)
+SPEEDTEST_STREAMS = int(os.getenv("SPEEDTEST_STREAMS", "4"))
+# Seconds spent on each of the download and upload phases
+SPEEDTEST_DURATION = float(os.getenv("SPEEDTEST_DURATION", "10"))
+
+# Bytes requested per download request / sent per upload request; streams loop until time is up
+REQUEST_BYTES = 25_000_000
+CHUNK_BYTES = 64 * 1024
+IDLE_LATENCY_SAMPLES = 8
+# Interval between latency probes while a phase is saturating the link
+LOADED_LATENCY_INTERVAL = 0.25
+REQUEST_TIMEOUT = 10
+
+
+def _mbps(nbytes: int, seconds: float) -> float:
+    return nbytes * 8 / seconds / 1_000_000 if seconds > 0 else 0.0
+
+
+def _jitter(samples: list[float]) -> float:
+    """Mean absolute difference between consecutive latency samples."""
+    if len(samples) < 2:
+        return 0.0
+    return statistics.fmean(abs(b - a) for a, b in zip(samples, samples[1:]))
+
+
+class ThroughputTest:
+    """
+    Multi-stream HTTP throughput test. Each phase runs `streams` parallel connections for
+    `duration` seconds while a separate connection samples latency under load.
+    """
+
+    def __init__(
+        self,
+        download_url: str = SPEEDTEST_DOWNLOAD_URL,
+        upload_url: str = SPEEDTEST_UPLOAD_URL,
+        latency_url: str = SPEEDTEST_LATENCY_URL,
+        streams: int = SPEEDTEST_STREAMS,
+        duration: float = SPEEDTEST_DURATION,
+        request_bytes: int = REQUEST_BYTES,
+    ):
+        self.download_url = download_url
+        self.upload_url = upload_url
+        self.latency_url = latency_url
+        self.streams = max(1, streams)
+        self.duration = duration
+        self.request_bytes = request_bytes
+
+    # --- latency -------------------------------------------------------
+
+    def _latency_sample(self, session: requests.Session) -> float | None:
+        try:
+            start = time.perf_counter()
+            response = session.get(self.latency_url, timeout=REQUEST_TIMEOUT)
+            elapsed = (time.perf_counter() - start) * 1000
+            response.close()
+            return elapsed if response.ok else None
+        except requests.RequestException:
+            return None
+
+    def idle_latency(self) -> list[float]:
+        with requests.Session() as session:
+            # The first request pays for the TCP/TLS handshake
+            self._latency_sample(session)
+            samples = [self._latency_sample(session) for _ in range(IDLE_LATENCY_SAMPLES)]
+        return [s for s in samples if s is not None]
+
+    def _sample_under_load(self, stop: threading.Event, out: list[float]):
+        with requests.Session() as session:
+            self._latency_sample(session)
+            while not stop.is_set():
+                sample = self._latency_sample(session)
+                if sample is not None:
+                    out.append(sample)
+                stop.wait(LOADED_LATENCY_INTERVAL)
+
+    # --- streams -------------------------------------------------------
+
+    def _download_stream(self, deadline: float, counts: list[int], index: int):
+        url = self.download_url.replace("{bytes}", str(self.request_bytes))
+        with requests.Session() as session:
+            while time.perf_counter() < deadline:
+                with session.get(url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(CHUNK_BYTES):
+                        counts[index] += len(chunk)
+                        if time.perf_counter() >= deadline:
+                            return
+
+    def _upload_stream(self, deadline: float, counts: list[int], index: int):
+        block = b"\0" * CHUNK_BYTES
+
+        def body():
+            sent = 0
+            while sent < self.request_bytes and time.perf_counter() < deadline:
+                yield block
+                sent += len(block)
+                counts[index] += len(block)
+
+        with requests.Session() as session:
+            while time.perf_counter() < deadline:
+                session.post(self.upload_url, data=body(), timeout=REQUEST_TIMEOUT).close()
+
+    def _phase(self, stream) -> dict:
+        counts = [0] * self.streams
+        errors = []
+        loaded = []
+        stop = threading.Event()
+
+        def run(index):
+            try:
+                stream(deadline, counts, index)
+            except Exception as e:
+                errors.append(e)
+
+        sampler = threading.Thread(target=self._sample_under_load, args=(stop, loaded))
+        start = time.perf_counter()
+        deadline = start + self.duration
+        workers = [threading.Thread(target=run, args=(i,)) for i in range(self.streams)]
+        sampler.start()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        sampler.join()
+
+        if not any(counts) and errors:
+            raise errors[0]
+        return {
+            "mbps": _mbps(sum(counts), elapsed),
+            "streams": [round(_mbps(c, elapsed), 2) for c in counts],
+            "bytes": sum(counts),
+            "latency_ms": statistics.median(loaded) if loaded else None,
+            "errors": len(errors),
+        }
+
+    def run(self) -> dict:
+        idle = self.idle_latency()
+        if not idle:
+            raise RuntimeError(f"Speed test target unreachable: {self.latency_url}")
+        download = self._phase(self._download_stream)
+        upload = self._phase(self._upload_stream)
+        ping = statistics.median(idle)
+        return {
+            "server": urlparse(self.download_url).hostname,
+            "ping": ping,
+            "jitter": _jitter(idle),
+            "download": download["mbps"],
+            "upload": upload["mbps"],
+            "download_latency": download["latency_ms"],
+            "upload_latency": upload["latency_ms"],
+            "download_streams": download["streams"],
+            "upload_streams": upload["streams"],
+        }
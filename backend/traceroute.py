@@ -0,0 +1,248 @@
+import json
+import logging
+import os
+import random
+import select
+import socket
+import struct
+import time
+from datetime import datetime
+
+from sqlalchemy import func
+
+import dnscache
+import icmp
+from events import ROUTE_CHANGED, event_bus
+from models import RouteChangeDB, TraceHopDB
+
+logger = logging.getLogger(__name__)
+
+TRACEROUTE_MAX_HOPS = int(os.getenv("TRACEROUTE_MAX_HOPS", "30"))
+# Probes per TTL in one trace; loss per hop is measured over these
+TRACEROUTE_ROUNDS = int(os.getenv("TRACEROUTE_ROUNDS", "3"))
+TRACEROUTE_TIMEOUT = float(os.getenv("TRACEROUTE_TIMEOUT", "2.0"))
+# Gap between rounds, so one rate-limited router doesn't drop a whole round at once
+ROUND_INTERVAL = 0.1
+
+# Last known path per host and whether it reached the destination, with silent hops
+# filled in from earlier traces. Updated only after the trace's rows are committed.
+_routes: dict[int, tuple[list[str | None], bool]] = {}
+
+
+def parse_response(packet: bytes) -> tuple[int, int, int] | None:
+    """
+    (ICMP type, identifier, sequence) of the probe a raw-socket packet answers: the echo
+    itself for replies, or the original echo quoted inside time-exceeded/unreachable errors.
+    """
+    offset = (packet[0] & 0x0F) * 4
+    if len(packet) < offset + 8:
+        return None
+    icmp_type = packet[offset]
+    if icmp_type == icmp.ECHO_REPLY:
+        ident, seq = struct.unpack("!HH", packet[offset + 4 : offset + 8])
+        return icmp_type, ident, seq
+    if icmp_type in (icmp.TIME_EXCEEDED, icmp.UNREACHABLE):
+        inner = offset + 8
+        if len(packet) < inner + 1:
+            return None
+        inner_icmp = inner + (packet[inner] & 0x0F) * 4
+        if len(packet) < inner_icmp + 8 or packet[inner_icmp] != icmp.ECHO_REQUEST:
+            return None
+        ident, seq = struct.unpack("!HH", packet[inner_icmp + 4 : inner_icmp + 8])
+        return icmp_type, ident, seq
+    return None
+
+
+def resolve_ipv4(target: str) -> str:
+    for address in dnscache.cache.resolve_all(target):
+        if ":" not in address:
+            return address
+    raise ValueError(f"{target} has no IPv4 address to trace")
+
+
+def trace(
+    target: str,
+    max_hops: int = TRACEROUTE_MAX_HOPS,
+    rounds: int = TRACEROUTE_ROUNDS,
+    timeout: float = TRACEROUTE_TIMEOUT,
+) -> list[dict]:
+    """
+    MTR-style trace: each round sends an echo request for every TTL at once, instead of
+    waiting hop by hop, so a trace takes about `timeout` however long the path is.
+    Returns one dict per TTL up to the destination: address (None if silent), sent,
+    received, avg/min/max in ms and `reached` on the destination's hop.
+    Needs a raw ICMP socket (root or CAP_NET_RAW); raises PermissionError otherwise.
+    """
+    destination = resolve_ipv4(target)
+    ident = random.randrange(1, 0xFFFF)
+    sent_at: dict[int, float] = {}
+    responses: dict[int, list] = {ttl: [] for ttl in range(1, max_hops + 1)}
+    responders: dict[int, str] = {}
+    reached_at = None
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+    try:
+        for round_no in range(rounds):
+            for ttl in range(1, max_hops + 1):
+                # Don't probe past the destination once a previous round found it
+                if reached_at is not None and ttl > reached_at:
+                    break
+                seq = round_no << 8 | ttl
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+                sock.sendto(icmp.echo_request(ident, seq, b"netmon-trace"), (destination, 0))
+                sent_at[seq] = time.monotonic()
+            deadline = time.monotonic() + (timeout if round_no == rounds - 1 else ROUND_INTERVAL)
+            while (remaining := deadline - time.monotonic()) > 0:
+                readable, _, _ = select.select([sock], [], [], remaining)
+                if not readable:
+                    break
+                packet, (address, _) = sock.recvfrom(1024)
+                received_at = time.monotonic()
+                parsed = parse_response(packet)
+                # Every raw ICMP socket sees all ICMP traffic; keep only answers to our probes
+                if parsed is None or parsed[1] != ident or parsed[2] not in sent_at:
+                    continue
+                icmp_type, _, seq = parsed
+                ttl = seq & 0xFF
+                responses[ttl].append((received_at - sent_at.pop(seq)) * 1000)
+                responders.setdefault(ttl, address)
+                if icmp_type != icmp.TIME_EXCEEDED and (reached_at is None or ttl < reached_at):
+                    reached_at = ttl
+                if round_no == rounds - 1 and reached_at is not None:
+                    # Done once every hop up to the destination has answered or been given up on
+                    if not any(s & 0xFF <= reached_at for s in sent_at):
+                        break
+    finally:
+        sock.close()
+
+    last = reached_at or max((ttl for ttl in responders), default=0)
+    hops = []
+    for ttl in range(1, last + 1):
+        rtts = responses[ttl]
+        hops.append(
+            {
+                "ttl": ttl,
+                "address": responders.get(ttl),
+                "sent": rounds,
+                "received": len(rtts),
+                "avg": round(sum(rtts) / len(rtts), 2) if rtts else None,
+                "min": round(min(rtts), 2) if rtts else None,
+                "max": round(max(rtts), 2) if rtts else None,
+                "reached": ttl == reached_at,
+            }
+        )
+    return hops
+
+
+def destination_latency(hops: list[dict]) -> float:
+    """Average RTT to the destination, or -1 when the trace didn't reach it (probe convention)."""
+    if hops and hops[-1]["reached"] and hops[-1]["avg"] is not None:
+        return hops[-1]["avg"]
+    return -1.0
+
+
+def _route(hops) -> list[str | None]:
+    return [hop["address"] for hop in hops]
+
+
+def route_changed(
+    previous: list[str | None], current: list[str | None], complete: bool = True
+) -> bool:
+    """
+    Compares two paths hop by hop. Silent hops match anything, so a dropped reply isn't a
+    reroute. Unless both traces reached the destination (`complete`), only the hops both
+    got to are compared: a trace cut short is not a shorter path.
+    """
+    if not complete:
+        common = min(len(previous), len(current))
+        previous, current = previous[:common], current[:common]
+    elif len(previous) != len(current):
+        return True
+    return any(a is not None and b is not None and a != b for a, b in zip(previous, current))
+
+
+def last_route(db, host_id: int) -> list[str | None] | None:
+    latest = db.query(func.max(TraceHopDB.timestamp)).filter(TraceHopDB.host_id == host_id).scalar()
+    if latest is None:
+        return None
+    rows = (
+        db.query(TraceHopDB.address)
+        .filter(TraceHopDB.host_id == host_id, TraceHopDB.timestamp == latest)
+        .order_by(TraceHopDB.ttl)
+        .all()
+    )
+    return [row.address for row in rows]
+
+
+def record(db, host_id: int, hops: list[dict], timestamp: datetime | None = None) -> dict | None:
+    """
+    Adds one trace's hop rows and, if the path differs from the previous trace, a
+    route_changes row. Caller commits, then passes the result to publish_change().
+    """
+    timestamp = timestamp or datetime.utcnow()
+    cached = _routes.get(host_id)
+    if cached is not None:
+        previous, previous_reached = cached
+    else:
+        # Stored hops don't say whether the trace got through; compare them as a prefix
+        previous, previous_reached = last_route(db, host_id), False
+    db.add_all(
+        TraceHopDB(
+            host_id=host_id,
+            timestamp=timestamp,
+            ttl=hop["ttl"],
+            address=hop["address"],
+            sent=hop["sent"],
+            received=hop["received"],
+            latency=hop["avg"],
+            latency_min=hop["min"],
+            latency_max=hop["max"],
+        )
+        for hop in hops
+    )
+    if not hops:
+        return None
+    current = _route(hops)
+    reached = bool(hops[-1]["reached"])
+    complete = reached and previous_reached
+    result = {"host_id": host_id, "route": current, "reached": reached, "changed": False}
+    if previous is None:
+        return result
+    if len(previous) == len(current) or not complete:
+        # A hop that skipped this trace is assumed to still be where it was
+        filled = [c if c is not None else p for c, p in zip(current, previous)]
+        current = filled + current[len(filled) :]
+        result["route"] = current
+    if not route_changed(previous, current, complete):
+        if not reached and len(previous) >= len(current):
+            # Cut short on an unchanged path: keep what the earlier trace saw beyond it
+            result["route"] = current + previous[len(current) :]
+            result["reached"] = previous_reached
+        return result
+    db.add(
+        RouteChangeDB(
+            host_id=host_id,
+            timestamp=timestamp,
+            previous=json.dumps(previous),
+            current=json.dumps(current),
+        )
+    )
+    result.update(changed=True, previous=previous, current=current)
+    return result
+
+
+def publish_change(result: dict | None, name: str):
+    """After the caller commits record()'s rows: remembers the route and announces a change."""
+    if result is None:
+        return
+    _routes[result["host_id"]] = (result["route"], result["reached"])
+    if not result["changed"]:
+        return
+    logger.info(f"Route to {name} changed: {result['previous']} → {result['current']}")
+    event_bus.publish(
+        ROUTE_CHANGED,
+        name=name,
+        host_id=result["host_id"],
+        previous=result["previous"],
+        current=result["current"],
+    )
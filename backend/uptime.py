@@ -0,0 +1,153 @@
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models import DailyUptimeDB, PingResultDB
+
+logger = logging.getLogger(__name__)
+
+# Gaps longer than this (e.g. the backend was stopped) are not credited to either state
+MAX_SAMPLE_GAP = timedelta(hours=1)
+
+
+def max_gap_for(interval_seconds: int | None) -> timedelta:
+    """Sample gap allowance for monitors whose expected interval may exceed MAX_SAMPLE_GAP."""
+    return max(MAX_SAMPLE_GAP, timedelta(seconds=(interval_seconds or 0) * 2))
+
+
+def _day_key(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%d")
+
+
+def _find(db: Session, host_id: int, day: str) -> DailyUptimeDB | None:
+    return (
+        db.query(DailyUptimeDB)
+        .filter(DailyUptimeDB.host_id == host_id, DailyUptimeDB.day == day)
+        .first()
+    )
+
+
+def _get_or_create(db: Session, host_id: int, day: str) -> DailyUptimeDB:
+    row = _find(db, host_id, day)
+    if row is None:
+        # The heartbeat flusher and probe threads can both open a host's day; whoever
+        # loses that race keeps the winner's row instead of failing the whole write
+        db.execute(
+            sqlite_insert(DailyUptimeDB)
+            .values(host_id=host_id, day=day, total=0, up=0, up_seconds=0.0, down_seconds=0.0)
+            .on_conflict_do_nothing(index_elements=["host_id", "day"])
+        )
+        row = _find(db, host_id, day)
+    return row
+
+
+def _credit_interval(db: Session, host_id: int, start: datetime, end: datetime, is_up: bool):
+    """Adds [start, end) to the up/down seconds of each UTC day it overlaps."""
+    while start < end:
+        next_midnight = datetime(start.year, start.month, start.day) + timedelta(days=1)
+        chunk_end = min(end, next_midnight)
+        row = _get_or_create(db, host_id, _day_key(start))
+        seconds = (chunk_end - start).total_seconds()
+        if is_up:
+            row.up_seconds = (row.up_seconds or 0.0) + seconds
+        else:
+            row.down_seconds = (row.down_seconds or 0.0) + seconds
+        start = chunk_end
+
+
+def record_sample(
+    db: Session,
+    host_id: int,
+    is_up: bool,
+    timestamp: datetime | None = None,
+    max_gap: timedelta = MAX_SAMPLE_GAP,
+    in_maintenance: bool = False,
+    sent: int = 1,
+    received: int | None = None,
+):
+    """
+    Folds one probe sample into the host's daily rollup. The time since the previous
+    sample is credited to the previous sample's state. Samples taken in maintenance
+    count for neither state, nor does the time that follows them. `sent`/`received`
+    are the sample's packets (one, answered if up, unless a multi-packet probe says
+    otherwise) and feed the daily packet loss. Caller commits.
+    """
+    timestamp = timestamp or datetime.utcnow()
+    latest = (
+        db.query(DailyUptimeDB)
+        .filter(DailyUptimeDB.host_id == host_id)
+        .order_by(DailyUptimeDB.day.desc())
+        .first()
+    )
+    if (
+        latest is not None
+        and latest.last_sample_at is not None
+        and latest.last_up is not None
+        and timestamp > latest.last_sample_at
+    ):
+        gap_end = min(timestamp, latest.last_sample_at + max_gap)
+        _credit_interval(db, host_id, latest.last_sample_at, gap_end, latest.last_up)
+
+    row = _get_or_create(db, host_id, _day_key(timestamp))
+    if not in_maintenance:
+        row.total = (row.total or 0) + 1
+        if is_up:
+            row.up = (row.up or 0) + 1
+        row.packets_sent = (row.packets_sent or 0) + sent
+        row.packets_received = (row.packets_received or 0) + (
+            received if received is not None else int(is_up) * sent
+        )
+    if row.last_sample_at is None or timestamp >= row.last_sample_at:
+        row.last_sample_at = timestamp
+        # An unknown state leaves the next gap uncredited
+        row.last_up = None if in_maintenance else is_up
+
+
+def uptime_percent(row) -> float:
+    """Time-weighted when durations are known, sample-weighted otherwise (e.g. backfilled days)."""
+    tracked = (row.up_seconds or 0.0) + (row.down_seconds or 0.0)
+    if tracked > 0:
+        return round(row.up_seconds / tracked * 100, 1)
+    if row.total:
+        return round(row.up / row.total * 100, 1)
+    return 0.0
+
+
+def loss_percent(row) -> float | None:
+    """Packet loss for the day; None for days recorded before packets were counted."""
+    if not row.packets_sent:
+        return None
+    return round((1 - (row.packets_received or 0) / row.packets_sent) * 100, 1)
+
+
+def backfill_daily_uptime(db: Session):
+    """One-off seed of daily_uptime from raw pings so existing installs keep their history."""
+    if db.query(DailyUptimeDB.id).first() is not None:
+        return
+    rows = (
+        db.query(
+            PingResultDB.host_id,
+            func.strftime("%Y-%m-%d", PingResultDB.timestamp).label("day_key"),
+            func.count(PingResultDB.id).label("total"),
+            func.sum(case((PingResultDB.latency >= 0, 1), else_=0)).label("up"),
+        )
+        .group_by(PingResultDB.host_id, "day_key")
+        .all()
+    )
+    for host_id, day_key, total, up in rows:
+        db.add(
+            DailyUptimeDB(
+                host_id=host_id,
+                day=day_key,
+                total=total,
+                up=up or 0,
+                up_seconds=0.0,
+                down_seconds=0.0,
+            )
+        )
+    db.commit()
+    if rows:
+        logger.info(f"Backfilled {len(rows)} daily uptime rows from ping history.")
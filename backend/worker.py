@@ -0,0 +1,151 @@
+"""
+Background worker: probing, heartbeat timeouts, alert aggregation and notification
+delivery, without the HTTP API. For a multi-process API, run it next to API processes
+that only serve requests:
+
+    PROCESS_ROLE=api uvicorn main:app --workers 4
+    python worker.py
+
+A leader lease in the database keeps exactly one copy of these services active, so a
+second worker is a hot standby. With EVENT_BUS_BIND/EVENT_BUS_PEERS set, host edits
+reach the worker immediately; otherwise it catches up every SCHEDULER_RESYNC_INTERVAL.
+"""
+
+import logging
+import os
+import signal
+import threading
+
+from sqlalchemy.exc import IntegrityError
+
+import alerts
+import database
+import events
+import group_status
+import heartbeats
+import leader
+import models
+import scheduler
+import uptime
+from notifications import notification_manager
+
+logger = logging.getLogger(__name__)
+
+# "all": API processes also compete for the leader lease (single-container default);
+# "api": never run background services (use with worker.py)
+PROCESS_ROLE = os.getenv("PROCESS_ROLE", "all")
+# Every process re-reads its request-path caches this often, picking up edits made
+# through processes whose events it never received
+CACHE_REFRESH_INTERVAL = float(os.getenv("CACHE_REFRESH_INTERVAL", "60"))
+
+
+def standby():
+    """
+    Defaults for a process that isn't the leader: its alerts skip the digest window and
+    go to the notification outbox, which the leader's dispatcher delivers.
+    """
+    notification_manager.queue_only = True
+    alerts.aggregator.digesting = False
+
+
+def start_services():
+    """Everything that must run in exactly one process."""
+    notification_manager.queue_only = False
+    alerts.aggregator.digesting = True
+    logger.info("Starting background scheduler...")
+    scheduler.start_scheduler()
+    db = database.SessionLocal()
+    try:
+        notification_manager.load_config(db)
+    finally:
+        db.close()
+    notification_manager.start()
+    heartbeats.ingest.start_expiry()
+
+
+def stop_services():
+    heartbeats.ingest.stop_expiry()
+    logger.info("Shutting down background scheduler...")
+    scheduler.stop_scheduler()
+    alerts.aggregator.flush()
+    notification_manager.stop()
+    standby()
+
+
+def refresh_caches():
+    group_status.tracker.invalidate()
+    heartbeats.ingest.load()
+
+
+_refresh_stopping = threading.Event()
+_refresher = None
+
+
+def _refresh_loop():
+    while not _refresh_stopping.wait(CACHE_REFRESH_INTERVAL):
+        try:
+            refresh_caches()
+        except Exception as e:
+            logger.error(f"Cache refresh failed: {e}")
+
+
+def start_cache_refresh():
+    """Runs in every process, leader or not; scheduler.reconcile() covers the leader's own caches."""
+    global _refresher
+    if _refresher is not None:
+        return
+    _refresh_stopping.clear()
+    _refresher = threading.Thread(target=_refresh_loop, name="cache-refresh", daemon=True)
+    _refresher.start()
+
+
+def stop_cache_refresh():
+    global _refresher
+    if _refresher is None:
+        return
+    _refresh_stopping.set()
+    _refresher.join(timeout=5)
+    _refresher = None
+
+
+election = leader.LeaderElection(leader.LeaderLock("scheduler"), start_services, stop_services)
+
+
+def init_process():
+    database.migrate_db()
+    models.Base.metadata.create_all(bind=database.engine)
+    events.configure_from_env(events.event_bus)
+    # Before any process writes samples: the backfill only runs while daily_uptime is empty
+    db = database.SessionLocal()
+    try:
+        uptime.backfill_daily_uptime(db)
+    except IntegrityError:
+        # Another process starting alongside this one backfilled first
+        db.rollback()
+    finally:
+        db.close()
+
+
+def main():
+    init_process()
+    # Heartbeats are pushed to the API, but the flusher thread also drives timeouts
+    heartbeats.ingest.start()
+    start_cache_refresh()
+    standby()
+    election.start()
+    if not election.is_leader:
+        logger.info("Another process holds the leader lease; standing by.")
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+    stopping.wait()
+
+    election.stop()
+    stop_cache_refresh()
+    heartbeats.ingest.stop()
+    events.event_bus.set_transport(events.Transport())
+
+
+if __name__ == "__main__":
+    main()
@@ -145,19 +145,6 @@ const Dashboard = () => {
                         });
                         return changed ? newHosts : prev;
                     });
-
-                    // Update network status from host data
-                    const enabled = data.filter(h => h.enabled);
-                    const reachable = enabled.filter(h => h.last_status === 'UP').length;
-                    if (enabled.length > 0) {
-                        setNetworkStatus(prev => {
-                            const newStatus = reachable / enabled.length > 0.5 ? 'UP' : 'DOWN';
-                            if (prev.reachable === reachable && prev.total === enabled.length && prev.status === newStatus) {
-                                return prev; // ⚡ Bolt: Return exact prev reference to prevent re-renders
-                            }
-                            return { ...prev, reachable, total: enabled.length, status: newStatus };
-                        });
-                    }
                 } catch { /* ignore parse errors */ }
             });
 
@@ -172,6 +159,20 @@ const Dashboard = () => {
         return () => sseRef.current?.close();
     }, []);
 
+    // Network status follows the merged host list: SSE updates carry only the changed fields
+    useEffect(() => {
+        const enabled = hosts.filter(h => h.enabled);
+        if (enabled.length === 0) return;
+        const reachable = enabled.filter(h => h.last_status === 'UP').length;
+        setNetworkStatus(prev => {
+            const newStatus = reachable / enabled.length > 0.5 ? 'UP' : 'DOWN';
+            if (prev.reachable === reachable && prev.total === enabled.length && prev.status === newStatus) {
+                return prev; // ⚡ Bolt: Return exact prev reference to prevent re-renders
+            }
+            return { ...prev, reachable, total: enabled.length, status: newStatus };
+        });
+    }, [hosts]);
+
     // Initial data load + fallback polling (60s — SSE covers real-time updates)
     useEffect(() => {
         fetchHosts();